@@ -2,12 +2,22 @@
 
 Also has helper functions used by multiple actions"""
 
-
+from typing import List, Optional, Tuple, TYPE_CHECKING, Union
 import numpy as np
 
+if TYPE_CHECKING:  # avoid circular imports
+    from bdld.actions.bussi_parinello_ld import BussiParinelloLD
+    from bdld.actions.overdamped_ld import OverdampedLD
+
 
 class Action:
-    """Abstract base class for all actions"""
+    """Abstract base class for all actions
+
+    :param captures_ld: if the action stores the positions of the LD every step via
+                        capture_buffers()
+    """
+
+    captures_ld: bool = False
 
     def run(self, step: int):
         """Needs to be defined for all actions
@@ -23,6 +33,126 @@ class Action:
         """
         pass
 
+    def strides(self) -> List[Optional[int]]:
+        """Strides of the time steps at which run() needs to be called
+
+        The action is run at every step that is a multiple of any of the strides,
+        zero or None entries are ignored.
+        If not implemented, the action is run every step
+
+        :return strides: list of strides of the action
+        """
+        return [1]
+
+    def event_steps(self) -> List[int]:
+        """Single time steps at which run() needs to be called additionally to the strides
+
+        :return steps: list of time steps, empty if not implemented
+        """
+        return []
+
+    def capture_buffers(
+        self, step: int, n_steps: int
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Arrays the LD should store positions and momenta in while running several steps
+
+        Only used if captures_ld is True
+
+        :param step: last step before the LD is run
+        :param n_steps: number of steps the LD is run
+        :return (positions, momenta): arrays with shape (n_steps, n_particles, n_dim),
+                                      None if nothing should be stored
+        """
+        return (None, None)
+
+
+class Scheduler:
+    """Run the Langevin dynamics and call all other actions only when they are due
+
+    The LD is advanced without interruption up to the next step at which any of the
+    actions needs to be run. At this step all actions that are due are run in order.
+
+    An action that captures the LD (i.e. the trajectories) gets the positions of all
+    steps stored directly by the LD. It is run at every step the LD is interrupted,
+    so it can update the stored positions if they were changed by previous actions.
+
+    :param ld: the Langevin dynamics that is run every step
+    :param actions: all other actions in the order they should be run
+    :param capture_action: action storing the positions of the LD, optional
+    """
+
+    def __init__(
+        self, ld: Union["BussiParinelloLD", "OverdampedLD"], actions: List[Action]
+    ) -> None:
+        """Collect the strides and event steps of the actions
+
+        :param ld: the Langevin dynamics that is run every step
+        :param actions: all other actions in the order they should be run
+        """
+        self.ld: Union["BussiParinelloLD", "OverdampedLD"] = ld
+        self.actions: List[Action] = actions
+        self.capture_action: Optional[Action] = next(
+            (action for action in actions if action.captures_ld), None
+        )
+        self._strides: List[List[int]] = [
+            sorted({stride for stride in action.strides() if stride})
+            for action in actions
+        ]
+        self._event_steps: List[List[int]] = [
+            sorted(set(action.event_steps())) for action in actions
+        ]
+
+    def next_step(self, step: int, last_step: int) -> int:
+        """Get the next step after the given one at which any action is due
+
+        :param step: current simulation step
+        :param last_step: last step of the simulation, returned if no action is due before
+        :return next_step: step at which the next action needs to be run
+        """
+        next_step = last_step
+        for strides, event_steps in zip(self._strides, self._event_steps):
+            for stride in strides:
+                next_step = min(next_step, (step // stride + 1) * stride)
+            for event in event_steps:
+                if event > step:
+                    next_step = min(next_step, event)
+                    break
+        return next_step
+
+    def due_actions(self, step: int) -> List[Action]:
+        """Get all actions that need to be run at the given step
+
+        :param step: simulation step
+        :return actions: list of due actions in order
+        """
+        return [
+            action
+            for action, strides, event_steps in zip(
+                self.actions, self._strides, self._event_steps
+            )
+            if any(step % stride == 0 for stride in strides)
+            or step in event_steps
+            or action is self.capture_action
+        ]
+
+    def run(self, n_steps: int) -> None:
+        """Run the simulation for the given number of steps
+
+        :param n_steps: number of time steps to run, the first one is step 1
+        """
+        step = 0
+        while step < n_steps:
+            next_step = self.next_step(step, n_steps)
+            positions, momenta = (None, None)
+            if self.capture_action:
+                positions, momenta = self.capture_action.capture_buffers(
+                    step, next_step - step
+                )
+            self.ld.run_steps(next_step - step, positions, momenta)
+            step = next_step
+            for action in self.due_actions(step):
+                action.run(step)
+
 
 def get_valid_data(
     data: np.ndarray,
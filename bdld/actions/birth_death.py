@@ -1,17 +1,37 @@
 """Birth death algorithm"""
 
 from collections import OrderedDict
-import copy
 import enum
+import itertools
 from typing import List, Optional, Union, Tuple
 
 import numpy as np
+from scipy import special
 
 from bdld.actions.action import Action
-from bdld.actions.bussi_parinello_ld import BpldParticle
-from bdld import grid
+from bdld import grid, gauss_transform
+from bdld.grid import nd_trapz  # also part of this module for backwards compatibility
+from bdld.neighbor_list import NeighborList
+from bdld.particle import Particle, WalkerEnsemble
 from bdld.helpers.misc import initialize_file
 
+# available methods for the walker density calculation
+DENSITY_METHODS = ["auto", "pdist", "manual", "tiled", "kdtree", "binned", "ifgt"]
+# default cutoff of the kernels for the neighbor search, in units of the bandwidth
+DEFAULT_DENSITY_CUTOFF = 5.0
+# default memory budget of the tiled walker density in MB
+DEFAULT_DENSITY_MEMORY = 256.0
+# default grid spacing of the binned walker density, in units of the bandwidth
+DEFAULT_DENSITY_GRID_SPACING = 0.25
+# default error tolerance of the fast Gauss transform, relative to the kernel height
+DEFAULT_DENSITY_TOLERANCE = 1e-6
+# available kernels of the density estimates
+KERNELS = ["gaussian", "epanechnikov", "triweight"]
+# values of K*pi below this fraction of the maximum are clamped to it
+CONVOLUTION_FLOOR = 1e-13
+# exponents k of the compact kernels (1 - r^2 / R^2)^k
+COMPACT_KERNEL_EXPONENTS = {"epanechnikov": 1, "triweight": 3}
+
 
 class ApproxVariant(enum.Enum):
     """Enum for the different approximation variants"""
@@ -38,7 +58,7 @@ class BirthDeath(Action):
 
     This has a lot of instance attributes, containing also some statistics.
 
-    :param particles: list of Particles shared with MD
+    :param particles: WalkerEnsemble shared with MD
     :param stride: number of MD timesteps between birth-death exectutions
     :param dt: time between subsequent birth-death evaluations
     :param kt: thermal energy of system
@@ -51,12 +71,23 @@ class BirthDeath(Action):
                         variant (additive / multiplicative)
     :param rng: random number generator instance for birth-death moves
     :param stats: Stats class instance collecting statistics
+    :param density_method: method to calculate the walker density, see walker_density()
+    :param density_cutoff: cutoff of the kernels for the "kdtree" density method
+    :param density_memory: memory budget in MB for the "tiled" density method
+    :param density_grid_spacing: grid spacing relative to the bandwidth for the
+                                 "binned" density method
+    :param density_tolerance: error tolerance of the "ifgt" density method
+    :param incremental_updates: update the kernel sums after each event instead of
+                                recalculating the walker density (only with recalc_probs,
+                                not for the approximate "binned" and "ifgt" methods)
+    :param neighbor_list: Verlet list of the walker pairs for the "kdtree" method (optional)
+    :param kernel: kernel function of the density estimates, see KERNELS
     :raises
     """
 
     def __init__(
         self,
-        particles: List[BpldParticle],
+        particles: Union[WalkerEnsemble, List[Particle]],
         md_dt: float,
         stride: int,
         bw: Union[List[float], np.ndarray],
@@ -68,10 +99,20 @@ class BirthDeath(Action):
         seed: Optional[int] = None,
         stats_stride: Optional[int] = None,
         stats_filename: Optional[str] = None,
+        density_method: str = "auto",
+        density_cutoff: float = DEFAULT_DENSITY_CUTOFF,
+        density_memory: float = DEFAULT_DENSITY_MEMORY,
+        density_grid_spacing: float = DEFAULT_DENSITY_GRID_SPACING,
+        density_tolerance: float = DEFAULT_DENSITY_TOLERANCE,
+        incremental_updates: bool = False,
+        neighbor_list_skin: Optional[float] = None,
+        kernel: str = "gaussian",
+        approx_grid: Optional[grid.Grid] = None,
     ) -> None:
         """Provide all arguments, set up correction if desired
 
-        :param particles: list of Particles shared with MD
+        :param particles: WalkerEnsemble shared with MD.
+                          A list of Particles is copied into a new ensemble
         :param md_dt: timestep of MD
         :param stride: number of timesteps between birth-death exectutions
         :param bw: bandwidth for gaussian kernels per direction
@@ -84,12 +125,41 @@ class BirthDeath(Action):
         :param seed: Seed for rng (optional)
         :param stats_stride: Print statistics every n time steps
         :param stats_filename: File to print statistics to (optional, else stdout)
-        :raises ValueError: when approx_variant is add or mult and no eq_density is passed
+        :param density_method: method to calculate the walker density, default "auto".
+                               See walker_density() for the available methods
+        :param density_cutoff: cutoff of the kernels in units of the bandwidth,
+                               only used by the "kdtree" density method
+        :param density_memory: memory budget in MB of the "tiled" density method
+        :param density_grid_spacing: grid spacing in units of the bandwidth,
+                                     only used by the "binned" density method
+        :param density_tolerance: error tolerance relative to the kernel height,
+                                  only used by the "ifgt" density method
+        :param incremental_updates: when recalculating the probabilities after each
+                                    event, only update the kernel sums of the walkers
+                                    with the kernels of the killed and duplicated walker.
+                                    Not possible for the approximate "binned" and "ifgt"
+                                    density methods
+        :param neighbor_list_skin: skin of a neighbor list in units of the bandwidth,
+                                   that is reused over several birth-death steps.
+                                   Only for the "kdtree" density method, default no list
+        :param kernel: kernel function, one of KERNELS. The compact kernels have the
+                       same variance as the Gaussian with the bandwidth as sigma
+        :param approx_grid: precalculated grid of the approximation (e.g. from a cache),
+                            if given no eq_density is needed
+        :raises ValueError: when approx_variant is add or mult and neither eq_density
+                            nor approx_grid is passed
+        :raises ValueError: when the density method is unknown
+        :raises ValueError: when a neighbor list is requested for another density method
+        :raises ValueError: when incremental updates are requested for the "binned" or
+                            "ifgt" density method
+        :raises ValueError: when the kernel is unknown or not supported by the method
         """
-        self.particles: List[BpldParticle] = particles
         self.stride: int = stride
         self.dt: float = md_dt * stride
         self.bw: np.ndarray = np.array(bw, dtype=float)
+        if not isinstance(particles, WalkerEnsemble):
+            particles = WalkerEnsemble.from_particles(particles, len(self.bw))
+        self.particles: WalkerEnsemble = particles
         self.kt: float = kt
         self.inv_kt: float = 1 / kt
         # set default only here to allow passing None as argument
@@ -98,6 +168,31 @@ class BirthDeath(Action):
         self.rng: np.random.Generator = np.random.default_rng(seed)
         self.stats_stride: Optional[int] = stats_stride
         self.stats = self.Stats(self, stats_filename)
+        if density_method not in DENSITY_METHODS:
+            raise ValueError(f"Unknown walker density method '{density_method}'")
+        check_kernel(kernel, density_method)
+        self.kernel: str = kernel
+        if kernel != "gaussian":
+            # compact kernels need no additional cutoff
+            density_cutoff = kernel_radius(kernel, len(self.bw))
+        self.density_method: str = density_method
+        self.density_cutoff: float = density_cutoff
+        self.density_memory: float = density_memory
+        self.density_grid_spacing: float = density_grid_spacing
+        self.density_tolerance: float = density_tolerance
+        if incremental_updates and density_method in ["binned", "ifgt"]:
+            raise ValueError(
+                f"Incremental updates are not possible with the {density_method} "
+                "density method"
+            )
+        self.incremental_updates: bool = incremental_updates
+        self.neighbor_list: Optional[NeighborList] = None
+        if neighbor_list_skin is not None:
+            if density_method != "kdtree":
+                raise ValueError(
+                    "Neighbor lists can only be used with the kdtree density method"
+                )
+            self.neighbor_list = NeighborList(density_cutoff, neighbor_list_skin)
         print(
             f"Setting up birth/death scheme\n"
             f"Parameters:\n"
@@ -110,30 +205,29 @@ class BirthDeath(Action):
             print(f"  seed = {seed}")
         if recalc_probs:
             print("  recalculating the probabilities after every successful event")
+            if incremental_updates:
+                print("  updating the walker density incrementally")
+        if kernel != "gaussian":
+            print(f"  kernel = {kernel}")
+        if density_method != "auto":
+            print(f"  walker density method = {density_method}")
+        if density_method == "kdtree":
+            print(f"  kernel cutoff = {density_cutoff} bandwidths")
+            if neighbor_list_skin is not None:
+                print(f"  neighbor list skin = {neighbor_list_skin} bandwidths")
+        if density_method == "tiled":
+            print(f"  memory budget of the density = {density_memory} MB")
+        if density_method == "binned":
+            print(f"  density grid spacing = {density_grid_spacing} bandwidths")
+        if density_method == "ifgt":
+            print(f"  density error tolerance = {density_tolerance}")
         self.approx_variant = approx_variant or ApproxVariant.orig
-        self.approx_grid: Optional[grid.Grid] = None
-        if self.approx_variant == ApproxVariant.orig:
-            print("  using the original approximation")
-        elif self.approx_variant == ApproxVariant.add:
-            if not eq_density:
-                raise ValueError(
-                    "No equilibrium density for the additive approximation was passed"
-                )
-            print("  using the additive approximation")
-            # multiplicative: approx_grid holds
-            # -log(K*pi) + log(pi) - {average of the first two terms}
-            self.approx_grid = calc_additive_correction(eq_density, self.bw, "same")
-        elif self.approx_variant == ApproxVariant.mult:
-            if not eq_density:
-                raise ValueError(
-                    "No equilibrium density for the multiplicative approximation was passed"
-                )
-            print("  using the multiplicative approximation")
-            # multiplicative: approx_grid holds -log(K*pi)
-            conv = dens_kernel_convolution(eq_density, self.bw, "same")
-            self.approx_grid = -np.log(
-                grid.sparsify(conv, [101] * conv.n_dim, "linear")
+        print(f"  using the {self.approx_variant.value} approximation")
+        if approx_grid is None or self.approx_variant == ApproxVariant.orig:
+            approx_grid = approximation_grid(
+                self.approx_variant, eq_density, self.bw, kernel
             )
+        self.approx_grid: Optional[grid.Grid] = approx_grid
         print()
 
     def run(self, step: int) -> None:
@@ -146,6 +240,10 @@ class BirthDeath(Action):
         if self.stats_stride and step % self.stats_stride == 0:
             self.stats.print(step)
 
+    def strides(self) -> List[Optional[int]]:
+        """Strides of the steps the action needs to be run"""
+        return [self.stride, self.stats_stride]
+
     def final_run(self, step: int) -> None:
         """Print out stats if they were not before"""
         if not self.stats_stride:
@@ -162,7 +260,9 @@ class BirthDeath(Action):
         """
         num_part = len(self.particles)
 
-        beta = self.calc_betas()  # initial calculation of betas
+        density = self.density_of_walkers()
+        correction = self.correction(self.particles.pos)
+        beta = self.betas_from_density(density, correction)  # initial calculation
         rand = self.rng.random(num_part)  # rng for all at once
 
         # although this duplicates code, the "in bulk" version is faster this way
@@ -174,20 +274,30 @@ class BirthDeath(Action):
             # lists with particles to be killed and duplicated (in order)
             dup_list: List[int] = []
             kill_list: List[int] = []
+            killed = np.zeros(num_part, dtype=bool)
 
             prob = 1 - np.exp(-np.abs(beta) * self.dt * self.rate_fac)
             event_particles = np.where(rand <= prob)[0]
             self.rng.shuffle(event_particles)
-            for i in event_particles:
-                if i not in kill_list:  # the move was accepted from the old beta!
-                    rand_other = self.random_other(num_part, i)
-                    if beta[i] > 0:
+            # random other particles for all events at once, used in order
+            others = self.rng.integers(num_part - 1, size=len(event_particles))
+            kills = (beta > 0).tolist()
+            n_accepted = 0
+            for i in event_particles.tolist():
+                if not killed[i]:  # the move was accepted from the old beta!
+                    rand_other = int(others[n_accepted])
+                    n_accepted += 1
+                    if rand_other >= i:  # exclude the particle itself
+                        rand_other += 1
+                    if kills[i]:
                         kill_list.append(i)
                         dup_list.append(rand_other)
+                        killed[i] = True
                         self.stats.kill_count += 1
                     else:  # beta[i] < 0
                         kill_list.append(rand_other)
                         dup_list.append(i)
+                        killed[rand_other] = True
                         self.stats.dup_count += 1
 
             # perform all events in bulk
@@ -198,6 +308,8 @@ class BirthDeath(Action):
             particle_indices = np.arange(num_part)
             self.rng.shuffle(particle_indices)
             event_list = []
+            # unnormalized density, only needed for the incremental updates
+            kernel_sums = density * num_part
             for i in particle_indices:
                 if beta[i] > 0:
                     self.stats.kill_attempts += 1
@@ -213,35 +325,111 @@ class BirthDeath(Action):
                     elif beta[i] < 0:
                         curr_event = (rand_other, i)
                         self.stats.dup_count += 1
-                    self.perform_moves([curr_event])
+                    if self.incremental_updates:
+                        self.update_kernel_sums(kernel_sums, *curr_event)
+                        if correction is not None:
+                            correction[curr_event[1]] = correction[curr_event[0]]
+                        self.perform_moves([curr_event])
+                        beta = self.betas_from_density(
+                            kernel_sums / num_part, correction
+                        )
+                    else:
+                        self.perform_moves([curr_event])
+                        beta = self.calc_betas()
                     event_list.append(curr_event)
-                    beta = self.calc_betas()
 
         return event_list
 
     def calc_betas(self) -> np.ndarray:
         """Calculate the birth/death rate for every particle"""
+        return self.betas_from_density(
+            self.density_of_walkers(), self.correction(self.particles.pos)
+        )
 
-        pos = np.array([p.pos for p in self.particles])
-        with np.errstate(divide="ignore"):
-            # density can be zero and make beta -inf. Filter when averaging in next step
-            beta = np.log(walker_density(pos, self.bw))
-
-        if self.approx_variant in [ApproxVariant.orig, ApproxVariant.add]:
-            # add the energies and subtract the mean energy
-            ene = np.array([p.energy for p in self.particles])
-            beta += ene * self.inv_kt
-            beta -= np.mean(beta[beta != -np.inf])
-            if self.approx_variant == ApproxVariant.add:
-                # if outside of approx_grid: doesn't throw error but sets correction to 0
-                beta += self.approx_grid.interpolate(pos, "linear", 0.0).reshape(
-                    len(pos)
-                )
-        elif self.approx_variant == ApproxVariant.mult:
-            # do not use actual energies, just add the smoothed density
-            beta += self.approx_grid.interpolate(pos, "linear", 0.0).reshape(len(pos))
-            beta -= np.mean(beta[beta != -np.inf])
-        return beta
+    def betas_from_density(
+        self, density: np.ndarray, correction: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """Calculate the birth/death rates from the walker density
+
+        :param density: walker density at each walker
+        :param correction: values of the approximation grid at each walker, see correction()
+        :return beta: birth/death rate of each walker
+        """
+        return betas_from_density(
+            density, self.particles.energy, self.inv_kt, self.approx_variant, correction
+        )
+
+    def correction(self, pos: np.ndarray) -> Optional[np.ndarray]:
+        """Interpolate the grid of the approximation at the positions
+
+        :param pos: positions of the walkers
+        :return correction: values of the approximation grid, None for the original variant
+        """
+        if self.approx_grid is None:
+            return None
+        # if outside of approx_grid: doesn't throw error but sets correction to 0
+        return self.approx_grid.interpolate(pos, "linear", 0.0).reshape(len(pos))
+
+    def update_kernel_sums(self, kernel_sums: np.ndarray, dup: int, kill: int) -> None:
+        """Update the kernel sums of all walkers for a birth-death event
+
+        The kernel of the killed walker is removed and the kernel of the duplicated
+        walker is added a second time.
+        This takes O(N) operations instead of recalculating the full density.
+        For the "kdtree" density method (also with neighbor lists) the kernels are
+        cut off at the same distance, so the sums stay identical to the density.
+        Needs to be called before the event is performed
+
+        :param kernel_sums: sum of the kernels at each walker, updated in place
+        :param dup: walker that will be duplicated
+        :param kill: walker that will be replaced by the copy
+        """
+        pos = self.particles.pos
+        for walker, sign in [(kill, -1.0), (dup, 1.0)]:
+            diff = pos - pos[walker]
+            kernels = calc_kernel(diff, self.bw, self.kernel)
+            if self.density_method == "kdtree":
+                dist_sq = np.sum((diff / self.bw) ** 2, axis=1)
+                kernels[dist_sq > self.density_cutoff**2] = 0.0
+            kernel_sums += sign * kernels
+        kernel_sums[kill] = kernel_sums[dup]
+
+    def density_of_walkers(self) -> np.ndarray:
+        """Calculate the walker density at the current positions of the walkers
+
+        If a neighbor list is used, it is only rebuilt if the walkers moved too much
+
+        :return density: estimated density at each walker
+        """
+        pos = self.particles.pos
+        if self.neighbor_list is None:
+            return self.walker_density(pos)
+        self.neighbor_list.update(pos / self.bw)
+        return _walker_density_pairs(
+            pos,
+            self.bw,
+            self.neighbor_list.first,
+            self.neighbor_list.second,
+            self.density_cutoff,
+            self.kernel,
+        )
+
+    def walker_density(self, pos: np.ndarray) -> np.ndarray:
+        """Calculate the walker density at the positions with the chosen method
+
+        :param pos: positions of the walkers
+        :return density: estimated density at each walker
+        """
+        return walker_density(
+            pos,
+            self.bw,
+            self.density_method,
+            self.density_cutoff,
+            self.density_memory,
+            self.density_grid_spacing,
+            self.density_tolerance,
+            self.kernel,
+        )
 
     def random_other(self, num_part: int, excl: int) -> int:
         """Select random particle while excluding the one given as second argument
@@ -261,12 +449,15 @@ class BirthDeath(Action):
         :param event_list: List with Tuples(i,j) of the particle numbers.
                            Particle j will be replaced by a copy of particle i
         """
-        for dup, kill in event_list:
-            self.particles[kill] = copy.deepcopy(self.particles[dup])
-            # this copies all properties: is this desired?
+        if event_list:
+            dups, kills = zip(*event_list)
+            # copies all properties in bulk: is this desired?
             # what should be done with the momentum? Keep? Set to 0?
             # -> violates energy conservation!
             # keep the old random number for the initial thermostat step or generate new?
+            self.particles.copy_walkers(dups, kills)
+        if self.neighbor_list is not None:
+            self.neighbor_list.copy_walkers(event_list)
 
     def walker_density_grid(self, grid: np.ndarray, energy: np.ndarray) -> np.ndarray:
         """Calculate the density of walkers and bd-probabilities on a grid
@@ -280,15 +471,15 @@ class BirthDeath(Action):
         """
         rho = []
         beta = []
-        walker_pos = [p.pos for p in self.particles]
-        walker_ene = [p.energy for p in self.particles]
+        walker_pos = self.particles.pos
+        walker_ene = self.particles.energy
         for g, e in zip(grid, energy):
             pos = np.append(g, walker_pos).reshape(
-                (len(walker_pos) + 1, walker_pos[1].ndim)
+                (len(walker_pos) + 1, walker_pos.shape[1])
             )  # array with positions as subarrays
             ene = np.append(e, walker_ene)
             # full kernel is needed for probability (normalization)
-            rho_g = walker_density(pos, self.bw)
+            rho_g = self.walker_density(pos)
             rho.append(rho_g[0])
 
             beta_g = np.log(rho_g) + ene * self.inv_kt
@@ -394,39 +585,224 @@ class BirthDeath(Action):
                 self.reset()
 
 
-def calc_kernel(dist: np.ndarray, bw: np.ndarray) -> np.ndarray:
-    """Return kernel values from the distances to center
+def approximation_grid(
+    approx_variant: ApproxVariant,
+    eq_density: Optional[grid.Grid],
+    bw: np.ndarray,
+    kernel: str = "gaussian",
+) -> Optional[grid.Grid]:
+    """Calculate the grid with the correction terms of the approximation
 
-    Currently directly returns Gaussian kernel
-    other kernels could later be implemented via string argument
+    :param approx_variant: type of approximation (lambda)
+    :param eq_density: equilibrium probability density, not needed for the original one
+    :param bw: bandwidth of the kernel per dimension
+    :param kernel: kernel function, one of KERNELS
+    :raises ValueError: when approx_variant is add or mult and no eq_density is passed
+    :return approx_grid: correction grid, None for the original approximation
+    """
+    if approx_variant == ApproxVariant.add:
+        if not eq_density:
+            raise ValueError(
+                "No equilibrium density for the additive approximation was passed"
+            )
+        # additive: approx_grid holds
+        # -log(K*pi) + log(pi) - {average of the first two terms}
+        return calc_additive_correction(eq_density, bw, "same", kernel)
+    if approx_variant == ApproxVariant.mult:
+        if not eq_density:
+            raise ValueError(
+                "No equilibrium density for the multiplicative approximation was passed"
+            )
+        # multiplicative: approx_grid holds -log(K*pi)
+        conv = dens_kernel_convolution(eq_density, bw, "same", kernel)
+        approx_grid = grid.sparsify(conv, [101] * conv.n_dim, "linear")
+        approx_grid.log(inplace=True)
+        approx_grid *= -1
+        return approx_grid
+    return None
+
+
+def betas_from_density(
+    density: np.ndarray,
+    energy: np.ndarray,
+    inv_kt: float,
+    approx_variant: ApproxVariant,
+    correction: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Calculate the birth/death rates from the walker density
+
+    :param density: walker density at each walker
+    :param energy: energy of each walker
+    :param inv_kt: inverse of the thermal energy
+    :param approx_variant: type of approximation (lambda)
+    :param correction: values of the approximation grid at each walker
+                       (not used for the original approximation)
+    :return beta: birth/death rate of each walker
+    """
+    with np.errstate(divide="ignore"):
+        # density can be zero and make beta -inf. Filter when averaging in next step
+        beta = np.log(density)
+
+    if approx_variant in [ApproxVariant.orig, ApproxVariant.add]:
+        # add the energies and subtract the mean energy
+        beta += energy * inv_kt
+        beta -= np.mean(beta[beta != -np.inf])
+        if approx_variant == ApproxVariant.add:
+            beta += correction
+    elif approx_variant == ApproxVariant.mult:
+        # do not use actual energies, just add the smoothed density
+        beta += correction
+        beta -= np.mean(beta[beta != -np.inf])
+    return beta
+
+
+def calc_kernel(
+    dist: np.ndarray, bw: np.ndarray, kernel: str = "gaussian"
+) -> np.ndarray:
+    """Return kernel values from the distances to center
 
     :param dist: array of shape (n_dist, n_dim) with distances per dimensions
     :param bw: bandwidth per dimension
+    :param kernel: kernel function, one of KERNELS
+    """
+    if kernel == "gaussian":
+        return (
+            1
+            / ((2 * np.pi) ** (len(bw) / 2) * np.prod(bw))
+            * np.exp(-np.sum(dist**2 / (2 * bw**2), axis=1))
+        )
+    dist_sq = np.sum((dist / bw) ** 2, axis=1)
+    return kernel_height(kernel, bw) * kernel_profile(dist_sq, kernel, len(bw))
+
+
+def check_kernel(kernel: str, method: str = "auto") -> None:
+    """Check that the kernel exists and can be used with the density method
+
+    :param kernel: kernel function
+    :param method: method of the walker density calculation
+    :raises ValueError: if the kernel is unknown or not supported by the method
     """
-    return (
-        1
-        / ((2 * np.pi) ** (len(bw) / 2) * np.prod(bw))
-        * np.exp(-np.sum(dist**2 / (2 * bw**2), axis=1))
+    if kernel not in KERNELS:
+        raise ValueError(f"Unknown kernel '{kernel}'")
+    if method == "ifgt" and kernel != "gaussian":
+        raise ValueError("The ifgt density method only supports the gaussian kernel")
+
+
+def kernel_radius(kernel: str, n_dim: int) -> float:
+    """Radius of the support of the kernel in units of the bandwidth
+
+    The compact kernels (1 - r^2 / R^2)^k have a variance of R^2 / (n_dim + 2k + 2)
+    per dimension, so their radius is chosen to give unit variance
+
+    :param kernel: kernel function, one of KERNELS
+    :param n_dim: number of dimensions
+    :return radius: radius of the kernel, infinite for the Gaussian
+    """
+    if kernel == "gaussian":
+        return np.inf
+    return np.sqrt(n_dim + 2 * COMPACT_KERNEL_EXPONENTS[kernel] + 2)
+
+
+def kernel_height(kernel: str, bw: np.ndarray) -> float:
+    """Value of the normalized kernel at its center
+
+    :param kernel: kernel function, one of KERNELS
+    :param bw: bandwidth per dimension
+    :return height: kernel value at zero distance
+    """
+    n_dim = len(bw)
+    if kernel == "gaussian":
+        return 1 / ((2 * np.pi) ** (n_dim / 2) * np.prod(bw))
+    # integral of (1 - r^2 / R^2)^k over the n_dim dimensional ball with radius R
+    k = COMPACT_KERNEL_EXPONENTS[kernel]
+    volume = (
+        np.pi ** (n_dim / 2)
+        * np.exp(special.gammaln(k + 1) - special.gammaln(n_dim / 2 + k + 1))
+        * kernel_radius(kernel, n_dim) ** n_dim
     )
+    return 1 / (volume * np.prod(bw))
+
 
+def kernel_profile(
+    dist_sq: np.ndarray, kernel: str, n_dim: int, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Unnormalized kernel values from squared distances in units of the bandwidth
 
-def walker_density(pos: np.ndarray, bw: np.ndarray) -> np.ndarray:
+    :param dist_sq: squared distances divided by the squared bandwidths
+    :param kernel: kernel function, one of KERNELS
+    :param n_dim: number of dimensions
+    :param out: array to store the values in, can be dist_sq itself
+    :return values: kernel values, 1 at zero distance
+    """
+    if kernel == "gaussian":
+        values = np.multiply(dist_sq, -0.5, out=out)
+        return np.exp(values, out=values)
+    values = np.multiply(dist_sq, -1 / kernel_radius(kernel, n_dim) ** 2, out=out)
+    values += 1
+    np.maximum(values, 0.0, out=values)
+    k = COMPACT_KERNEL_EXPONENTS[kernel]
+    if k > 1:
+        np.power(values, k, out=values)
+    return values
+
+
+def walker_density(
+    pos: np.ndarray,
+    bw: np.ndarray,
+    method: str = "auto",
+    cutoff: float = DEFAULT_DENSITY_CUTOFF,
+    memory: float = DEFAULT_DENSITY_MEMORY,
+    grid_spacing: float = DEFAULT_DENSITY_GRID_SPACING,
+    tolerance: float = DEFAULT_DENSITY_TOLERANCE,
+    kernel: str = "gaussian",
+) -> np.ndarray:
     """Calculate the local density at each walker (average kernel value)
 
     The actual calculations are done by the different _walker_density functions
-    depending on the number of walkers
+    depending on the chosen method:
+
+    * "pdist": full distance matrix, fast but needs a lot of memory for many walkers
+    * "manual": loop over the walkers, needs little memory but is slow
+    * "tiled": kernel matrix in tiles that fit into a memory budget
+    * "kdtree": neighbor search that only sums kernels within a cutoff
+    * "binned": approximation from walkers binned on a grid, convolved via FFT
+    * "ifgt": improved fast Gauss transform with controlled error
+    * "auto": pdist for up to 10,000 walkers, tiled above
 
     :param numpy.ndarray pos: positions of particles
     :param float bw: bandwidth parameter of kernel
+    :param method: method to use for the calculation, default "auto"
+    :param cutoff: cutoff of the kernels in units of the bandwidth for the "kdtree" method
+    :param memory: memory budget in MB for the "tiled" method
+    :param grid_spacing: grid spacing in units of the bandwidth for the "binned" method
+    :param tolerance: error tolerance relative to the kernel height for the "ifgt" method
+    :param kernel: kernel function, one of KERNELS. The compact kernels are zero
+                   beyond their radius, which is then used as cutoff
     :return numpy.ndarray kernel: kernel value matrix
+    :raises ValueError: if the method or kernel is unknown
     """
-    if len(pos) <= 10000:  # pdist matrix with maximum 10e8 float64 values
-        return _walker_density_pdist(pos, bw)
-    else:
-        return _walker_density_manual(pos, bw)
-
-
-def _walker_density_manual(pos: np.ndarray, bw: np.ndarray) -> np.ndarray:
+    check_kernel(kernel, method)
+    if method == "auto":
+        # pdist matrix with maximum 10e8 float64 values
+        method = "pdist" if len(pos) <= 10000 else "tiled"
+    if method == "pdist":
+        return _walker_density_pdist(pos, bw, kernel)
+    if method == "manual":
+        return _walker_density_manual(pos, bw, kernel)
+    if method == "tiled":
+        return _walker_density_tiled(pos, bw, memory, kernel)
+    if method == "kdtree":
+        return _walker_density_kdtree(pos, bw, cutoff, kernel)
+    if method == "binned":
+        return _walker_density_binned(pos, bw, grid_spacing, kernel)
+    if method == "ifgt":
+        return _walker_density_ifgt(pos, bw, tolerance)
+    raise ValueError(f"Unknown walker density method '{method}'")
+
+
+def _walker_density_manual(
+    pos: np.ndarray, bw: np.ndarray, kernel: str = "gaussian"
+) -> np.ndarray:
     """Calculate the local density at each walker manually for each walker
 
     This should be slower than the other variants because it calculates each
@@ -435,32 +811,42 @@ def _walker_density_manual(pos: np.ndarray, bw: np.ndarray) -> np.ndarray:
 
     :param pos: positions of particles
     :param bw: bandwidth parameter of kernel
+    :param kernel: kernel function
     :return density: estimated density at each walker
     """
     n_part = len(pos)
     density = np.empty((n_part))
     for i in range(n_part):
         dist = np.array([(pos[i] - pos[j]) for j in range(n_part)])
-        kernel_values = calc_kernel(dist, bw)
+        kernel_values = calc_kernel(dist, bw, kernel)
         density[i] = np.mean(kernel_values)
     return density
 
 
-def _walker_density_pdist(pos: np.ndarray, bw: np.ndarray) -> np.ndarray:
+def _walker_density_pdist(
+    pos: np.ndarray, bw: np.ndarray, kernel: str = "gaussian"
+) -> np.ndarray:
     """Calculate the local density at each walker via scipy's pdist
 
     Uses scipy to calculate a spare distance matrix between all walkers.
-    Returns the sum over the Gaussian contributions at each walker.
+    Returns the sum over the kernel contributions at each walker.
     Note that the distance matrix becomes very large for many walkers,
     so this is only recommended for up to around 10,000 walkers.
 
     :param pos: positions of particles
     :param bw: bandwidth parameter of kernel
+    :param kernel: kernel function
     :return density: estimated density at each walker
     """
     from scipy.spatial.distance import pdist, squareform  # type: ignore
 
     n_dim = pos.shape[1]
+    if kernel != "gaussian":  # compact kernels do not factorize into dimensions
+        height = kernel_height(kernel, bw)
+        values = height * kernel_profile(pdist(pos / bw, "sqeuclidean"), kernel, n_dim)
+        values = squareform(values)
+        np.fill_diagonal(values, height)
+        return np.mean(values, axis=0)
     if n_dim == 1:  # faster version for 1d, otherwise identical
         dist = pdist(pos, "sqeuclidean")
         height = 1 / (np.sqrt(2 * np.pi) * bw[0])
@@ -481,8 +867,240 @@ def _walker_density_pdist(pos: np.ndarray, bw: np.ndarray) -> np.ndarray:
     return np.mean(gauss, axis=0)
 
 
+def _walker_density_tiled(
+    pos: np.ndarray,
+    bw: np.ndarray,
+    memory: float = DEFAULT_DENSITY_MEMORY,
+    kernel: str = "gaussian",
+) -> np.ndarray:
+    """Calculate the local density at each walker from tiles of the kernel matrix
+
+    The kernel matrix between all walkers is calculated in square tiles whose size
+    is chosen from the memory budget, and only the row sums are accumulated.
+    Because the matrix is symmetric, only the tiles on and above the diagonal are
+    calculated and the off-diagonal ones are added to both rows and columns.
+
+    The squared distances are calculated via matrix products of the
+    bandwidth-scaled positions, which is much faster than taking the differences
+
+    :param pos: positions of particles
+    :param bw: bandwidth parameter of kernel
+    :param memory: memory budget for the tiles in MB
+    :param kernel: kernel function
+    :return density: estimated density at each walker
+    """
+    n_part = pos.shape[0]
+    scaled_pos = pos / bw
+    sq_norm = np.sum(scaled_pos**2, axis=1)
+    # two float64 arrays with tile_size**2 elements are needed at the same time
+    tile_size = max(int(np.sqrt(memory * 1e6 / 16)), 1)
+    density = np.zeros(n_part)
+    for row_start in range(0, n_part, tile_size):
+        rows = slice(row_start, min(row_start + tile_size, n_part))
+        for col_start in range(row_start, n_part, tile_size):
+            cols = slice(col_start, min(col_start + tile_size, n_part))
+            tile = scaled_pos[rows] @ scaled_pos[cols].T
+            tile *= -2
+            tile += sq_norm[rows, np.newaxis]
+            tile += sq_norm[cols]
+            np.maximum(tile, 0, out=tile)  # rounding may make it slightly negative
+            kernel_profile(tile, kernel, len(bw), out=tile)
+            density[rows] += np.sum(tile, axis=1)
+            if col_start != row_start:
+                density[cols] += np.sum(tile, axis=0)
+    return kernel_height(kernel, bw) * density / n_part
+
+
+def _walker_density_kdtree(
+    pos: np.ndarray,
+    bw: np.ndarray,
+    cutoff: float = DEFAULT_DENSITY_CUTOFF,
+    kernel: str = "gaussian",
+) -> np.ndarray:
+    """Calculate the local density at each walker from neighbors within a cutoff
+
+    The positions are scaled by the bandwidth and all neighbors closer than the
+    cutoff are found with scipy's cKDTree, so only the kernels of these pairs
+    are calculated.
+    Time is roughly linear in the number of walkers as long as the number of
+    neighbors per walker is small. To limit the memory usage for many neighbors,
+    the walkers are processed in chunks with at most around 4 million pairs each.
+
+    Each neglected walker contributes less than exp(-cutoff**2 / 2) times the
+    kernel height, so the density is underestimated by less than this fraction of
+    the kernel height (3.7e-6 for the default cutoff of 5 bandwidths).
+    For the compact kernels the radius of the kernel is used as cutoff,
+    so the result is exact
+
+    :param pos: positions of particles
+    :param bw: bandwidth parameter of kernel
+    :param cutoff: cutoff of the kernels in units of the bandwidth
+    :param kernel: kernel function
+    :return density: estimated density at each walker
+    """
+    from scipy.spatial import cKDTree  # type: ignore
+
+    if kernel != "gaussian":
+        cutoff = kernel_radius(kernel, len(bw))
+    max_pairs = 2**22
+    n_part = pos.shape[0]
+    scaled_pos = pos / bw
+    tree = cKDTree(scaled_pos)
+    density = np.zeros(n_part)
+    start = 0
+    chunk_size = 1024
+    while start < n_part:
+        end = min(start + chunk_size, n_part)
+        # pairs of walkers in chunk with all others, including the walkers themselves
+        pairs = cKDTree(scaled_pos[start:end]).sparse_distance_matrix(
+            tree, cutoff, output_type="ndarray"
+        )
+        density[start:end] = np.bincount(
+            pairs["i"], kernel_profile(pairs["v"] ** 2, kernel, len(bw)), end - start
+        )
+        # adapt chunk size to the number of neighbors
+        neighbors = max(len(pairs) / (end - start), 1)
+        chunk_size = max(int(max_pairs / neighbors), 1)
+        start = end
+    return kernel_height(kernel, bw) * density / n_part
+
+
+def _walker_density_pairs(
+    pos: np.ndarray,
+    bw: np.ndarray,
+    first: np.ndarray,
+    second: np.ndarray,
+    cutoff: float = DEFAULT_DENSITY_CUTOFF,
+    kernel: str = "gaussian",
+) -> np.ndarray:
+    """Calculate the local density at each walker from a list of walker pairs
+
+    The list needs to contain every pair closer than the cutoff once, e.g. from a
+    NeighborList. Pairs further apart than the cutoff are ignored, so the result
+    is the same as for the "kdtree" method
+
+    :param pos: positions of particles
+    :param bw: bandwidth parameter of kernel
+    :param first: first walker of each pair
+    :param second: second walker of each pair
+    :param cutoff: cutoff of the kernels in units of the bandwidth
+    :param kernel: kernel function
+    :return density: estimated density at each walker
+    """
+    n_part = pos.shape[0]
+    dist_sq = np.zeros(len(first))
+    # gathering single coordinates is faster than gathering rows
+    for coord in np.ascontiguousarray((pos / bw).T):
+        diff = np.take(coord, first)
+        diff -= np.take(coord, second)
+        dist_sq += diff**2
+    kernels = kernel_profile(dist_sq, kernel, len(bw))
+    kernels[dist_sq > cutoff**2] = 0.0
+    # every walker also contributes to its own density
+    density = 1 + np.bincount(first, kernels, n_part)
+    density += np.bincount(second, kernels, n_part)
+    return kernel_height(kernel, bw) * density / n_part
+
+
+def _walker_density_binned(
+    pos: np.ndarray,
+    bw: np.ndarray,
+    grid_spacing: float = DEFAULT_DENSITY_GRID_SPACING,
+    kernel: str = "gaussian",
+) -> np.ndarray:
+    """Approximate the local density at each walker via a grid
+
+    The walkers are deposited on a grid spanning their positions with linear
+    (cloud-in-cell) weights, the resulting histogram is convolved with the kernel
+    via FFT and the values are interpolated back to the walker positions with
+    the same weights.
+    The cost scales as O(N + M log M) for N walkers and M grid points, but the grid
+    becomes large for widely spread walkers in higher dimensions.
+
+    The deposition and interpolation each smooth the density a bit, the relative
+    error is of the order of grid_spacing**2 (around 1% for the default of 0.25)
+
+    :param pos: positions of particles
+    :param bw: bandwidth parameter of kernel
+    :param grid_spacing: spacing of the grid in units of the bandwidth
+    :param kernel: kernel function
+    :return density: estimated density at each walker
+    """
+    stepsizes = list(grid_spacing * bw)
+    lower = pos.min(axis=0)
+    # at least two points per dimension, also if all walkers share a coordinate
+    upper = np.maximum(pos.max(axis=0), lower + stepsizes)
+    hist = grid.from_stepsizes(list(zip(lower, upper)), stepsizes)
+    indices, weights = cic_weights(pos, hist)
+    counts = np.bincount(indices.ravel(), weights.ravel(), np.prod(hist.n_points))
+    hist.data = counts / (len(pos) * np.prod(stepsizes))
+    # odd number of kernel points per dimension to keep it centered: the upper range
+    # is extended by half a step to be robust against rounding and then shrunk
+    radius = min(DEFAULT_DENSITY_CUTOFF, kernel_radius(kernel, len(bw)))
+    half_points = np.ceil(radius / grid_spacing)
+    kernel_ranges = [(-half_points * h, (half_points + 0.5) * h) for h in stepsizes]
+    kernel_grid = grid.from_stepsizes(kernel_ranges, stepsizes, shrink=True)
+    kernel_grid.data = calc_kernel(kernel_grid.points(), bw, kernel)
+    # fft can give small negative values instead of zero
+    conv = grid.convolve(hist, kernel_grid, mode="same", method="fft", floor=0.0)
+    return np.sum(conv.data.ravel()[indices] * weights, axis=1)
+
+
+def _walker_density_ifgt(
+    pos: np.ndarray, bw: np.ndarray, tolerance: float = DEFAULT_DENSITY_TOLERANCE
+) -> np.ndarray:
+    """Calculate the local density at each walker via the improved fast Gauss transform
+
+    The sum over the Gaussian kernels is a discrete Gauss transform, which is
+    approximated by clustering the walkers and expanding the contribution of each
+    cluster in a Taylor series, see the gauss_transform module.
+    The error of the density is smaller than tolerance times the kernel height.
+
+    This scales almost linearly with the number of walkers if the bandwidth is
+    small compared to their spread, but the number of expansion terms grows quickly
+    with the dimensions and the accuracy
+
+    :param pos: positions of particles
+    :param bw: bandwidth parameter of kernel
+    :param tolerance: error tolerance relative to the kernel height
+    :return density: estimated density at each walker
+    """
+    # scale positions so that the kernel is exp(-dist**2)
+    sums = gauss_transform.gauss_transform(pos / (np.sqrt(2) * bw), tolerance=tolerance)
+    height = 1 / ((2 * np.pi) ** (len(bw) / 2) * np.prod(bw))
+    return height * sums / len(pos)
+
+
+def cic_weights(pos: np.ndarray, g: grid.Grid) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the grid points surrounding positions and their linear (cloud-in-cell) weights
+
+    Positions outside of the grid are assigned to the closest edge
+
+    :param pos: positions, shape (n_pos, n_dim)
+    :param g: grid
+    :return (indices, weights): flat indices of the 2**n_dim surrounding grid points
+                                and their weights, both shape (n_pos, 2**n_dim)
+    """
+    n_points = np.array(g.n_points)
+    frac = (pos - np.array(g.ranges)[:, 0]) / np.array(g.stepsizes)
+    base = np.clip(np.floor(frac).astype(int), 0, np.maximum(n_points - 2, 0))
+    upper_weights = np.clip(frac - base, 0.0, 1.0)
+    # strides of the flattened (row-major) grid data
+    flat_strides = np.append(np.cumprod(n_points[:0:-1])[::-1], 1)
+    n_corners = 2**g.n_dim
+    indices = np.empty((len(pos), n_corners), dtype=int)
+    weights = np.empty((len(pos), n_corners))
+    for i, offsets in enumerate(itertools.product([0, 1], repeat=g.n_dim)):
+        corner = np.minimum(base + offsets, n_points - 1)
+        indices[:, i] = corner @ flat_strides
+        weights[:, i] = np.prod(
+            np.where(offsets, upper_weights, 1 - upper_weights), axis=1
+        )
+    return (indices, weights)
+
+
 def dens_kernel_convolution(
-    eq_density: grid.Grid, bw: np.ndarray, conv_mode: str
+    eq_density: grid.Grid, bw: np.ndarray, conv_mode: str, kernel: str = "gaussian"
 ) -> grid.Grid:
     """Return convolution of the a probability density with the kernel
 
@@ -490,6 +1108,17 @@ def dens_kernel_convolution(
 
     In practice only used to calculate K * pi, i.e. the KDE of the equilibrium density
 
+    The convolution is done via FFT. Its rounding errors can make values that should be
+    tiny negative, so all values below CONVOLUTION_FLOOR times the maximum are replaced
+    by this floor, which keeps the logarithm finite. The returned values in this region
+    are therefore not the convolution, but it has a probability density of less than
+    1e-13 times the maximum and is practically never visited by the walkers.
+    Blocks around the maximum and around the smallest value above the floor are
+    checked against the direct convolution
+
+    The Gaussian kernel is a product of 1d Gaussians per dimension, so it is applied
+    as separable convolution along one axis after another
+
     If the "valid" conv_mode is used the returned grid is smaller than the original one.
     The "same" mode will return a grid with the same ranges, but might have issues
     due to edge effects from the convolution
@@ -500,17 +1129,42 @@ def dens_kernel_convolution(
                       If 'valid' the resulting correction grid will have a
                       smaller domain than the original eq_density one.
                       If 'same' it will use exactly the ranges of the original grid.
+    :param kernel: kernel function, one of KERNELS
     :return conv: grid holding the convolution values
     """
-    kernel_ranges = [(-x, x) for x in 5 * bw]  # cutoff at 5 sigma
-    kernel = grid.from_stepsizes(kernel_ranges, eq_density.stepsizes)
-    kernel.data = calc_kernel(kernel.points(), bw)
-    # direct method is needed to avoid getting negative values instead of really small ones
-    return grid.convolve(eq_density, kernel, mode=conv_mode, method="direct")
+    # cutoff at 5 sigma or the radius of compact kernels
+    radius = min(DEFAULT_DENSITY_CUTOFF, kernel_radius(kernel, len(bw)))
+    kernel_ranges = [(-x, x) for x in radius * bw]
+    if kernel == "gaussian":
+        kernels = []
+        for dim, (r, bw_dim) in enumerate(zip(kernel_ranges, bw)):
+            axis = grid.from_stepsizes([r], eq_density.stepsizes[dim]).axes()[0]
+            kernels.append(calc_kernel(axis[:, np.newaxis], np.array([bw_dim])))
+        return grid.convolve_separable(
+            eq_density,
+            kernels,
+            mode=conv_mode,
+            method="fft",
+            floor=CONVOLUTION_FLOOR,
+            verify=True,
+        )
+    kernel_grid = grid.from_stepsizes(kernel_ranges, eq_density.stepsizes)
+    kernel_grid.data = calc_kernel(kernel_grid.points(), bw, kernel)
+    return grid.convolve(
+        eq_density,
+        kernel_grid,
+        mode=conv_mode,
+        method="fft",
+        floor=CONVOLUTION_FLOOR,
+        verify=True,
+    )
 
 
 def calc_additive_correction(
-    eq_density: grid.Grid, bw: np.ndarray, conv_mode: str = "same"
+    eq_density: grid.Grid,
+    bw: np.ndarray,
+    conv_mode: str = "same",
+    kernel: str = "gaussian",
 ) -> grid.Grid:
     """Additive correction for the probabilites due to the Gaussian Kernel
 
@@ -521,35 +1175,23 @@ def calc_additive_correction(
     :param eq_density: grid with equilibrium probability density of system
     :param bw: bandwidths of the kernel (sigma)
     :param conv_mode: convolution mode to use. See dens_kernel_convolution() for details.
+    :param kernel: kernel function, one of KERNELS
     :return correction: grid wih the correction values
     """
-    conv = dens_kernel_convolution(eq_density, bw, conv_mode)
+    conv = dens_kernel_convolution(eq_density, bw, conv_mode, kernel)
     if conv_mode == "valid":
         # "valid" convolution shrinks grid --> shrink density as well
         dens_smaller = conv.copy_empty()
         dens_smaller.data = eq_density.interpolate(dens_smaller.points(), "linear")
         eq_density = dens_smaller
-    log_term = np.log(conv / eq_density)
-    integral_term = nd_trapz(log_term.data * eq_density.data, conv.stepsizes)
-    correction = -log_term + integral_term
+    # the grids are large, so reuse the convolution grid for all terms
+    log_term = conv
+    log_term /= eq_density
+    log_term.log(inplace=True)
+    integral_term = nd_trapz(log_term.data, conv.stepsizes, eq_density.data)
+    correction = log_term
+    correction *= -1
+    correction += integral_term
     if any(n > 101 for n in correction.n_points):
         correction = grid.sparsify(correction, [101] * correction.n_dim, "linear")
     return correction
-
-
-def nd_trapz(data: np.ndarray, dx: Union[List[float], float]) -> float:
-    """Calculate a multidimensional integral via recursive usage of the trapezoidal rule
-
-    Uses numpy's trapz for the 1d integrals
-
-    :param data: values to integrate
-    :param dx: distances between datapoints per dimension
-    :return integral: integral value
-    """
-    if isinstance(dx, list):
-        if dx:  # list not empty
-            # recurse with last dimension integrated
-            return nd_trapz(nd_trapz(data, dx=dx[-1]), dx[:-1])
-        return data  # innermost iteration gives empty list --> recursion finished
-    # single dimension
-    return np.trapz(data, dx=dx)
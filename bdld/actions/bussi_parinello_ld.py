@@ -12,7 +12,8 @@ from typing import List, Optional, Union
 import numpy as np
 
 from bdld.actions.action import Action
-from bdld.particle import Particle
+from bdld.noise import NoiseBuffer
+from bdld.particle import Particle, WalkerEnsemble
 from bdld.potential import potential
 
 
@@ -38,11 +39,14 @@ class BussiParinelloLD(Action):
     Can handle multiple non-interacting particles (= walkers) simultaneously
 
     :param pot: potential to perform LD on
+    :param particles: WalkerEnsemble holding all particles
     :param dt: timestep
     :param friction: friction parameter of langevin equation
     :param kt: thermal energy in units of kt
     :param rng: numpy.random.Generator instance for the thermostat
     :param c1: constant for thermostat
+    :param batched: perform the steps on all walkers at once instead of one after another
+    :param noise: NoiseBuffer for the thermostat noise, None to draw it from rng every step
     """
 
     def __init__(
@@ -52,6 +56,9 @@ class BussiParinelloLD(Action):
         friction: float,
         kt: float,
         seed: Optional[int] = None,
+        batched: bool = True,
+        noise_block_steps: Optional[int] = None,
+        noise_chunk_size: int = 1024,
     ) -> None:
         """Creates Langevin dynamics instance
 
@@ -60,14 +67,24 @@ class BussiParinelloLD(Action):
         :param friction: friction parameter of langevin dynamics thermostat
         :param kt: thermal energy in units of kt
         :param seed: seed for rng, optional
+        :param batched: integrate all walkers at once with array operations, default True
+        :param noise_block_steps: pre-generate the noise for this many steps at once, optional
+        :param noise_chunk_size: number of walkers sharing a random stream of the
+                                 pre-generated noise, default 1024
         """
         self.pot: potential.Potential = pot
-        self.particles: List[BpldParticle] = []  # list of particles
+        self.particles: WalkerEnsemble = WalkerEnsemble(pot.n_dim)
         self.dt: float = dt
         self.kt: float = kt
         self.friction: float = friction
         self.c1: float = np.exp(-0.5 * friction * dt)
         self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.batched: bool = batched
+        self.noise: Optional[NoiseBuffer] = None
+        if noise_block_steps:
+            self.noise = NoiseBuffer(
+                pot.n_dim, 2, seed, noise_block_steps, noise_chunk_size
+            )
         print(
             f"Setting up Langevin dynamics with Bussi-Parinello thermostat\n"
             f"Parameters:\n"
@@ -78,25 +95,104 @@ class BussiParinelloLD(Action):
         )
         if seed:
             print(f"  seed = {seed}")
+        if not batched:
+            print("  integrating the walkers one after another")
+        if self.noise:
+            print(
+                f"  pre-generating noise for {noise_block_steps} steps "
+                f"in chunks of {noise_chunk_size} walkers"
+            )
         print()
 
     def run(self, step: int = None) -> None:
         """Perform single MD step on all particles
 
         :param step: Not used, just to have the right function signature"""
-        for p in self.particles:
+        if self.batched:
+            self.step_batched()
+        else:
+            self.step_per_walker()
+
+    def run_steps(
+        self,
+        n_steps: int,
+        capture: Optional[np.ndarray] = None,
+        capture_mom: Optional[np.ndarray] = None,
+    ) -> None:
+        """Perform several MD steps on all particles without interruption
+
+        :param n_steps: number of steps to perform
+        :param capture: array to store the positions after every step in,
+                        shape (n_steps, n_particles, n_dim), optional
+        :param capture_mom: array to store the momenta after every step in,
+                            shape (n_steps, n_particles, n_dim), optional
+        """
+        step = self.step_batched if self.batched else self.step_per_walker
+        pos, mom = self.particles.pos, self.particles.mom
+        for i in range(n_steps):
+            step()
+            if capture is not None:
+                capture[i] = pos
+            if capture_mom is not None:
+                capture_mom[i] = mom
+
+    def draw_noise(self) -> np.ndarray:
+        """Get the noise for both thermostat steps of all particles
+
+        The noise is taken from the NoiseBuffer if set, otherwise directly drawn
+        from the rng with the same ordering as drawing it per particle and step
+
+        :return noise: array with shape (n_particles, 2, n_dim)
+        """
+        if self.noise:
+            return self.noise.next(len(self.particles))
+        return self.rng.standard_normal((len(self.particles), 2, self.pot.n_dim))
+
+    def step_batched(self) -> None:
+        """Perform single MD step on all particles at once
+
+        Both step functions use the same noise, so they give identical trajectories
+        for the same seed (up to rounding differences of vectorized potentials)
+        """
+        ens = self.particles
+        noise = self.draw_noise()
+        c2 = ens.c2[:, np.newaxis]
+        pos, mom = ens.pos, ens.mom  # views, all following operations are in place
+        # first part of thermostat
+        mom *= self.c1
+        mom += c2 * noise[:, 0]
+        # first part of velocity verlet
+        mom += 0.5 * ens.forces * self.dt
+        pos += (mom / ens.mass[:, np.newaxis]) * self.dt
+        # apply boundary conditions if needed
+        self.pot.apply_boundary_condition_batch(pos, mom)
+        # second part of velocity verlet with force evaluation
+        ens.energy, ens.forces = self.pot.evaluate_batch(pos)
+        mom += 0.5 * ens.forces * self.dt
+        # second part of thermostat
+        mom *= self.c1
+        mom += c2 * noise[:, 1]
+
+    def step_per_walker(self) -> None:
+        """Perform single MD step on all particles by looping over them"""
+        # work directly on the rows of the ensemble arrays
+        ens = self.particles
+        pos, mom, forces, energy = ens.pos, ens.mom, ens.forces, ens.energy
+        mass, c2 = ens.mass, ens.c2
+        noise = self.draw_noise()
+        for i in range(len(ens)):
             # first part of thermostat
-            p.mom = self.c1 * p.mom + p.c2 * self.rng.standard_normal(self.pot.n_dim)
+            mom[i] = self.c1 * mom[i] + c2[i] * noise[i, 0]
             # first part of velocity verlet
-            p.mom += 0.5 * p.forces * self.dt
-            p.pos += (p.mom / p.mass) * self.dt
+            mom[i] += 0.5 * forces[i] * self.dt
+            pos[i] += (mom[i] / mass[i]) * self.dt
             # apply boundary conditions if needed
-            self.pot.apply_boundary_condition(p.pos, p.mom)
+            self.pot.apply_boundary_condition(pos[i], mom[i])
             # second part of velocity verlet with force evaluation
-            p.energy, p.forces = self.pot.evaluate(p.pos)
-            p.mom += 0.5 * p.forces * self.dt
+            energy[i], forces[i] = self.pot.evaluate(pos[i])
+            mom[i] += 0.5 * forces[i] * self.dt
             # second part of thermostat
-            p.mom = self.c1 * p.mom + p.c2 * self.rng.standard_normal(self.pot.n_dim)
+            mom[i] = self.c1 * mom[i] + c2[i] * noise[i, 1]
 
     def add_particle(
         self,
@@ -109,7 +205,7 @@ class BussiParinelloLD(Action):
 
         :param pos: list or numpy array with initial position of the particle per dimension
         :param mass: mass of particle, defaults to 1.0
-        :param partnum: specifies particle number (position in list). Default is -1 (at end)
+        :param partnum: specifies particle number (position in ensemble). Default is -1 (at end)
         :param overwrite: overwrite existing particle instead of inserting (default False)
         :raises ValueError: when dimensions of pos and potential do not match
         """
@@ -119,20 +215,19 @@ class BussiParinelloLD(Action):
                     pos, self.pot.n_dim
                 )
             )
-        p = BpldParticle(pos, None, mass)
-        p.energy, p.forces = self.pot.evaluate(p.pos)
-        p.c2 = np.sqrt((1 - self.c1 * self.c1) * p.mass * self.kt)
         if overwrite:
-            self.particles[partnum] = p
+            p = self.particles[partnum]
+            p.pos = pos
+            p.init_momentum()
+            p.mass = mass
         else:
-            if partnum == -1:
-                self.particles.append(p)
-            else:
-                self.particles.insert(partnum, p)
+            p = self.particles.add(pos, None, mass, None if partnum == -1 else partnum)
+        p.energy, p.forces = self.pot.evaluate(p.pos)
+        p.c2 = np.sqrt((1 - self.c1 * self.c1) * p.mass * self.kt)
 
     def remove_particle(self, partnum: int) -> None:
         """Removes particle from MD
 
-        :param partnum: specifies particle number in list
+        :param partnum: specifies particle number in ensemble
         """
-        del self.particles[partnum]
+        self.particles.remove(partnum)
@@ -106,6 +106,10 @@ class DeltaFAction(Action):
         if self.write_stride and step % self.write_stride == 0:
             self.write(step)
 
+    def strides(self) -> List[Optional[int]]:
+        """Strides of the steps the action needs to be run"""
+        return [self.stride, self.write_stride]
+
     def final_run(self, step: int) -> None:
         if not self.stride:  # perform analysis once
             self.delta_f[0] = step * self.dt
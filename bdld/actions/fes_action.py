@@ -135,6 +135,10 @@ class FesAction(Action):
         if self.plot_stride and step % self.plot_stride == 0:
             self.plot(step)
 
+    def strides(self) -> List[Optional[int]]:
+        """Strides of the steps the action needs to be run"""
+        return [self.stride, self.write_stride, self.plot_stride]
+
     def final_run(self, step: int) -> None:
         """Same as run() but without stride checks and passing the step number"""
         self.fes = calculate_fes(self.histo_action.histo, self.kt)
@@ -112,6 +112,14 @@ class HistogramAction(Action):
             logging.info("Reset of histogram at step %s", step)
             self.histo.clear()
 
+    def strides(self) -> List[Optional[int]]:
+        """Strides of the steps the action needs to be run"""
+        return [self.update_stride, self.write_stride]
+
+    def event_steps(self) -> List[int]:
+        """Steps at which the histogram is reset"""
+        return self.reset
+
     def final_run(self, step: int):
         """Same as run without stride checks
 
@@ -9,7 +9,8 @@ from typing import List, Optional, Union
 import numpy as np
 
 from bdld.actions.action import Action
-from bdld.particle import Particle
+from bdld.noise import NoiseBuffer
+from bdld.particle import Particle, WalkerEnsemble
 from bdld.potential import potential
 
 
@@ -35,10 +36,13 @@ class OverdampedLD(Action):
     Can handle multiple non-interacting particles (= walkers) simultaneously
 
     :param pot: potential to perform LD on
+    :param particles: WalkerEnsemble holding all particles
     :param dt: timestep
     :param kt: thermal energy. Set to 1 to have no need to modify birth/death
     :param noise_factor: prefactor of the noise term
     :param rng: numpy.random.Generator instance for the thermostat
+    :param batched: perform the steps on all walkers at once instead of one after another
+    :param noise: NoiseBuffer for the thermostat noise, None to draw it from rng every step
     """
 
     def __init__(
@@ -46,19 +50,32 @@ class OverdampedLD(Action):
         pot: potential.Potential,
         dt: float,
         seed: Optional[int] = None,
+        batched: bool = True,
+        noise_block_steps: Optional[int] = None,
+        noise_chunk_size: int = 1024,
     ) -> None:
         """Creates overdamped Langevin dynamics instance
 
         :param pot: potential to use
         :param dt: timestep between particle moves
         :param seed: seed for rng, optional
+        :param batched: integrate all walkers at once with array operations, default True
+        :param noise_block_steps: pre-generate the noise for this many steps at once, optional
+        :param noise_chunk_size: number of walkers sharing a random stream of the
+                                 pre-generated noise, default 1024
         """
         self.pot: potential.Potential = pot
-        self.particles: List[LDParticle] = []  # list of particles
+        self.particles: WalkerEnsemble = WalkerEnsemble(pot.n_dim)
         self.dt: float = dt
         self.kt: float = 1.0
         self.noise_factor: float = np.sqrt(2 * self.dt)  # calculate only once
         self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.batched: bool = batched
+        self.noise: Optional[NoiseBuffer] = None
+        if noise_block_steps:
+            self.noise = NoiseBuffer(
+                pot.n_dim, 1, seed, noise_block_steps, noise_chunk_size
+            )
         print(
             f"Setting up overdamped Langevin dynamics\n"
             f"Parameters:\n"
@@ -67,18 +84,82 @@ class OverdampedLD(Action):
         )
         if seed:
             print(f"  seed = {seed}")
+        if not batched:
+            print("  integrating the walkers one after another")
+        if self.noise:
+            print(
+                f"  pre-generating noise for {noise_block_steps} steps "
+                f"in chunks of {noise_chunk_size} walkers"
+            )
         print()
 
     def run(self, step: int = None) -> None:
         """Perform single MD step on all particles
 
         :param step: Not used, just to have the right function signature"""
-        for p in self.particles:
-            p.pos += self.dt * p.forces + self.noise_factor * self.rng.standard_normal(
-                self.pot.n_dim
-            )
-            self.pot.apply_boundary_condition(p.pos, p.mom)
-            p.energy, p.forces = self.pot.evaluate(p.pos)
+        if self.batched:
+            self.step_batched()
+        else:
+            self.step_per_walker()
+
+    def run_steps(
+        self,
+        n_steps: int,
+        capture: Optional[np.ndarray] = None,
+        capture_mom: Optional[np.ndarray] = None,
+    ) -> None:
+        """Perform several MD steps on all particles without interruption
+
+        :param n_steps: number of steps to perform
+        :param capture: array to store the positions after every step in,
+                        shape (n_steps, n_particles, n_dim), optional
+        :param capture_mom: array to store the momenta after every step in,
+                            shape (n_steps, n_particles, n_dim), optional
+        """
+        step = self.step_batched if self.batched else self.step_per_walker
+        pos, mom = self.particles.pos, self.particles.mom
+        for i in range(n_steps):
+            step()
+            if capture is not None:
+                capture[i] = pos
+            if capture_mom is not None:
+                capture_mom[i] = mom
+
+    def draw_noise(self) -> np.ndarray:
+        """Get the noise for all particles
+
+        The noise is taken from the NoiseBuffer if set, otherwise directly drawn
+        from the rng with the same ordering as drawing it per particle
+
+        :return noise: array with shape (n_particles, n_dim)
+        """
+        if self.noise:
+            return self.noise.next(len(self.particles))[:, 0]
+        return self.rng.standard_normal((len(self.particles), self.pot.n_dim))
+
+    def step_batched(self) -> None:
+        """Perform single MD step on all particles at once
+
+        Both step functions use the same noise, so they give identical trajectories
+        for the same seed (up to rounding differences of vectorized potentials)
+        """
+        ens = self.particles
+        noise = self.draw_noise()
+        pos = ens.pos  # view, update is in place
+        pos += self.dt * ens.forces + self.noise_factor * noise
+        self.pot.apply_boundary_condition_batch(pos, ens.mom)
+        ens.energy, ens.forces = self.pot.evaluate_batch(pos)
+
+    def step_per_walker(self) -> None:
+        """Perform single MD step on all particles by looping over them"""
+        # work directly on the rows of the ensemble arrays
+        ens = self.particles
+        pos, mom, forces, energy = ens.pos, ens.mom, ens.forces, ens.energy
+        noise = self.draw_noise()
+        for i in range(len(ens)):
+            pos[i] += self.dt * forces[i] + self.noise_factor * noise[i]
+            self.pot.apply_boundary_condition(pos[i], mom[i])
+            energy[i], forces[i] = self.pot.evaluate(pos[i])
 
     def add_particle(
         self,
@@ -91,7 +172,7 @@ class OverdampedLD(Action):
 
         :param pos: list or numpy array with initial position of the particle per dimension
         :param mass: mass of particles (ignored in algorithm)
-        :param partnum: specifies particle number (position in list). Default is -1 (at end)
+        :param partnum: specifies particle number (position in ensemble). Default is -1 (at end)
         :param overwrite: overwrite existing particle instead of inserting (default False)
         :raises ValueError: when dimensions of pos and potential do not match
         """
@@ -101,19 +182,18 @@ class OverdampedLD(Action):
                     pos, self.pot.n_dim
                 )
             )
-        p = LDParticle(pos, None, mass)
-        p.energy, p.forces = self.pot.evaluate(p.pos)
         if overwrite:
-            self.particles[partnum] = p
+            p = self.particles[partnum]
+            p.pos = pos
+            p.init_momentum()
+            p.mass = mass
         else:
-            if partnum == -1:
-                self.particles.append(p)
-            else:
-                self.particles.insert(partnum, p)
+            p = self.particles.add(pos, None, mass, None if partnum == -1 else partnum)
+        p.energy, p.forces = self.pot.evaluate(p.pos)
 
     def remove_particle(self, partnum: int) -> None:
         """Removes particle from MD
 
-        :param partnum: specifies particle number in list
+        :param partnum: specifies particle number in ensemble
         """
-        del self.particles[partnum]
+        self.particles.remove(partnum)
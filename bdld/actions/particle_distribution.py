@@ -1,13 +1,13 @@
 """Module holding action to analyse distribution of particles in states"""
 
 from collections import OrderedDict
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
 
 from bdld.actions.action import Action, get_valid_data
 from bdld.helpers.misc import initialize_file, make_ordinal
-from bdld.particle import Particle
+from bdld.particle import Particle, WalkerEnsemble
 from bdld.tools import pos_inside_ranges
 
 
@@ -24,7 +24,7 @@ class ParticleDistributionAction(Action):
 
     def __init__(
         self,
-        particles: List[Particle],
+        particles: Union[WalkerEnsemble, List[Particle]],
         states: List[List[Tuple[float, float]]],
         stride: Optional[int] = None,
         filename: Optional[str] = None,
@@ -33,7 +33,7 @@ class ParticleDistributionAction(Action):
     ) -> None:
         """Set up action to analyse particle distribution
 
-        :param particles: Particle list of LD to analyise
+        :param particles: WalkerEnsemble of LD to analyise (lists of Particles are copied)
         :param states: List of states to check. Each state is a list of (min, max) ranges per dimension.
         :param stride: calculate distribution every n time steps, default 1
         :param filename: filename to write to, optional
@@ -43,6 +43,8 @@ class ParticleDistributionAction(Action):
         :raise ValueError: if the write_stride is no multiple of the stride
         """
         print("Setting up action to analyse distribution of walkers")
+        if not isinstance(particles, WalkerEnsemble):
+            particles = WalkerEnsemble.from_particles(particles)
         self.particles = particles
         self.states = states
         self.stride: int = stride or 0
@@ -93,6 +95,10 @@ class ParticleDistributionAction(Action):
         if self.write_stride and step % self.write_stride == 0:
             self.write(step)
 
+    def strides(self) -> List[Optional[int]]:
+        """Strides of the steps the action needs to be run"""
+        return [self.stride, self.write_stride]
+
     def final_run(self, step: int) -> None:
         if not self.stride:  # perform analysis once
             self.counts[0] = step
@@ -104,8 +110,7 @@ class ParticleDistributionAction(Action):
 
         :return counts: list with number of particles per state
         """
-        pos = np.array([p.pos for p in self.particles])
-        bool_lists = pos_inside_ranges(pos, self.states)
+        bool_lists = pos_inside_ranges(self.particles.pos, self.states)
         counts = [sum(state_bools) for state_bools in bool_lists]
         return counts
 
@@ -1,6 +1,6 @@
 """Module holding the TrajectoryAction class"""
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import numpy as np
 
@@ -16,11 +16,15 @@ class TrajectoryAction(Action):
     points are being held in memory even if they are never written.
     This allow other actions to use them.
 
+    When run by the Scheduler, the LD stores the positions directly in the arrays
+
     :param traj: fixed size numpy array holding the time and positions
                  it is written row-wise (i.e. every row represents a time)
                  and overwritten after being saved to file
     """
 
+    captures_ld = True
+
     def __init__(
         self,
         ld: BussiParinelloLD,
@@ -79,13 +83,37 @@ class TrajectoryAction(Action):
         """
         row = (step % self.write_stride) - 1  # saving starts at step 1
         self.times[row] = step * self.ld.dt
-        self.positions[row] = [p.pos for p in self.ld.particles]
+        self.positions[row] = self.ld.particles.pos
         if self.store_momentum:
-            self.momentum[row] = [p.mom for p in self.ld.particles]
+            self.momentum[row] = self.ld.particles.mom
 
         if step % self.write_stride == 0:
             self.write(step)
 
+    def strides(self) -> List[Optional[int]]:
+        """Strides of the steps the action needs to be run
+
+        The positions of the other steps are stored directly by the LD
+        """
+        return [self.write_stride]
+
+    def capture_buffers(
+        self, step: int, n_steps: int
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Rows of the trajectory arrays the LD should store the next steps in
+
+        The rows are contiguous because the LD is interrupted every write_stride
+
+        :param step: last step before the LD is run
+        :param n_steps: number of steps the LD is run
+        :return (positions, momenta): views of the rows of the trajectory arrays,
+                                      momenta is None if it is not stored
+        """
+        rows = slice(step % self.write_stride, step % self.write_stride + n_steps)
+        self.times[rows, 0] = np.arange(step + 1, step + n_steps + 1) * self.ld.dt
+        momenta = self.momentum[rows] if self.store_momentum else None
+        return (self.positions[rows], momenta)
+
     def final_run(self, step: int) -> None:
         """Write rest of trajectories to files"""
         self.write(step)
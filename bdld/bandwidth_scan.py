@@ -0,0 +1,271 @@
+"""Scan the walker density and birth-death rates for many kernel bandwidths at once
+
+This helps to choose the kernel bandwidth of the birth-death algorithm without
+running a simulation for every value: for a snapshot of walker positions the
+birth-death rates (beta) are calculated for all bandwidths, and summarized by
+their spread and the expected number of kill and duplication events per step.
+
+Can be run from the command line via `python -m bdld bandwidth-scan`
+"""
+
+import argparse
+import logging
+from typing import List, Optional, Sequence
+import sys
+
+import numpy as np
+
+from bdld import grid, inputparser
+from bdld.actions import birth_death as bd
+from bdld.cache import GridCache
+from bdld.helpers.misc import initialize_file
+from bdld.system_setup import (
+    bd_prob_density,
+    get_approx_variant,
+    setup_ld,
+    setup_potential,
+)
+
+# columns of the summary after the bandwidths
+SUMMARY_FIELDS = [
+    "beta_std",
+    "beta_min",
+    "beta_max",
+    "kill_fraction",
+    "kill_rate",
+    "dup_rate",
+]
+
+
+def walker_densities(
+    pos: np.ndarray,
+    bandwidths: np.ndarray,
+    kernel: str = "gaussian",
+    memory: float = bd.DEFAULT_DENSITY_MEMORY,
+) -> np.ndarray:
+    """Calculate the density at each walker for several bandwidths in one sweep
+
+    The kernel matrix is calculated in tiles as for the "tiled" density method.
+    The squared distances per dimension of each tile are calculated only once and
+    reused for all bandwidths
+
+    :param pos: positions of the walkers, shape (n_walkers, n_dim)
+    :param bandwidths: bandwidths per dimension, shape (n_bandwidths, n_dim)
+    :param kernel: kernel function, see birth_death.KERNELS
+    :param memory: memory budget for the tiles in MB
+    :return densities: density at each walker, shape (n_bandwidths, n_walkers)
+    """
+    n_part, n_dim = pos.shape
+    inv_bw_sq = 1 / bandwidths**2
+    # squared distances per dimension plus two arrays for the kernel values per tile
+    tile_size = max(int(np.sqrt(memory * 1e6 / (8 * (n_dim + 2)))), 1)
+    density = np.zeros((len(bandwidths), n_part))
+    for row_start in range(0, n_part, tile_size):
+        rows = slice(row_start, min(row_start + tile_size, n_part))
+        for col_start in range(row_start, n_part, tile_size):
+            cols = slice(col_start, min(col_start + tile_size, n_part))
+            dist_sq = (pos[rows, np.newaxis, :] - pos[np.newaxis, cols, :]) ** 2
+            for i, factors in enumerate(inv_bw_sq):
+                values = bd.kernel_profile(dist_sq @ factors, kernel, n_dim)
+                density[i, rows] += np.sum(values, axis=1)
+                if col_start != row_start:
+                    density[i, cols] += np.sum(values, axis=0)
+    heights = np.array([bd.kernel_height(kernel, bw) for bw in bandwidths])
+    return heights[:, np.newaxis] * density / n_part
+
+
+def scan_bandwidths(
+    pos: np.ndarray,
+    bandwidths: np.ndarray,
+    energy: np.ndarray,
+    kt: float,
+    dt: float,
+    rate_fac: Optional[float] = None,
+    approx_variant: Optional[bd.ApproxVariant] = None,
+    eq_density: Optional[grid.Grid] = None,
+    kernel: str = "gaussian",
+    memory: float = bd.DEFAULT_DENSITY_MEMORY,
+) -> np.ndarray:
+    """Summarize the birth-death rates of the walkers for each bandwidth
+
+    The columns of the summary are the bandwidths per dimension followed by
+    the SUMMARY_FIELDS:
+
+    * spread (standard deviation), minimum and maximum of the finite betas,
+      NaN if no beta is finite
+    * fraction of walkers with positive beta, i.e. that attempt to be killed
+    * expected number of kill and duplication events per walker and birth-death step
+
+    :param pos: positions of the walkers, shape (n_walkers, n_dim)
+    :param bandwidths: bandwidths per dimension, shape (n_bandwidths, n_dim)
+    :param energy: energy of each walker
+    :param kt: thermal energy of the system
+    :param dt: time between birth-death steps
+    :param rate_fac: factor of the probabilities in the exponential, default 1
+    :param approx_variant: type of approximation (lambda), defaults to original
+    :param eq_density: equilibrium probability density, required for the
+                       additive and multiplicative approximations
+    :param kernel: kernel function, see birth_death.KERNELS
+    :param memory: memory budget for the density calculation in MB
+    :return summary: array of shape (n_bandwidths, n_dim + len(SUMMARY_FIELDS))
+    """
+    approx_variant = approx_variant or bd.ApproxVariant.orig
+    bd.check_kernel(kernel)
+    densities = walker_densities(pos, bandwidths, kernel, memory)
+    summary = np.empty((len(bandwidths), pos.shape[1] + len(SUMMARY_FIELDS)))
+    for i, bw in enumerate(bandwidths):
+        approx_grid = bd.approximation_grid(approx_variant, eq_density, bw, kernel)
+        correction = None
+        if approx_grid is not None:
+            correction = approx_grid.interpolate(pos, "linear", 0.0).reshape(len(pos))
+        beta = bd.betas_from_density(
+            densities[i], energy, 1 / kt, approx_variant, correction
+        )
+        finite = beta[np.isfinite(beta)]
+        if len(finite) > 0:
+            beta_stats = [np.std(finite), np.min(finite), np.max(finite)]
+        else:
+            beta_stats = [np.nan] * 3
+        prob = 1 - np.exp(-np.abs(beta) * dt * (rate_fac or 1.0))
+        summary[i] = np.concatenate(
+            (
+                bw,
+                beta_stats
+                + [
+                    np.count_nonzero(beta > 0) / len(beta),
+                    np.sum(prob[beta > 0]) / len(beta),
+                    np.sum(prob[beta < 0]) / len(beta),
+                ],
+            )
+        )
+    return summary
+
+
+def parse_bandwidths(values: Sequence[str], n_dim: int) -> np.ndarray:
+    """Convert bandwidths from the command line to an array
+
+    Each value is either a single number used for all dimensions or
+    comma-separated values per dimension
+
+    :param values: bandwidths as strings
+    :param n_dim: number of dimensions
+    :raises ValueError: if the number of values of a bandwidth does not match
+    :return bandwidths: array of shape (n_bandwidths, n_dim)
+    """
+    bandwidths = []
+    for value in values:
+        bw = [float(v) for v in value.split(",")]
+        if len(bw) == 1:
+            bw *= n_dim
+        if len(bw) != n_dim:
+            raise ValueError(f"Bandwidth '{value}' does not have {n_dim} values")
+        bandwidths.append(bw)
+    return np.array(bandwidths)
+
+
+def load_positions(filenames: List[str], trajectories: bool = False) -> np.ndarray:
+    """Load walker positions from file(s)
+
+    :param filenames: files to load. Without trajectories this must be a single file
+                      with one walker per line
+    :param trajectories: the files are trajectories (e.g. of the trajectory action),
+                         the positions of the last line of each file are used
+    :return pos: positions of the walkers, shape (n_walkers, n_dim)
+    """
+    if trajectories:
+        # first column is the time
+        return np.array([np.loadtxt(f, ndmin=2)[-1, 1:] for f in filenames])
+    return np.vstack([np.loadtxt(f, ndmin=2) for f in filenames])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the bandwidth scan from the command line
+
+    The potential, temperature, time step and birth-death options are
+    taken from the input file of the simulation
+
+    :param argv: command line arguments, defaults to sys.argv[2:]
+    """
+    cliargs = argparse.ArgumentParser(
+        prog="bdld bandwidth-scan",
+        description="Calculate the birth-death rates of walker positions "
+        "for several kernel bandwidths",
+    )
+    cliargs.add_argument("input", type=str, help="input file of the simulation")
+    cliargs.add_argument("positions", type=str, nargs="+", help="walker positions")
+    cliargs.add_argument(
+        "-b",
+        "--bandwidths",
+        type=str,
+        nargs="+",
+        required=True,
+        help="bandwidths to scan, comma-separated for different values per dimension",
+    )
+    cliargs.add_argument(
+        "--trajectories",
+        action="store_true",
+        help="positions are trajectory files, use the last line of each",
+    )
+    cliargs.add_argument(
+        "-o", "--output", type=str, help="write the summary to this file"
+    )
+    args = cliargs.parse_args(sys.argv[2:] if argv is None else argv)
+    log = logging.getLogger(__name__)
+
+    try:
+        config = inputparser.Input(args.input)
+    except FileNotFoundError:
+        log.error("Input file '%s' could not be found", args.input)
+        sys.exit(1)
+    except (inputparser.OptionError, inputparser.SectionError) as e:
+        log.error("Input file '%s': %s", args.input, e.args[0])
+        sys.exit(1)
+    if not config.birth_death:
+        log.error("Input file '%s' has no [birth-death] section", args.input)
+        sys.exit(1)
+    options = config.birth_death
+
+    pot = setup_potential(config.potential)
+    pos = load_positions(args.positions, args.trajectories)
+    if pos.shape[1] != pot.n_dim:
+        log.error("Positions do not have the dimensions of the potential")
+        sys.exit(1)
+    try:
+        bandwidths = parse_bandwidths(args.bandwidths, pot.n_dim)
+    except ValueError as e:
+        log.error(e.args[0])
+        sys.exit(1)
+    # set up like for the simulation to get the same kt and time step
+    ld = setup_ld(config.ld, pot)
+    approx_variant = get_approx_variant(options)
+    eq_density = None
+    if approx_variant != bd.ApproxVariant.orig:
+        # grid must be fine enough for the smallest bandwidth
+        cache = GridCache(options["cache-dir"]) if options["cache-dir"] else None
+        eq_density = bd_prob_density(pot, np.min(bandwidths, axis=0), ld.kt, cache)
+    print(
+        f"Scanning {len(bandwidths)} bandwidths for {len(pos)} walkers\n"
+        f"  using the {approx_variant.value} approximation\n"
+    )
+
+    summary = scan_bandwidths(
+        pos,
+        bandwidths,
+        pot.energy_batch(pos),
+        ld.kt,
+        ld.dt * options["stride"],
+        options["exponential-factor"],
+        approx_variant,
+        eq_density,
+        options["kernel"],
+        options["density-memory"],
+    )
+    fields = [f"bw_{i}" for i in range(pot.n_dim)] + SUMMARY_FIELDS
+    if args.output:
+        initialize_file(args.output, fields)
+        with open(args.output, "ab") as f:
+            np.savetxt(f, summary, fmt="%14.9f")
+    else:
+        print(" ".join(f"{field:>14}" for field in fields))
+        for row in summary:
+            print(" ".join(f"{value:14.6g}" for value in row))
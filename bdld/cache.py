@@ -0,0 +1,71 @@
+"""Cache of expensive grids (e.g. probability densities) in files on disk"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Dict
+
+from bdld import grid
+
+# change when the calculation of cached grids changes to invalidate old files
+CACHE_VERSION = 1
+
+
+class GridCache:
+    """Store grids in a directory with file names derived from their parameters
+
+    Each grid is identified by a name and a dictionary of all parameters it
+    was calculated from. A hash of both is used as file name,
+    so a grid is only reused if all parameters are identical.
+
+    :param directory: directory of the cache files
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Set up cache in given directory, which is created if necessary
+
+        :param directory: directory of the cache files
+        """
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def filename(self, name: str, params: Dict) -> str:
+        """Return path of the cache file for the grid
+
+        :param name: name of the cached grid
+        :param params: all parameters the grid depends on, must be JSON serializable
+        :return filename: path of the file
+        """
+        key = json.dumps(
+            {"name": name, "version": CACHE_VERSION, "params": params},
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}-{digest[:16]}.npz")
+
+    def get(self, name: str, params: Dict, func: Callable[[], grid.Grid]) -> grid.Grid:
+        """Load grid from the cache or calculate and store it
+
+        Unreadable cache files are ignored and overwritten
+
+        :param name: name of the cached grid
+        :param params: all parameters the grid depends on, must be JSON serializable
+        :param func: function without arguments that calculates the grid
+        :return grid: cached or newly calculated grid
+        """
+        filename = self.filename(name, params)
+        if os.path.isfile(filename):
+            try:
+                cached = grid.load(filename)
+                print(f"Loaded {name} from cache file '{filename}'")
+                return cached
+            except (OSError, ValueError, KeyError):
+                pass
+        new_grid = func()
+        # write to temporary file first to never leave incomplete cache files
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        new_grid.save(tmp_filename)
+        os.replace(tmp_filename, filename)
+        print(f"Saved {name} to cache file '{filename}'")
+        return new_grid
@@ -0,0 +1,221 @@
+"""Improved fast Gauss transform (IFGT)
+
+Approximates the discrete Gauss transform
+
+.. math::
+  G(y_j) = \\sum_i q_i \\exp(-|y_j - x_i|^2)
+
+of many source points x_i at many target points y_j in near-linear time
+with a guaranteed error bound.
+The sources are divided into clusters, and the contributions of each cluster
+are expanded in a truncated Taylor series around its center.
+Only clusters close enough to a target are taken into account.
+
+The coordinates need to be scaled beforehand such that the kernel has unit width,
+e.g. for a Gaussian with standard deviation sigma by dividing by sqrt(2) * sigma
+
+See C. Yang, R. Duraiswami and L. Davis, Efficient kernel machines using the improved
+fast Gauss transform, NIPS 2004 and V. C. Raykar et al., Fast computation of sums of
+Gaussians in high dimensions, CS-TR-4767, University of Maryland 2005
+"""
+
+import itertools
+from typing import Iterator, Optional, Tuple
+import numpy as np
+from scipy import special
+from scipy.spatial import cKDTree  # type: ignore
+
+# upper bound of the number of array elements in the intermediate arrays
+MAX_CHUNK_ELEMENTS = 2**22
+# candidates for the radius of the clusters
+CLUSTER_RADII = [0.3, 0.5, 0.8, 1.2, 1.8]
+
+
+def gauss_transform(
+    sources: np.ndarray,
+    targets: Optional[np.ndarray] = None,
+    weights: Optional[np.ndarray] = None,
+    tolerance: float = 1e-6,
+    cluster_radius: Optional[float] = None,
+) -> np.ndarray:
+    """Calculate the Gauss transform of the sources at the targets
+
+    The absolute error is guaranteed to be smaller than tolerance * sum(abs(weights))
+
+    :param sources: positions of the sources, shape (n_sources, n_dim)
+    :param targets: positions to evaluate, shape (n_targets, n_dim). Defaults to the sources
+    :param weights: weights of the sources, default 1 for all
+    :param tolerance: relative error tolerance, must be between 0 and 1
+    :param cluster_radius: maximum distance of the sources to their cluster center,
+                           chosen from an estimate of the computational cost if not given
+    :raises ValueError: if tolerance is not between 0 and 1
+    :return values: Gauss transform at each target
+    """
+    if not 0 < tolerance < 1:
+        raise ValueError("The tolerance of the Gauss transform must be between 0 and 1")
+    if targets is None:
+        targets = sources
+    if weights is None:
+        weights = np.ones(len(sources))
+    n_dim = sources.shape[1]
+    if cluster_radius is None:
+        cluster_radius = choose_cluster_radius(sources, targets, tolerance)
+    # split the error equally between neglected clusters and truncated expansions
+    cutoff = cluster_radius + np.sqrt(np.log(2 / tolerance))
+    order = expansion_order(cluster_radius, cutoff, tolerance / 2)
+    alphas, parents = multi_indices(n_dim, order)
+    factors = 2.0 ** np.sum(alphas, axis=1) / np.prod(special.factorial(alphas), axis=1)
+    centers, cluster = cluster_sources(sources, cluster_radius)
+
+    # Taylor coefficients of all clusters
+    coeffs = np.zeros((len(centers), len(alphas)))
+    for chunk in _chunks(len(sources), len(alphas)):
+        diff = sources[chunk] - centers[cluster[chunk]]
+        terms = monomials(diff, alphas, parents)
+        terms *= weights[chunk] * np.exp(-np.sum(diff**2, axis=1))
+        np.add.at(coeffs, cluster[chunk], terms.T)
+    coeffs *= factors
+
+    # evaluate the expansions of all clusters within the cutoff of each target
+    center_tree = cKDTree(centers)
+    values = np.zeros(len(targets))
+    for target_chunk in _chunks(len(targets), len(alphas)):
+        chunk_targets = targets[target_chunk]
+        pairs = cKDTree(chunk_targets).sparse_distance_matrix(
+            center_tree, cutoff, output_type="ndarray"
+        )
+        for chunk in _chunks(len(pairs), len(alphas)):
+            target, center = pairs["i"][chunk], pairs["j"][chunk]
+            terms = monomials(chunk_targets[target] - centers[center], alphas, parents)
+            expansion = np.einsum("tn,nt->n", terms, coeffs[center])
+            expansion *= np.exp(-pairs["v"][chunk] ** 2)
+            values[target_chunk] += np.bincount(target, expansion, len(chunk_targets))
+    return values
+
+
+def cluster_sources(
+    sources: np.ndarray, radius: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster the sources by putting them into the cells of a regular grid
+
+    The cells are chosen such that all sources are within the radius of the cell center
+
+    :param sources: positions of the sources, shape (n_sources, n_dim)
+    :param radius: maximum distance of the sources to their cluster center
+    :return (centers, cluster): centers of the non-empty cells and cluster index per source
+    """
+    side = 2 * radius / np.sqrt(sources.shape[1])
+    lower = sources.min(axis=0)
+    cells, cluster = np.unique(
+        np.floor((sources - lower) / side).astype(int), axis=0, return_inverse=True
+    )
+    return (lower + (cells + 0.5) * side, cluster.reshape(-1))
+
+
+def choose_cluster_radius(
+    sources: np.ndarray, targets: np.ndarray, tolerance: float
+) -> float:
+    """Choose the cluster radius with the lowest estimated computational cost
+
+    Larger clusters require higher expansion orders, but less clusters have to be
+    evaluated per target.
+    The number of clusters within the cutoff is estimated from a sample of the targets
+
+    :param sources: positions of the sources, shape (n_sources, n_dim)
+    :param targets: positions of the targets, shape (n_targets, n_dim)
+    :param tolerance: relative error tolerance
+    :return radius: cluster radius
+    """
+    n_dim = sources.shape[1]
+    sample = targets[:: max(len(targets) // 200, 1)]
+    best_cost, best_radius = np.inf, 0.0
+    for radius in CLUSTER_RADII:
+        cutoff = radius + np.sqrt(np.log(2 / tolerance))
+        n_terms = len(
+            multi_indices(n_dim, expansion_order(radius, cutoff, tolerance / 2))[0]
+        )
+        centers, _ = cluster_sources(sources, radius)
+        near_clusters = np.mean(
+            cKDTree(centers).query_ball_point(sample, cutoff, return_length=True)
+        )
+        cost = n_terms * (len(sources) + len(targets) * near_clusters)
+        if cost < best_cost:
+            best_cost, best_radius = cost, radius
+    return best_radius
+
+
+def expansion_order(radius: float, cutoff: float, tolerance: float) -> int:
+    """Smallest order of the Taylor expansion that satisfies the error bound
+
+    The truncation error of a single source is bounded by
+    (2^p / p!) a^p b^p exp(-(a - b)^2), with a the distance of the source
+    and b the distance of the target to the cluster center.
+    For each a the maximum over b is at b = (a + sqrt(a^2 + 2p)) / 2 >= a, or at the
+    cutoff if this is smaller. This maximum increases with a, so the bound is largest
+    for a = radius and is evaluated there analytically
+
+    :param radius: maximum distance of the sources to their cluster center
+    :param cutoff: maximum distance of the targets to the cluster center
+    :param tolerance: maximum error per source
+    :return order: order p of the expansion (maximum total degree + 1)
+    """
+    log_tol = np.log(tolerance)
+    order = 1
+    while True:
+        b = min((radius + np.sqrt(radius**2 + 2 * order)) / 2, cutoff)
+        log_bound = (
+            order * np.log(2 * radius * b)
+            - special.gammaln(order + 1)
+            - (radius - b) ** 2
+        )
+        if log_bound <= log_tol:
+            return order
+        order += 1
+
+
+def multi_indices(n_dim: int, order: int) -> Tuple[np.ndarray, np.ndarray]:
+    """All multi-indices alpha with total degree |alpha| < order, sorted by degree
+
+    Every multi-index except the first (all zeros) has a parent which differs only
+    by one in the first non-zero dimension, so the monomials can be calculated
+    with a single multiplication each
+
+    :param n_dim: number of dimensions
+    :param order: order of the expansion
+    :return (alphas, parents): arrays with shapes (n_terms, n_dim) and (n_terms,)
+    """
+    alphas = sorted(
+        (a for a in itertools.product(range(order), repeat=n_dim) if sum(a) < order),
+        key=lambda a: (sum(a), a),
+    )
+    index = {a: i for i, a in enumerate(alphas)}
+    parents = np.zeros(len(alphas), dtype=int)
+    for i, alpha in enumerate(alphas[1:], start=1):
+        parent = list(alpha)
+        parent[np.nonzero(alpha)[0][0]] -= 1
+        parents[i] = index[tuple(parent)]
+    return (np.array(alphas).reshape(-1, n_dim), parents)
+
+
+def monomials(diff: np.ndarray, alphas: np.ndarray, parents: np.ndarray) -> np.ndarray:
+    """Evaluate the monomials diff^alpha for all multi-indices
+
+    :param diff: coordinates, shape (n_points, n_dim)
+    :param alphas: multi-indices sorted by degree, shape (n_terms, n_dim)
+    :param parents: index of the parent multi-index, see multi_indices()
+    :return values: array with shape (n_terms, n_points)
+    """
+    coords = np.ascontiguousarray(diff.T)
+    values = np.empty((len(alphas), len(diff)))
+    values[0] = 1.0
+    for i in range(1, len(alphas)):
+        dim = np.nonzero(alphas[i] - alphas[parents[i]])[0][0]
+        np.multiply(values[parents[i]], coords[dim], out=values[i])
+    return values
+
+
+def _chunks(n_total: int, elements_per_item: int) -> Iterator[slice]:
+    """Split the items into chunks to limit the size of intermediate arrays"""
+    chunk_size = max(MAX_CHUNK_ELEMENTS // elements_per_item, 1)
+    for start in range(0, n_total, chunk_size):
+        yield slice(start, min(start + chunk_size, n_total))
@@ -1,26 +1,39 @@
 """Custom grid class that holds also the data"""
 
-from typing import Any, Callable, List, Union, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union, Tuple
 import copy
 import operator
+import os
 import numpy as np
-from scipy import signal
-from scipy import interpolate as sp_interpolate
+from scipy import ndimage, signal
 
 from bdld.helpers.misc import write_2d_sliced_to_file
 
 
 # types for arithmetic operations
 arith_types = Union[float, int, np.ndarray, "Grid"]
+# spline orders of the interpolation methods
+INTERPOLATION_ORDERS = {"nearest": 0, "linear": 1, "cubic": 3}
+# points added on each side before calculating the spline coefficients
+SPLINE_PADDING = 8
+# points per dimension of the block that is checked when verifying a convolution
+VERIFY_BLOCK_POINTS = 8
+# relative tolerance of the verification in the low-density block
+VERIFY_RTOL = 1e-6
+# number of grid points that are processed at once by the chunked functions
+CHUNK_POINTS = 2**20
 
 
 class Grid:
     """Rectangular grid with evenly distributed points
 
-    :param _data: Values at the grid points
+    :param _data: Values at the grid points, either in memory or memory-mapped file
     :param ranges: (min, max) of the grid points per dimension
     :param stepsizes: stepsizes between grid points per dimension
     :param n_points: number of points per dimension
+    :param _spline_coeffs: cached coefficients of the cubic interpolation
+    :param _cache: cached read-only axes and points, with the ranges and
+                   number of points they were calculated for
     """
 
     def __init__(self) -> None:
@@ -33,6 +46,8 @@ class Grid:
         self.n_points: List[int] = []
         self.stepsizes: List[float] = []
         self.n_dim: int = 0
+        self._spline_coeffs: Dict[int, np.ndarray] = {}
+        self._cache: Dict[str, Any] = {}
 
     @property
     def data(self):
@@ -44,11 +59,42 @@ class Grid:
 
     @data.setter
     def data(self, value):
-        """Setter checks if given values match grid points"""
+        """Setter checks if given values match grid points
+
+        For memory-mapped data the values are written to the file
+        """
         try:
-            self._data = value.reshape(self.n_points)
+            value = value.reshape(self.n_points)
         except ValueError as e:
             raise ValueError("Data does not fit into grid points") from e
+        if isinstance(self._data, np.memmap) and self._data.shape == value.shape:
+            self._data[...] = value
+        else:
+            self._data = value
+        self._spline_coeffs = {}
+
+    def use_memmap(self, filename: str, dtype: Optional[np.dtype] = None) -> None:
+        """Store the data in a memory-mapped .npy file instead of memory
+
+        Existing data is copied to the file, otherwise it is initialized with zeros.
+        Data that is set later is written to the file, so large grids never need to
+        be fully in memory. The file can be loaded again with np.load(mmap_mode="r")
+
+        :param filename: path of the file, is overwritten if it exists
+        :param dtype: data type of the file, defaults to the current one or float
+        """
+        has_data = self._data.shape == tuple(self.n_points)
+        if dtype is None:
+            dtype = self._data.dtype if has_data else np.dtype(float)
+        data = np.lib.format.open_memmap(
+            filename, mode="w+", dtype=dtype, shape=tuple(self.n_points)
+        )
+        if has_data:
+            flat = data.reshape(-1)
+            for chunk, _ in self.chunks(with_points=False):
+                flat[chunk] = self._data.reshape(-1)[chunk]
+        self._data = data
+        self._spline_coeffs = {}
 
     def __getitem__(self, key) -> np.ndarray:
         """Acces data element directly"""
@@ -57,6 +103,7 @@ class Grid:
     def __setitem__(self, key, value) -> None:
         """Set data element(s) directly"""
         self.data[key] = value
+        self._spline_coeffs = {}
 
     def _same_points(self, other) -> bool:
         return (self.n_points == other.n_points) and (self.ranges == other.ranges)
@@ -102,17 +149,40 @@ class Grid:
     def __pow__(self, other: arith_types):
         return self._perform_arithmetic_operation(other, operator.pow)
 
+    # in-place operators change the data without allocating a new grid
+    def __iadd__(self, other: arith_types):
+        return self._perform_inplace_operation(other, np.add)
+
+    def __isub__(self, other: arith_types):
+        return self._perform_inplace_operation(other, np.subtract)
+
+    def __imul__(self, other: arith_types):
+        return self._perform_inplace_operation(other, np.multiply)
+
+    def __itruediv__(self, other: arith_types):
+        return self._perform_inplace_operation(other, np.true_divide)
+
     # exp and log implementations allow usage of e.g. np.exp(my_grid)
-    def exp(self):
-        """Exponentiation of data, relies on numpy"""
-        return self._perform_math_on_self(np.exp)
+    def exp(self, inplace: bool = False):
+        """Exponentiation of data, relies on numpy
+
+        :param inplace: change the data of this grid instead of returning a new one
+        """
+        return self._perform_math_on_self(np.exp, inplace)
+
+    def log(self, inplace: bool = False):
+        """Logarithm of data, relies on numpy
 
-    def log(self):
-        """Logarithm of data, relies on numpy"""
-        return self._perform_math_on_self(np.log)
+        :param inplace: change the data of this grid instead of returning a new one
+        """
+        return self._perform_math_on_self(np.log, inplace)
 
     # Helper function to shorten implementations"""
-    def _perform_math_on_self(self, oper: Callable[..., Any]) -> "Grid":
+    def _perform_math_on_self(
+        self, oper: Callable[..., Any], inplace: bool = False
+    ) -> "Grid":
+        if inplace:
+            return self._perform_inplace_operation(None, oper)
         new_grid = self.copy_empty()
         new_grid.data = oper(self.data)
         return new_grid
@@ -137,23 +207,119 @@ class Grid:
             )
         return new_grid
 
+    def _perform_inplace_operation(
+        self, other: Union[arith_types, None], oper: Callable[..., Any]
+    ) -> "Grid":
+        """Apply numpy ufunc to the data in place, other=None for unary functions
+
+        Falls back to a new data array if the result can not be stored in the
+        data type (e.g. dividing integer data)
+        """
+        if isinstance(other, Grid):
+            if not self._same_points(other):
+                raise ValueError(
+                    "Performing math operations on grids with different points is ambiguous"
+                )
+            other = other.data
+        elif other is not None and not isinstance(other, (float, int, np.ndarray)):
+            raise ValueError(
+                f"Performing math operations with grid and {type(other)} is not supported"
+            )
+        args = (self._data,) if other is None else (self._data, other)
+        try:
+            oper(*args, out=self._data)
+        except TypeError:  # result can't be cast to the data type
+            self.data = oper(*args)
+        self._spline_coeffs = {}
+        return self
+
+    def _cached(self, name: str, func: Callable[[], Any]) -> Any:
+        """Return cached value that depends only on the grid points
+
+        The value is calculated again if the ranges or number of points changed
+        """
+        key = (tuple(tuple(r) for r in self.ranges), tuple(self.n_points))
+        if self._cache.get("key") != key:
+            self._cache = {"key": key}
+        if name not in self._cache:
+            self._cache[name] = func()
+        return self._cache[name]
+
     def axes(self) -> List[np.ndarray]:
-        """Return list of grid axes per dimension"""
-        return [
+        """Return list of grid axes per dimension
+
+        The axes are cached and read-only
+        """
+        return list(self._cached("axes", self._calc_axes))
+
+    def _calc_axes(self) -> List[np.ndarray]:
+        axes = [
             np.linspace(*self.ranges[i], self.n_points[i]) for i in range(self.n_dim)
         ]
+        for axis in axes:
+            axis.flags.writeable = False
+        return axes
 
     def points(self) -> np.ndarray:
-        """Return all grid points as a array of shape (n_points, dim) in row-major order"""
-        return np.array(np.meshgrid(*self.axes())).T.reshape(
+        """Return all grid points as a array of shape (n_points, dim) in row-major order
+
+        The points are cached and read-only
+        """
+        return self._cached("points", self._calc_points)
+
+    def _calc_points(self) -> np.ndarray:
+        points = np.stack(np.meshgrid(*self.axes(), indexing="ij"), axis=-1).reshape(
             np.prod(self.n_points), self.n_dim
         )
+        points.flags.writeable = False
+        return points
+
+    def chunks(
+        self, chunk_points: int = CHUNK_POINTS, with_points: bool = True
+    ) -> Iterator[Tuple[slice, Optional[np.ndarray]]]:
+        """Iterate over the grid points in chunks
 
-    def set_from_func(self, func: Callable[..., float]) -> None:
+        Only the points of the current chunk are calculated, so this never
+        creates the array of all points
+
+        :param chunk_points: maximal number of points per chunk
+        :param with_points: calculate the points of the chunks, otherwise None is returned
+        :return: generator of (slice of the flattened data, points of the chunk)
+        """
+        n_total = int(np.prod(self.n_points))
+        axes = self.axes()
+        for start in range(0, n_total, chunk_points):
+            stop = min(start + chunk_points, n_total)
+            points = None
+            if with_points:
+                indices = np.unravel_index(np.arange(start, stop), self.n_points)
+                points = np.column_stack([a[i] for a, i in zip(axes, indices)])
+            yield slice(start, stop), points
+
+    def set_from_func(self, func: Callable[..., Any], batched: bool = False) -> None:
         """Set data by applying function to all points
 
-        The function must accept the input in"""
-        self.data = np.array([func(p) for p in self.points()])
+        The points are passed in chunks, so the array of all points is not needed
+
+        :param func: function that accepts a single point as input and returns the value
+        :param batched: the function instead gets the points of a chunk at once as array
+                        of shape (n_chunk_points, n_dim) and returns all values
+        """
+        flat = None
+        for chunk, points in self.chunks():
+            if batched:
+                values = np.asarray(func(points))
+            else:
+                values = np.array([func(p) for p in points])
+            if flat is None:
+                if not (
+                    isinstance(self._data, np.memmap)
+                    and self._data.shape == tuple(self.n_points)
+                ):
+                    self._data = np.empty(self.n_points, dtype=values.dtype)
+                flat = self._data.reshape(-1)
+            flat[chunk] = values.reshape(chunk.stop - chunk.start)
+        self._spline_coeffs = {}
 
     def copy_empty(self):
         """Get a new independent grid instance with the same points but without data"""
@@ -167,15 +333,70 @@ class Grid:
     ) -> np.ndarray:
         """Interpolate grid data at the given points
 
-        The interpolation is done via scipy.interpolate.griddata, see there for details
-
-        :param points: the desired points
-        :param method: interpolation method to use, defaults to linear
-        :param fill_value: value for points outside the grid, defaults to nan
+        The points are directly converted to fractional indices of the grid and
+        interpolated with scipy.ndimage.map_coordinates, so no triangulation of the
+        grid points is needed.
+        "linear" interpolates multilinearly between the surrounding grid points,
+        "cubic" uses cubic splines whose coefficients are calculated once and reused
+        until the data is set again, and "nearest" uses the closest grid point.
+        For the splines the data is extended beyond the edges by point reflection,
+        which keeps the slope at the edges instead of forcing it to zero.
+        Note that changing single elements via the data array directly does not reset
+        the cached spline coefficients, use item assignment on the grid instead.
+
+        The shapes of points and result are the same as for scipy.interpolate.griddata
+
+        :param points: the desired points, array of shape (..., n_dim)
+                       or tuple of arrays with the coordinates per dimension
+        :param method: "nearest", "linear" or "cubic", defaults to linear
+        :param fill_value: value for points outside the grid, defaults to nan.
+                           Not used for "nearest", which always returns the closest value
+        :raises ValueError: if the method is unknown
         """
-        return sp_interpolate.griddata(
-            self.points(), self.data.flatten(), points, method, fill_value
-        )
+        if method not in INTERPOLATION_ORDERS:
+            raise ValueError(f"Unknown interpolation method '{method}'")
+        order = INTERPOLATION_ORDERS[method]
+        if isinstance(points, tuple):
+            points = np.stack(np.broadcast_arrays(*points), axis=-1)
+            out_shape = points.shape[:-1]
+        else:
+            points = np.asarray(points, dtype=float)
+            # griddata keeps the shape of the points in 1d
+            out_shape = points.shape if self.n_dim == 1 else points.shape[:-1]
+        points = points.reshape(-1, self.n_dim)
+
+        lower = np.array(self.ranges)[:, 0]
+        coords = (points - lower) / np.array(self.stepsizes)
+        max_index = np.array(self.n_points) - 1
+        # allow for rounding errors of points on the edges
+        eps = 1e-9 * np.maximum(max_index, 1)
+        outside = np.any((coords < -eps) | (coords > max_index + eps), axis=1)
+        coords = np.clip(coords, 0, max_index)
+        if order > 1:
+            if order not in self._spline_coeffs:
+                padded = np.pad(
+                    self.data.astype(float),
+                    SPLINE_PADDING,
+                    mode="reflect",
+                    reflect_type="odd",
+                )
+                self._spline_coeffs[order] = ndimage.spline_filter(
+                    padded, order, mode="mirror"
+                )
+            values = ndimage.map_coordinates(
+                self._spline_coeffs[order],
+                coords.T + SPLINE_PADDING,
+                order=order,
+                mode="mirror",
+                prefilter=False,
+            )
+        else:
+            values = ndimage.map_coordinates(
+                self.data.astype(float, copy=False), coords.T, order=order
+            )
+        if order > 0:
+            values[outside] = fill_value
+        return values.reshape(out_shape)
 
     def write_to_file(
         self, filename: str, fmt: str = "%.18e", header: str = ""
@@ -211,47 +432,334 @@ class Grid:
                 header,
             )
 
+    def save(self, filename: str) -> None:
+        """Save grid with its points and data to a binary .npz file
 
-def convolve(g1: Grid, g2: Grid, mode: str = "valid", method: str = "auto") -> Grid:
+        The grid can be read again with load()
+
+        :param filename: path of the file
+        """
+        with open(filename, "wb") as f:  # avoid numpy appending .npz to filename
+            np.savez(
+                f,
+                data=self.data,
+                ranges=np.array(self.ranges, dtype=float),
+                n_points=np.array(self.n_points, dtype=int),
+                stepsizes=np.array(self.stepsizes, dtype=float),
+            )
+
+
+def load(filename: str) -> Grid:
+    """Load grid from a .npz file written by Grid.save()
+
+    The stepsizes are read from the file instead of calculated again,
+    so the grid can be convolved with grids created from the same stepsizes
+
+    :param filename: path of the file
+    :return grid: Grid instance with data
+    """
+    with np.load(filename) as f:
+        grid = from_npoints(
+            [tuple(r) for r in f["ranges"].tolist()], f["n_points"].tolist()
+        )
+        grid.stepsizes = f["stepsizes"].tolist()
+        grid.data = f["data"]
+    return grid
+
+
+def convolve(
+    g1: Grid,
+    g2: Grid,
+    mode: str = "valid",
+    method: str = "auto",
+    floor: Optional[float] = None,
+    verify: bool = False,
+    filename: Optional[str] = None,
+) -> Grid:
     """Perform convolution between two grids via scipy.signal.convolve
 
     Grids must have same dimensions and stepsizes.
     The convolution is also correctly normalized by the stepsizes.
 
+    The "fft" method is much faster for large grids, but has rounding errors relative
+    to the largest value, so values that should be tiny can be zero or negative.
+    For non-negative data the floor can be used to clamp them to a positive value
+    that is small relative to the maximum, e.g. before taking the logarithm.
+
     :param g1, g2: grids to convolute
     :param mode: convolution mode, see scipy.signal.convolve for details
     :param method: one of "direct", "fft" or "auto" (the default)
+    :param floor: clamp all values below floor times the largest absolute value
+                  to this limit (optional)
+    :param verify: compare a block of points around the largest and one around
+                   the smallest value with the direct convolution
+    :param filename: store the result in a memory-mapped .npy file (optional).
+                     The convolution is then calculated in chunks along the first
+                     dimension, so the full result is never in memory
     :raises ValueError: if g1 and g2 have different stepsizes
     :raises NotImplementedError: if mode="full"
+    :raises RuntimeError: if the verification fails
     :return grid: New grid containing the convolutin
     """
     if not g1.stepsizes == g2.stepsizes:
         raise ValueError("Spacing of grids does not match")
-    stepsizes = g1.stepsizes
-    n_dim = g1.n_dim
-    # to get the correct values in the continuous limit: multiply by stepsizes
-    conv = signal.convolve(g1.data, g2.data, mode=mode, method=method) * np.prod(
-        g1.stepsizes
-    )
     # also get the corresponding grid points depending on the mode
     if mode == "same":  # easiest case, mirrors grid of first argument
         grid = g1.copy_empty()
     if mode == "valid":  # need to do some math: subtract smaller from larger grid
-        n_points = []
-        ranges = []
         # sort by points to find smaller grid (conv throws error if not in all dim)
         gs, gl = sorted([g1, g2], key=lambda g: g.n_points)
-        for dim in range(n_dim):
-            n_points.append(gl.n_points[dim] - gs.n_points[dim] + 1)
-            offset = (gs.n_points[dim] - 1) / 2 * stepsizes[dim]
-            ranges.append((gl.ranges[dim][0] + offset, gl.ranges[dim][1] - offset))
-        grid = from_npoints(ranges, n_points)
+        grid = _valid_grid(gl, gs.n_points)
+        g1, g2 = gl, gs  # convolution is commutative
+    if mode == "full":
+        raise NotImplementedError
+    if filename is None:
+        # to get the correct values in the continuous limit: multiply by stepsizes
+        conv = signal.convolve(g1.data, g2.data, mode=mode, method=method) * np.prod(
+            g1.stepsizes
+        )
+        kernel = g2.data
+        scale = np.prod(g1.stepsizes)
+    else:
+        kernel = g2.data * np.prod(g1.stepsizes)
+        scale = 1.0
+        conv = np.lib.format.open_memmap(
+            filename, mode="w+", dtype=float, shape=tuple(grid.n_points)
+        )
+        _convolve_chunked(g1.data, kernel, mode, method, conv)
+    if verify:
+        _verify_convolution(g1.data, kernel * scale, conv, mode, floor)
+    if floor is not None:
+        _apply_floor(conv, floor)
+    grid.data = conv
+    return grid
+
+
+def convolve_separable(
+    g: Grid,
+    kernels: List[np.ndarray],
+    mode: str = "valid",
+    method: str = "auto",
+    floor: Optional[float] = None,
+    verify: bool = False,
+    filename: Optional[str] = None,
+) -> Grid:
+    """Convolve grid with a separable kernel, i.e. a product of 1d kernels per dimension
+
+    The 1d kernels are applied one after another along their axis, so the cost scales with
+    the sum instead of the product of the kernel points and the kernel grid is never created.
+    The values of the 1d kernels must be given at the stepsizes of the grid.
+    The result is the same as convolve() with the full kernel grid.
+
+    :param g: grid to convolute
+    :param kernels: values of the 1d kernel per dimension
+    :param mode: convolution mode, "same" or "valid"
+    :param method: one of "direct", "fft" or "auto" (the default)
+    :param floor: clamp all values below floor times the largest absolute value
+                  to this limit (optional), see convolve()
+    :param verify: compare a block of points around the largest and one around
+                   the smallest value of each 1d convolution with the direct convolution
+    :param filename: store the result in a memory-mapped .npy file (optional).
+                     The 1d convolutions are calculated in chunks, with the
+                     intermediate results in temporary files next to it
+    :raises ValueError: if the number of kernels does not match the grid dimensions
+    :raises NotImplementedError: if mode="full"
+    :raises RuntimeError: if the verification fails
+    :return grid: New grid containing the convolution
+    """
+    if len(kernels) != g.n_dim:
+        raise ValueError("Number of kernels does not match the grid dimensions")
     if mode == "full":
         raise NotImplementedError
+    conv = g.data
+    tmp_filename = None
+    for dim, kernel in enumerate(kernels):
+        shape = [1] * g.n_dim
+        shape[dim] = len(kernel)
+        # normalize with the stepsize as for the full convolution
+        kernel = np.reshape(kernel, shape) * g.stepsizes[dim]
+        if filename is None:
+            new_conv = signal.convolve(conv, kernel, mode=mode, method=method)
+        else:
+            new_shape = list(conv.shape)
+            if mode == "valid":
+                new_shape[dim] -= shape[dim] - 1
+            # only the last convolution is written to the result file
+            new_filename = filename
+            if dim != g.n_dim - 1:
+                new_filename = f"{filename}.{dim}.tmp"
+            new_conv = np.lib.format.open_memmap(
+                new_filename, mode="w+", dtype=float, shape=tuple(new_shape)
+            )
+            _convolve_chunked(conv, kernel, mode, method, new_conv)
+        if verify:
+            _verify_convolution(conv, kernel, new_conv, mode, floor)
+        conv = new_conv
+        if tmp_filename:  # intermediate result of the previous dimension
+            os.remove(tmp_filename)
+            tmp_filename = None
+        if filename and new_filename != filename:
+            tmp_filename = new_filename
+    if floor is not None:
+        _apply_floor(conv, floor)
+    if mode == "same":
+        grid = g.copy_empty()
+    else:
+        grid = _valid_grid(g, [len(kernel) for kernel in kernels])
     grid.data = conv
     return grid
 
 
+def _convolve_chunked(
+    data1: np.ndarray, data2: np.ndarray, mode: str, method: str, out: np.ndarray
+) -> None:
+    """Convolve in chunks along the first dimension and store the result in out
+
+    The full convolution of each chunk is added to the overlapping part of the output
+    (overlap-add), so only the chunks need to be in memory and out can be memory-mapped.
+    data1 must not be smaller than data2 in "valid" mode
+
+    :param data1, data2: arrays to convolve
+    :param mode: convolution mode, "same" or "valid"
+    :param method: one of "direct", "fft" or "auto"
+    :param out: array for the result, must be initialized with zeros
+    """
+    # offsets of the output in the full convolution per dimension
+    offsets = [(n - 1) // 2 if mode == "same" else n - 1 for n in data2.shape]
+    crop = tuple(slice(o, o + n) for o, n in zip(offsets[1:], out.shape[1:]))
+    chunk_rows = max(CHUNK_POINTS // max(int(np.prod(data1.shape[1:])), 1), 1)
+    for start in range(0, data1.shape[0], chunk_rows):
+        part = signal.convolve(
+            data1[start : start + chunk_rows], data2, mode="full", method=method
+        )
+        part = part[(slice(None),) + crop]
+        # rows of the part in the output, can be partially outside
+        lower = start - offsets[0]
+        out_lower = max(lower, 0)
+        out_upper = min(lower + len(part), len(out))
+        if out_lower < out_upper:
+            out[out_lower:out_upper] += part[out_lower - lower : out_upper - lower]
+
+
+def _apply_floor(data: np.ndarray, floor: float) -> None:
+    """Clamp values below floor times the largest absolute value in chunks, in place"""
+    flat = data.reshape(-1)
+    chunks = [slice(i, i + CHUNK_POINTS) for i in range(0, len(flat), CHUNK_POINTS)]
+    maximum = max((np.max(np.abs(flat[chunk])) for chunk in chunks), default=0.0)
+    for chunk in chunks:
+        np.maximum(flat[chunk], floor * maximum, out=flat[chunk])
+
+
+def _valid_grid(g: Grid, kernel_points: List[int]) -> Grid:
+    """Return empty grid of the points of a "valid" convolution
+
+    :param g: larger grid of the convolution
+    :param kernel_points: number of points per dimension of the smaller grid
+    :return grid: grid shrunk by half the kernel on each side
+    """
+    n_points = []
+    ranges = []
+    for dim in range(g.n_dim):
+        n_points.append(g.n_points[dim] - kernel_points[dim] + 1)
+        offset = (kernel_points[dim] - 1) / 2 * g.stepsizes[dim]
+        ranges.append((g.ranges[dim][0] + offset, g.ranges[dim][1] - offset))
+    return from_npoints(ranges, n_points)
+
+
+def _verify_convolution(
+    data1: np.ndarray,
+    data2: np.ndarray,
+    conv: np.ndarray,
+    mode: str,
+    floor: Optional[float] = None,
+) -> None:
+    """Compare two blocks of a convolution with the direct calculation
+
+    The blocks of up to VERIFY_BLOCK_POINTS per dimension are centered on the largest
+    value and on the smallest value that is not clamped by the floor afterwards.
+    The difference must be within the typical rounding errors of the FFT, i.e. a small
+    multiple of the machine precision times the largest value.
+    If a floor is given, the block around the smallest value must additionally have a
+    relative difference below VERIFY_RTOL or an absolute difference below the floor
+    times the largest value, so the values that are not clamped keep their precision
+
+    :param data1, data2: arrays that were convolved
+    :param conv: result of the convolution (before normalizing with the stepsizes)
+    :param mode: convolution mode, "same" or "valid"
+    :param floor: floor relative to the largest value that is applied afterwards (optional)
+    :raises RuntimeError: if a block does not match
+    """
+    if mode == "valid" and data1.shape[0] < data2.shape[0]:
+        data1, data2 = data2, data1  # scipy swaps for valid mode
+    flat = conv.reshape(-1)
+    chunks = [slice(i, i + CHUNK_POINTS) for i in range(0, len(flat), CHUNK_POINTS)]
+    largest = (-np.inf, 0)
+    for chunk in chunks:
+        index = np.argmax(np.abs(flat[chunk]))
+        largest = max(largest, (abs(flat[chunk][index]), chunk.start + index))
+    maximum = max(largest[0], 0.0)
+    tolerance = 1e3 * np.finfo(float).eps * maximum
+    # smallest value above the floor, searched in chunks to avoid copies of the data
+    threshold = (floor or 0.0) * maximum
+    smallest = (np.inf, 0)
+    for chunk in chunks:
+        values = np.abs(flat[chunk])
+        values[values < threshold] = np.inf
+        index = np.argmin(values)
+        smallest = min(smallest, (values[index], chunk.start + index))
+    for name, index in [("largest", largest[1]), ("smallest", smallest[1])]:
+        center = np.unravel_index(index, conv.shape)
+        block, direct = _direct_convolution_block(
+            data1, data2, conv.shape, center, mode
+        )
+        block_tolerance = np.full(direct.shape, tolerance)
+        if name == "smallest" and floor is not None:
+            relative_tolerance = np.maximum(VERIFY_RTOL * np.abs(direct), threshold)
+            block_tolerance = np.minimum(block_tolerance, relative_tolerance)
+        error = np.abs(conv[block] - direct)
+        if np.any(error > block_tolerance):
+            raise RuntimeError(
+                f"Convolution deviates by {np.max(error)} from the direct calculation "
+                f"around the {name} value (tolerance {np.min(block_tolerance)})"
+            )
+
+
+def _direct_convolution_block(
+    data1: np.ndarray,
+    data2: np.ndarray,
+    shape: Tuple[int, ...],
+    center: Tuple[int, ...],
+    mode: str,
+) -> Tuple[Tuple[slice, ...], np.ndarray]:
+    """Calculate a block of the convolution directly
+
+    :param data1, data2: arrays that were convolved, data1 is the larger one
+    :param shape: shape of the convolution
+    :param center: index of the center of the block in the convolution
+    :param mode: convolution mode, "same" or "valid"
+    :return block, direct: slices of the block in the convolution and its values
+    """
+    block = []
+    window = []
+    pad = []
+    for dim, n_conv in enumerate(shape):
+        n1, n2 = data1.shape[dim], data2.shape[dim]
+        size = min(VERIFY_BLOCK_POINTS, n_conv)
+        start = min(max(center[dim] - size // 2, 0), n_conv - size)
+        block.append(slice(start, start + size))
+        # offset of the output in the full convolution
+        offset = (n2 - 1) // 2 if mode == "same" else n2 - 1
+        # input points needed for the block, padded with zeros outside
+        lower = start + offset - (n2 - 1)
+        upper = start + offset + size
+        window.append(slice(max(lower, 0), min(upper, n1)))
+        pad.append((max(-lower, 0), max(upper - n1, 0)))
+    direct = signal.convolve(
+        np.pad(data1[tuple(window)], pad), data2, mode="valid", method="direct"
+    )
+    return tuple(block), direct
+
+
 def stepsizes_from_npoints(
     ranges: List[Tuple[float, float]], n_points: List[int]
 ) -> List[float]:
@@ -331,5 +839,38 @@ def sparsify(g: Grid, max_points: List[int], method: str = "linear") -> Grid:
         n if n <= max_points[i] else max_points[i] for i, n in enumerate(g.n_points)
     ]
     sparse_grid = from_npoints(g.ranges, sparse_n_points)
-    sparse_grid.data = g.interpolate(sparse_grid.points(), method)
+    sparse_grid.set_from_func(lambda p: g.interpolate(p, method), batched=True)
     return sparse_grid
+
+
+def nd_trapz(
+    data: np.ndarray,
+    dx: Union[List[float], float],
+    weights: Optional[np.ndarray] = None,
+) -> float:
+    """Calculate a multidimensional integral via recursive usage of the trapezoidal rule
+
+    Uses numpy's trapz for the 1d integrals. The data is integrated in chunks along
+    the first dimension, so it can also be memory-mapped
+
+    :param data: values to integrate
+    :param dx: distances between datapoints per dimension
+    :param weights: integrate the product of data and weights (optional),
+                    without creating the full product array
+    :return integral: integral value
+    """
+    if not isinstance(dx, list):  # single dimension
+        return np.trapz(data if weights is None else data * weights, dx=dx)
+    if not dx:
+        return data
+    row_points = max(int(np.prod(data.shape[1:])), 1)
+    chunk_rows = max(CHUNK_POINTS // row_points, 1)
+    row_integrals = np.empty(data.shape[0])
+    for start in range(0, data.shape[0], chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        chunk = data[rows] if weights is None else data[rows] * weights[rows]
+        # integrate the last dimension first
+        for step in reversed(dx[1:]):
+            chunk = np.trapz(chunk, dx=step)
+        row_integrals[rows] = chunk
+    return np.trapz(row_integrals, dx=dx[0])
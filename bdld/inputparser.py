@@ -20,6 +20,7 @@ from typing import (
     Type,
 )
 
+from bdld.actions import birth_death
 
 BuiltinType = Union[str, float, int, bool]
 OptionType = Union[BuiltinType, List[BuiltinType], None]
@@ -186,6 +187,9 @@ class Input:
             InputOption("timestep", float, True, Input.positive_or_zero),
             InputOption("n_steps", int, True, Input.positive),
             InputOption("seed", int, False),
+            InputOption("batched", bool, False, None, True),
+            InputOption("noise-block-steps", int, False, Input.positive),
+            InputOption("noise-chunk-size", int, False, Input.positive, 1024),
         ]
         if ld_type == "bussi-parinello":
             options += [
@@ -231,6 +235,27 @@ class Input:
                 InputOption("scaling-factor", float, False),
                 InputOption("n_dim", int, False, default=2),
             ]
+        elif pot_type == "tabulated":
+            interpolation_methods = ["linear", "cubic"]
+            allowed_interpolation = Condition(
+                lambda x: x in interpolation_methods,
+                f"must be one of {interpolation_methods}",
+            )
+            options = [
+                type_option,
+                InputOption("n_dim", int, True, Input.at_most_3dim),
+                InputOption("grid-file", str, False),
+                InputOption("table-file", str, False),
+                InputOption(
+                    "interpolation", str, False, allowed_interpolation, "linear"
+                ),
+            ]
+            if "grid-file" not in section and "table-file" not in section:
+                raise OptionError(
+                    "Either this or 'table-file' must be specified",
+                    "grid-file",
+                    section.name,
+                )
         else:
             raise OptionError(
                 f'Specified potential type "{pot_type}" is not implemented',
@@ -276,6 +301,17 @@ class Input:
 
     def parse_birth_death(self, section: configparser.SectionProxy) -> None:
         """Define and parse the options of the potential"""
+        allowed_density_methods = Condition(
+            lambda x: x in birth_death.DENSITY_METHODS,
+            f"must be one of {birth_death.DENSITY_METHODS}",
+        )
+        allowed_kernels = Condition(
+            lambda x: x in birth_death.KERNELS,
+            f"must be one of {birth_death.KERNELS}",
+        )
+        between_zero_and_one = Condition(
+            lambda x: 0 < x < 1, "must be between zero and one"
+        )
         options = [
             InputOption("stride", int, True, Input.positive),
             InputOption(
@@ -287,6 +323,39 @@ class Input:
             InputOption("stats-stride", int, False, Input.positive),
             InputOption("stats-filename", str, False),
             InputOption("seed", int, False),
+            InputOption("density-method", str, False, allowed_density_methods, "auto"),
+            InputOption(
+                "density-cutoff",
+                float,
+                False,
+                Input.positive,
+                birth_death.DEFAULT_DENSITY_CUTOFF,
+            ),
+            InputOption(
+                "density-memory",
+                float,
+                False,
+                Input.positive,
+                birth_death.DEFAULT_DENSITY_MEMORY,
+            ),
+            InputOption(
+                "density-grid-spacing",
+                float,
+                False,
+                Input.positive,
+                birth_death.DEFAULT_DENSITY_GRID_SPACING,
+            ),
+            InputOption(
+                "density-tolerance",
+                float,
+                False,
+                between_zero_and_one,
+                birth_death.DEFAULT_DENSITY_TOLERANCE,
+            ),
+            InputOption("incremental-updates", bool, False, None, False),
+            InputOption("neighbor-list-skin", float, False, Input.positive_or_zero),
+            InputOption("kernel", str, False, allowed_kernels, "gaussian"),
+            InputOption("cache-dir", str, False),
         ]
 
         if self.potential["n_dim"] == 1:
@@ -296,6 +365,33 @@ class Input:
                 InputOption("kernel-bandwidth", [float], True, Input.all_positive)
             )
         self.birth_death = self.parse_section(section, options)
+        if (
+            self.birth_death["neighbor-list-skin"] is not None
+            and self.birth_death["density-method"] != "kdtree"
+        ):
+            raise OptionError(
+                "Neighbor lists can only be used with the kdtree density method",
+                "neighbor-list-skin",
+                section.name,
+            )
+        if (
+            self.birth_death["density-method"] == "ifgt"
+            and self.birth_death["kernel"] != "gaussian"
+        ):
+            raise OptionError(
+                "The ifgt density method only supports the gaussian kernel",
+                "kernel",
+                section.name,
+            )
+        if self.birth_death["incremental-updates"] and self.birth_death[
+            "density-method"
+        ] in ["binned", "ifgt"]:
+            raise OptionError(
+                "Incremental updates are not possible with the approximate "
+                f"{self.birth_death['density-method']} density method",
+                "incremental-updates",
+                section.name,
+            )
 
     def parse_trajectories(self, section: configparser.SectionProxy) -> None:
         """Define and parse the options for trajectory output"""
@@ -3,13 +3,22 @@
 import argparse
 from collections import OrderedDict
 import logging
-from typing import cast, Dict, List, Union
+from typing import cast, Dict, List, Optional, Union
 import sys
 
 import numpy as np
 
-from bdld import actions, inputparser, potential
+from bdld import actions, bandwidth_scan, inputparser, potential
+from bdld.cache import GridCache
 from bdld.grid import Grid
+from bdld.system_setup import (
+    bd_prob_density,
+    bd_prob_density_params,
+    bd_prob_grid_points,
+    get_approx_variant,
+    setup_ld,
+    setup_potential,
+)
 from bdld.tools import pos_inside_ranges
 
 # alias shortcuts
@@ -27,7 +36,7 @@ ParticleDistributionAction = actions.particle_distribution.ParticleDistributionA
 Potential = potential.potential.Potential
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     """Main function of simulation
 
     Does these things (in order):
@@ -37,7 +46,19 @@ def main() -> None:
         3. set up all actions
         4. run the main loop for the desired time steps
         5. run final actions
+
+    If the first argument is "bandwidth-scan", the bandwidth scan is run instead,
+    see the bandwidth_scan module
+
+    :param argv: command line arguments, defaults to sys.argv[1:]
     """
+    if argv is None:
+        argv = sys.argv[1:]
+    # diagnostic subcommand with its own arguments, it is not a simulation run
+    if argv[:1] == ["bandwidth-scan"]:
+        bandwidth_scan.main(argv[1:])
+        return
+
     version = "0.3.2"
     print(f"Starting bdld code v{version}\n\n")
 
@@ -51,7 +72,7 @@ def main() -> None:
         dest="log_level",
         help="Logging level, default 'warning'",
     )
-    args = cliargs.parse_args()
+    args = cliargs.parse_args(argv)
 
     log = init_logger(args.log_level)
 
@@ -111,10 +132,9 @@ def main() -> None:
 
     # iterating over OrderedDict is slow, cache as list
     actions_list = list(actions_dict.values())
-    # main loop
-    for step in range(1, n_steps + 1):
-        for action in actions_list:
-            action.run(step)
+    # main loop: the scheduler runs the other actions only at steps they are due
+    scheduler = actions.action.Scheduler(ld, actions_list[1:])
+    scheduler.run(n_steps)
 
     print("Simulation finished, performing final actions")
     for action in actions_list:
@@ -123,61 +143,6 @@ def main() -> None:
     print("Finished without errors")
 
 
-def setup_potential(options: Dict) -> Potential:
-    """Return potential from given options"""
-    if options["type"] == "polynomial":
-        if options["n_dim"] == 1:
-            ranges = [(options["min"], options["max"])]
-            pot: Potential = potential.polynomial.PolynomialPotential(
-                options["coeffs"], ranges
-            )
-        else:
-            ranges = list(zip(options["min"], options["max"]))
-            coeffs = potential.polynomial.coefficients_from_file(
-                options["coeffs-file"], options["n_dim"]
-            )
-            pot = potential.polynomial.PolynomialPotential(coeffs, ranges)
-    elif options["type"] == "mueller-brown":
-        pot = potential.mueller_brown.MuellerBrownPotential(options["scaling-factor"])
-    else:
-        raise inputparser.OptionError(
-            f'Specified potential type "{options["type"]}" is not implemented',
-            "type",
-            "potential",
-        )
-
-    bc = options["boundary-condition"]
-    if bc == "reflective":
-        pot.boundary_condition = potential.potential.BoundaryCondition.reflective
-    elif bc == "periodic":
-        pot.boundary_condition = potential.potential.BoundaryCondition.periodic
-    return pot
-
-
-def setup_ld(options: Dict, pot: Potential) -> LdType:
-    """Return Langevin Dynamics with given options on the potential"""
-    if options["type"] == "bussi-parinello":
-        return BussiParinelloLD(
-            pot,
-            options["timestep"],
-            options["friction"],
-            options["kt"],
-            options["seed"],
-        )
-    elif options["type"] == "overdamped":
-        return OverdampedLD(
-            pot,
-            options["timestep"],
-            options["seed"],
-        )
-    else:
-        raise inputparser.OptionError(
-            f'Specified LD type "{options["type"]}" is not implemented',
-            "type",
-            "ld",
-        )
-
-
 def init_particles(options: Dict, ld: LdType) -> None:
     """Add particles to ld with the given algorithm
 
@@ -236,27 +201,22 @@ def setup_birth_death(options: Dict, ld: BussiParinelloLD) -> BirthDeath:
             "birth-death",
         )
 
-    # helper function to avoid duplication. Can be removed when correction-variant is removed
-    def get_approx_variant(key):
-        if options[key]:
-            try:
-                approx_variant = ApproxVariant.from_str(options[key])
-            except KeyError as err:
-                e = "The specified {} could not be understood".format(key)
-                raise inputparser.OptionError(e, "birth-death", key) from err
-            return approx_variant
-        return None
-
     ApproxVariant = actions.birth_death.ApproxVariant
-    approx_variant = ApproxVariant.orig  # default
-    # currently both are accepted but approximation-variant has precedence
-    for key in ["correction-variant", "approximation-variant"]:
-        # keep previous if not existing
-        approx_variant = get_approx_variant(key) or approx_variant
-
+    approx_variant = get_approx_variant(options)
     eq_density = None
+    approx_grid = None
     if approx_variant in [ApproxVariant.add, ApproxVariant.mult]:
-        eq_density = bd_prob_density(ld.pot, bd_bw, ld.kt)
+        if options["cache-dir"]:
+            approx_grid = bd_approximation_grid(
+                ld.pot,
+                bd_bw,
+                ld.kt,
+                approx_variant,
+                options["kernel"],
+                GridCache(options["cache-dir"]),
+            )
+        else:
+            eq_density = bd_prob_density(ld.pot, bd_bw, ld.kt)
     return BirthDeath(
         ld.particles,
         ld.dt,
@@ -270,31 +230,65 @@ def setup_birth_death(options: Dict, ld: BussiParinelloLD) -> BirthDeath:
         options["seed"] + 1000 if options["seed"] else None,
         options["stats-stride"],
         options["stats-filename"],
+        options["density-method"],
+        options["density-cutoff"],
+        options["density-memory"],
+        options["density-grid-spacing"],
+        options["density-tolerance"],
+        options["incremental-updates"],
+        options["neighbor-list-skin"],
+        options["kernel"],
+        approx_grid,
     )
 
 
-def bd_prob_density(pot: Potential, bd_bw: np.ndarray, kt: float) -> Grid:
-    """Return probability density grid needed for BirthDeath
-
-    This is usually a unknown quantity, so this has to be replaced by an estimate
-    in the future. E.g. enforce usage of the histogram and use that as estimate at
-    current time with iterative updates
-
-    Because of the current free choice of points, we use rather a lot and make
-    sure the Kernel grid will have at least 20 points per dimension within 5 sigma
-
-    :return prob_grid: Grid of the probability density
+def bd_approximation_grid(
+    pot: Potential,
+    bd_bw: np.ndarray,
+    kt: float,
+    approx_variant: "actions.birth_death.ApproxVariant",
+    kernel: str,
+    cache: GridCache,
+) -> Optional[Grid]:
+    """Return grid with the correction terms of the birth-death approximation from cache
+
+    The grid is only calculated if it is not in the cache, and then also the
+    probability density is taken from the cache if possible.
+    This avoids the expensive calculations on the large probability density grid
+    when running a simulation of the same system again, e.g. with other seeds
+
+    :param pot: potential of the simulation
+    :param bd_bw: bandwidth of the birth-death kernel per dimension
+    :param kt: thermal energy of the system
+    :param approx_variant: type of approximation
+    :param kernel: kernel function of the birth-death algorithm
+    :param cache: cache to load the grids from or store them in
+    :return approx_grid: grid for the approximation, None for the original one
     """
-    n_grid_points = []
-    for dim, r in enumerate(pot.ranges):
-        # check minimal number of points for 20 points within 5 sigma
-        min_points_gaussian = int(np.ceil((r[1] - r[0]) / (0.5 * bd_bw[dim])))
-        # the large number of points is only used to calculate the correction once
-        tmp_grid_points = max(501, min_points_gaussian)
-        if tmp_grid_points % 2 == 0:
-            tmp_grid_points += 1  # odd number is better for convolution
-        n_grid_points.append(tmp_grid_points)
-    return pot.calculate_probability_density(kt, pot.ranges, n_grid_points)
+    if approx_variant == actions.birth_death.ApproxVariant.orig:
+        return None
+    n_grid_points = bd_prob_grid_points(pot, bd_bw)
+    eq_density_params = bd_prob_density_params(pot, kt, n_grid_points)
+
+    def calc_approximation_grid() -> Grid:
+        eq_density = cache.get(
+            "eq-density",
+            eq_density_params,
+            lambda: pot.calculate_probability_density(kt, pot.ranges, n_grid_points),
+        )
+        return actions.birth_death.approximation_grid(
+            approx_variant, eq_density, bd_bw, kernel
+        )
+
+    # the approximation depends on everything the probability density depends on
+    params = {
+        "eq-density": eq_density_params,
+        "bw": bd_bw.tolist(),
+        "kernel": kernel,
+    }
+    return cache.get(
+        f"approximation-{approx_variant.value}", params, calc_approximation_grid
+    )
 
 
 def setup_trajectories(options: Dict, ld: LdType) -> TrajectoryAction:
@@ -380,7 +374,7 @@ def setup_particle_distribution(
     state_ranges = inputparser.min_max_to_ranges(min_list, max_list)
 
     return ParticleDistributionAction(
-        ld.particles,  # type: ignore
+        ld.particles,
         state_ranges,
         options["stride"],
         options["filename"],
@@ -0,0 +1,137 @@
+"""Verlet neighbor lists of walkers that are reused over several steps"""
+
+from typing import List, Optional, Tuple
+import numpy as np
+from scipy.spatial import cKDTree  # type: ignore
+
+
+class NeighborList:
+    """List of all pairs of walkers within the cutoff plus a skin distance
+
+    The pairs are found with a KD-tree and stored once per pair as two index arrays.
+    As long as no walker has moved more than half of the skin since the list was built,
+    all pairs that are currently closer than the cutoff are still in the list,
+    so it does not need to be rebuilt.
+
+    When walkers are replaced by copies of other walkers (birth-death moves),
+    the list is patched instead: the copy inherits the pairs and the reference
+    position of the walker it was copied from.
+
+    :param cutoff: distance within which all pairs are required
+    :param skin: additional distance that allows the walkers to move
+    :param first: first walker of each pair
+    :param second: second walker of each pair, always larger than first
+    :param ref_pos: positions of the walkers when the list was built
+    :param n_builds: number of times the list was built from scratch
+    """
+
+    # upper bound of the pairs per chunk when building the list
+    max_chunk_pairs = 2**22
+
+    def __init__(self, cutoff: float, skin: float) -> None:
+        """Create empty neighbor list
+
+        :param cutoff: distance within which all pairs are required
+        :param skin: additional distance that allows the walkers to move
+        :raises ValueError: if the skin is negative
+        """
+        if skin < 0:
+            raise ValueError("The skin of the neighbor list can not be negative")
+        self.cutoff: float = cutoff
+        self.skin: float = skin
+        self.first: np.ndarray = np.empty(0, dtype=int)
+        self.second: np.ndarray = np.empty(0, dtype=int)
+        self.ref_pos: Optional[np.ndarray] = None
+        self.n_builds: int = 0
+
+    def __len__(self) -> int:
+        """Number of pairs in the list"""
+        return len(self.first)
+
+    def update(self, pos: np.ndarray) -> bool:
+        """Rebuild the list if any walker moved more than half the skin
+
+        :param pos: current positions of the walkers
+        :return rebuilt: True if the list was built from scratch
+        """
+        if self.ref_pos is None or self.ref_pos.shape != pos.shape:
+            self.build(pos)
+            return True
+        max_disp_sq = np.max(np.sum((pos - self.ref_pos) ** 2, axis=1), initial=0.0)
+        if max_disp_sq > (self.skin / 2) ** 2:
+            self.build(pos)
+            return True
+        return False
+
+    def build(self, pos: np.ndarray) -> None:
+        """Find all pairs within cutoff plus skin
+
+        To limit the memory usage, the pairs are searched for chunks of walkers
+
+        :param pos: current positions of the walkers
+        """
+        n_walkers = len(pos)
+        tree = cKDTree(pos)
+        first: List[np.ndarray] = []
+        second: List[np.ndarray] = []
+        start = 0
+        chunk_size = 1024
+        while start < n_walkers:
+            end = min(start + chunk_size, n_walkers)
+            pairs = cKDTree(pos[start:end]).sparse_distance_matrix(
+                tree, self.cutoff + self.skin, output_type="ndarray"
+            )
+            i = pairs["i"] + start
+            mask = pairs["j"] > i
+            first.append(i[mask])
+            second.append(pairs["j"][mask])
+            # adapt chunk size to the number of neighbors
+            neighbors = max(len(pairs) / (end - start), 1)
+            chunk_size = max(int(self.max_chunk_pairs / neighbors), 1)
+            start = end
+        self.first = np.concatenate(first) if first else np.empty(0, dtype=int)
+        self.second = np.concatenate(second) if second else np.empty(0, dtype=int)
+        self.ref_pos = np.array(pos)
+        self.n_builds += 1
+
+    def copy_walkers(self, event_list: List[Tuple[int, int]]) -> None:
+        """Patch the list after walkers were replaced by copies of others
+
+        The events are applied in order, so a walker can be a copy of a copy.
+        Every walker inherits the pairs and the reference position of the
+        walker it originates from, and all copies of the same walker are
+        neighbors of each other.
+
+        :param event_list: List with Tuples (i, j): walker j was replaced by a copy of i
+        """
+        if self.ref_pos is None or not event_list:
+            return
+        n_walkers = len(self.ref_pos)
+        origin = np.arange(n_walkers)
+        for dup, kill in event_list:
+            origin[kill] = origin[dup]
+        # walkers grouped by the walker they originate from
+        members = np.argsort(origin, kind="stable")
+        n_members = np.bincount(origin, minlength=n_walkers)
+        offsets = np.concatenate(([0], np.cumsum(n_members)[:-1]))
+
+        # every old pair connects all copies of both walkers
+        n_new = n_members[self.first] * n_members[self.second]
+        pair = np.repeat(np.arange(len(self.first)), n_new)
+        local = np.arange(len(pair)) - np.repeat(np.cumsum(n_new) - n_new, n_new)
+        n_second = n_members[self.second[pair]]
+        new_first = members[offsets[self.first[pair]] + local // n_second]
+        new_second = members[offsets[self.second[pair]] + local % n_second]
+        # pairs between copies of the same walker
+        group_first = [new_first]
+        group_second = [new_second]
+        for group in np.nonzero(n_members > 1)[0]:
+            copies = members[offsets[group] : offsets[group] + n_members[group]]
+            i, j = np.triu_indices(len(copies), 1)
+            group_first.append(copies[i])
+            group_second.append(copies[j])
+        new_first = np.concatenate(group_first)
+        new_second = np.concatenate(group_second)
+        self.first = np.minimum(new_first, new_second)
+        self.second = np.maximum(new_first, new_second)
+        self.ref_pos = self.ref_pos[origin]
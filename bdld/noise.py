@@ -0,0 +1,86 @@
+"""Pre-generated blocks of random noise for the Langevin dynamics"""
+
+from typing import List, Optional
+import numpy as np
+
+
+class NoiseBuffer:
+    """Draw standard normal noise for many walkers and time steps at once
+
+    The noise is generated in blocks of several time steps, so the overhead of calling
+    the random number generator is spread over many steps.
+
+    The walkers are divided into chunks of fixed size, and every chunk draws its noise
+    from an independent random stream spawned from a common numpy.random.SeedSequence.
+    The noise of a walker therefore only depends on the seed and the chunk it belongs to,
+    so the results are reproducible regardless of the order (or parallel execution)
+    in which the chunks are generated.
+
+    :param n_dim: number of dimensions of the noise vectors
+    :param draws: number of noise vectors per walker and time step
+    :param block_steps: number of time steps to generate at once
+    :param chunk_size: number of walkers sharing the same random stream
+    :param seed_seq: SeedSequence the random streams are spawned from
+    :param rngs: random number generator per chunk
+    """
+
+    def __init__(
+        self,
+        n_dim: int,
+        draws: int = 1,
+        seed: Optional[int] = None,
+        block_steps: int = 100,
+        chunk_size: int = 1024,
+    ) -> None:
+        """Set up the buffer, the noise is generated on the first request
+
+        :param n_dim: number of dimensions of the noise vectors
+        :param draws: number of noise vectors per walker and time step, default 1
+        :param seed: seed for the random streams, optional
+        :param block_steps: number of time steps to generate at once, default 100
+        :param chunk_size: number of walkers sharing the same random stream, default 1024
+        :raises ValueError: if block_steps or chunk_size are not positive
+        """
+        if block_steps < 1 or chunk_size < 1:
+            raise ValueError("Block steps and chunk size of noise must be positive")
+        self.n_dim: int = n_dim
+        self.draws: int = draws
+        self.block_steps: int = block_steps
+        self.chunk_size: int = chunk_size
+        self.seed_seq: np.random.SeedSequence = np.random.SeedSequence(seed)
+        self.rngs: List[np.random.Generator] = []
+        # walkers are the first axis so that the chunks are contiguous in memory
+        self._block: np.ndarray = np.empty((0, 0, draws, n_dim))
+        self._step: int = 0
+
+    def next(self, n_walkers: int) -> np.ndarray:
+        """Get the noise for the next time step
+
+        If the number of walkers changed since the last call, the remaining noise
+        of the current block is discarded
+
+        :param n_walkers: number of walkers
+        :return noise: array with shape (n_walkers, draws, n_dim)
+        """
+        if self._step >= self._block.shape[1] or len(self._block) != n_walkers:
+            self._fill(n_walkers)
+        noise = self._block[:, self._step]
+        self._step += 1
+        return noise
+
+    def _fill(self, n_walkers: int) -> None:
+        """Generate the next block of noise for all walkers
+
+        :param n_walkers: number of walkers
+        """
+        n_chunks = -(-n_walkers // self.chunk_size)  # ceil
+        if len(self.rngs) < n_chunks:
+            children = self.seed_seq.spawn(n_chunks - len(self.rngs))
+            self.rngs += [np.random.default_rng(child) for child in children]
+        block = np.empty((n_walkers, self.block_steps, self.draws, self.n_dim))
+        for i, rng in enumerate(self.rngs[:n_chunks]):
+            rng.standard_normal(
+                out=block[i * self.chunk_size : (i + 1) * self.chunk_size]
+            )
+        self._block = block
+        self._step = 0
@@ -1,6 +1,6 @@
-"""MD particle class"""
+"""MD particle class and container for many walkers"""
 
-from typing import List, Optional, Union
+from typing import Iterator, List, Optional, Sequence, Union
 import numpy as np
 
 
@@ -44,3 +44,343 @@ class Particle:
                 "Dimensions of position and momentum do not match: %d vs %d"
                 % (len(self.pos), len(self.mom))
             )
+
+
+class WalkerEnsemble:
+    """Collection of walkers stored as contiguous arrays ("structure of arrays")
+
+    Instead of having one Particle object per walker, all properties of the walkers
+    are stored in arrays whose first index is the walker number.
+    This allows to operate on all walkers at once without collecting the data first.
+
+    The arrays returned by the attributes are views of internal buffers that grow
+    when adding walkers. Actions should therefore store a reference to the ensemble
+    and not to the arrays themselves.
+
+    For code that works on single particles, indexing or iterating over the ensemble
+    returns Walker objects that behave like Particles but directly access the arrays.
+
+    :param n_dim: number of dimensions of the walker positions
+    :param pos: positions of the walkers, shape (n_walkers, n_dim)
+    :param mom: momenta of the walkers, shape (n_walkers, n_dim)
+    :param forces: last force evaluation of the walkers, shape (n_walkers, n_dim)
+    :param energy: last energy evaluation of the walkers, shape (n_walkers,)
+    :param mass: masses of the walkers, shape (n_walkers,)
+    :param c2: thermostat constant of the walkers (mass dependent), shape (n_walkers,)
+    """
+
+    def __init__(self, n_dim: int, capacity: int = 16) -> None:
+        """Create empty ensemble
+
+        :param n_dim: number of dimensions of the walker positions
+        :param capacity: initial number of walkers that fit into the buffers
+        """
+        self.n_dim: int = n_dim
+        self._n_walkers: int = 0
+        capacity = max(capacity, 1)
+        self._pos = np.zeros((capacity, n_dim))
+        self._mom = np.zeros((capacity, n_dim))
+        self._forces = np.zeros((capacity, n_dim))
+        self._energy = np.zeros(capacity)
+        self._mass = np.ones(capacity)
+        self._c2 = np.zeros(capacity)
+
+    @classmethod
+    def from_particles(
+        cls, particles: Sequence[Particle], n_dim: Optional[int] = None
+    ) -> "WalkerEnsemble":
+        """Create ensemble holding copies of the given particles
+
+        Attributes the particles don't have (e.g. c2 for LDParticles) are zeroed
+
+        :param particles: particles to copy
+        :param n_dim: dimensions of the walkers, only needed if no particles are given
+        :return ensemble: new WalkerEnsemble instance
+        """
+        if particles:
+            n_dim = len(particles[0].pos)
+        ensemble = cls(n_dim or 0, len(particles))
+        for p in particles:
+            ensemble.add(p.pos)
+            ensemble[-1] = p  # copies all attributes
+        return ensemble
+
+    # data members are views of the used part of the buffers
+    @property
+    def pos(self) -> np.ndarray:
+        """Positions of the walkers"""
+        return self._pos[: self._n_walkers]
+
+    @pos.setter
+    def pos(self, value: np.ndarray) -> None:
+        self._pos[: self._n_walkers] = value
+
+    @property
+    def mom(self) -> np.ndarray:
+        """Momenta of the walkers"""
+        return self._mom[: self._n_walkers]
+
+    @mom.setter
+    def mom(self, value: np.ndarray) -> None:
+        self._mom[: self._n_walkers] = value
+
+    @property
+    def forces(self) -> np.ndarray:
+        """Forces acting on the walkers (from last evaluation)"""
+        return self._forces[: self._n_walkers]
+
+    @forces.setter
+    def forces(self, value: np.ndarray) -> None:
+        self._forces[: self._n_walkers] = value
+
+    @property
+    def energy(self) -> np.ndarray:
+        """Energies of the walkers (from last evaluation)"""
+        return self._energy[: self._n_walkers]
+
+    @energy.setter
+    def energy(self, value: np.ndarray) -> None:
+        self._energy[: self._n_walkers] = value
+
+    @property
+    def mass(self) -> np.ndarray:
+        """Masses of the walkers"""
+        return self._mass[: self._n_walkers]
+
+    @mass.setter
+    def mass(self, value: np.ndarray) -> None:
+        self._mass[: self._n_walkers] = value
+
+    @property
+    def c2(self) -> np.ndarray:
+        """Thermostat constants of the walkers"""
+        return self._c2[: self._n_walkers]
+
+    @c2.setter
+    def c2(self, value: np.ndarray) -> None:
+        self._c2[: self._n_walkers] = value
+
+    def __len__(self) -> int:
+        return self._n_walkers
+
+    def __getitem__(self, index: int) -> "Walker":
+        """Return particle-like view of a single walker"""
+        return Walker(self, self._check_index(index))
+
+    def __setitem__(self, index: int, particle: Particle) -> None:
+        """Overwrite the walker at index with the properties of a (particle-like) object
+
+        Attributes that are not present are set to zero
+        """
+        index = self._check_index(index)
+        if isinstance(particle, Walker) and particle.ensemble is self:
+            self.copy_walker(particle.index, index)
+            return
+        self._pos[index] = particle.pos
+        self._mom[index] = particle.mom
+        self._mass[index] = particle.mass
+        forces = getattr(particle, "forces", None)
+        if forces is None or len(forces) != self.n_dim:
+            forces = 0.0
+        self._forces[index] = forces
+        self._energy[index] = getattr(particle, "energy", 0.0)
+        self._c2[index] = getattr(particle, "c2", 0.0)
+
+    def __iter__(self) -> Iterator["Walker"]:
+        return (Walker(self, i) for i in range(self._n_walkers))
+
+    def _check_index(self, index: int) -> int:
+        """Return non-negative index and check if it is valid
+
+        :raises IndexError: if the index is out of range
+        """
+        if index < 0:
+            index += self._n_walkers
+        if not 0 <= index < self._n_walkers:
+            raise IndexError("Walker index out of range")
+        return index
+
+    def _buffers(self) -> List[np.ndarray]:
+        return [self._pos, self._mom, self._forces, self._energy, self._mass, self._c2]
+
+    def _grow(self, min_capacity: int) -> None:
+        """Enlarge the buffers to hold at least min_capacity walkers (amortized doubling)"""
+        capacity = len(self._pos)
+        if min_capacity <= capacity:
+            return
+        capacity = max(min_capacity, 2 * capacity)
+        new_buffers = []
+        for buf in self._buffers():
+            new_buf = np.zeros((capacity,) + buf.shape[1:])
+            new_buf[: self._n_walkers] = buf[: self._n_walkers]
+            new_buffers.append(new_buf)
+        (
+            self._pos,
+            self._mom,
+            self._forces,
+            self._energy,
+            self._mass,
+            self._c2,
+        ) = new_buffers
+        self._mass[self._n_walkers :] = 1.0
+
+    def add(
+        self,
+        pos: Union[float, List[float], np.ndarray],
+        mom: Optional[Union[float, List[float], np.ndarray]] = None,
+        mass: float = 1.0,
+        index: Optional[int] = None,
+    ) -> "Walker":
+        """Add walker to ensemble
+
+        Energy, forces and c2 of the new walker are zero and have to be set by the caller
+
+        :param pos: position of the walker
+        :param mom: optional momentum of walker, will be zeroed if not given
+        :param mass: mass of walker, defaults to 1.0
+        :param index: insert walker at this position, defaults to None (append)
+        :raises ValueError: if the dimensions of pos or mom do not match the ensemble
+        :return walker: view of the new walker
+        """
+        pos = np.atleast_1d(np.asarray(pos, dtype=float))
+        if len(pos) != self.n_dim:
+            raise ValueError(
+                "Dimensions of walker and ensemble do not match: %d vs %d"
+                % (len(pos), self.n_dim)
+            )
+        mom = np.zeros(self.n_dim) if mom is None else np.atleast_1d(mom)
+        if len(mom) != self.n_dim:
+            raise ValueError(
+                "Dimensions of position and momentum do not match: %d vs %d"
+                % (self.n_dim, len(mom))
+            )
+        self._grow(self._n_walkers + 1)
+        n = self._n_walkers
+        if index is None:
+            index = n
+        else:
+            if index < 0:
+                index += n
+            if not 0 <= index <= n:
+                raise IndexError("Walker index out of range")
+            for buf in self._buffers():  # shift following walkers by one
+                buf[index + 1 : n + 1] = buf[index:n]
+        self._n_walkers += 1
+        self._pos[index] = pos
+        self._mom[index] = mom
+        self._forces[index] = 0.0
+        self._energy[index] = 0.0
+        self._mass[index] = mass
+        self._c2[index] = 0.0
+        return Walker(self, index)
+
+    def remove(self, index: int) -> None:
+        """Remove walker from ensemble
+
+        :param index: number of the walker to remove
+        """
+        index = self._check_index(index)
+        n = self._n_walkers
+        for buf in self._buffers():
+            buf[index : n - 1] = buf[index + 1 : n]
+        self._n_walkers -= 1
+
+    def copy_walker(self, source: int, dest: int) -> None:
+        """Overwrite all properties of walker dest with the ones of walker source
+
+        :param source: number of walker to copy
+        :param dest: number of walker to overwrite
+        """
+        for buf in self._buffers():
+            buf[dest] = buf[source]
+
+    def copy_walkers(self, sources: Sequence[int], dests: Sequence[int]) -> None:
+        """Overwrite many walkers with copies of others at once
+
+        The result is the same as calling copy_walker() for all pairs in order,
+        i.e. a walker can also be overwritten by a walker that was itself replaced
+        before. The chains of copies are resolved first, so every buffer is only
+        indexed once
+
+        :param sources: numbers of the walkers to copy
+        :param dests: numbers of the walkers to overwrite, same length as sources
+        """
+        origin = np.arange(self._n_walkers)
+        for source, dest in zip(sources, dests):
+            origin[dest] = origin[source]
+        changed = np.nonzero(origin != np.arange(self._n_walkers))[0]
+        for buf in self._buffers():
+            buf[changed] = buf[origin[changed]]
+
+
+class Walker(Particle):
+    """Particle-like view of a single walker of a WalkerEnsemble
+
+    All attributes directly access the arrays of the ensemble, e.g.
+    `walker.pos += 1` moves the walker inside the ensemble.
+    The view refers to the index of the walker, so it should not be kept around
+    when walkers are inserted or removed.
+
+    :param ensemble: the ensemble the walker belongs to
+    :param index: number of the walker in the ensemble
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, ensemble: WalkerEnsemble, index: int):
+        """Create view, the base class constructor is not called on purpose"""
+        self.ensemble = ensemble
+        self.index = index
+
+    @property
+    def pos(self) -> np.ndarray:
+        """Position of walker (view of ensemble array)"""
+        return self.ensemble.pos[self.index]
+
+    @pos.setter
+    def pos(self, value) -> None:
+        self.ensemble.pos[self.index] = value
+
+    @property
+    def mom(self) -> np.ndarray:
+        """Momentum of walker (view of ensemble array)"""
+        return self.ensemble.mom[self.index]
+
+    @mom.setter
+    def mom(self, value) -> None:
+        self.ensemble.mom[self.index] = value
+
+    @property
+    def forces(self) -> np.ndarray:
+        """Forces acting on the walker (view of ensemble array)"""
+        return self.ensemble.forces[self.index]
+
+    @forces.setter
+    def forces(self, value) -> None:
+        self.ensemble.forces[self.index] = value
+
+    @property
+    def energy(self) -> float:
+        """Energy of walker"""
+        return self.ensemble.energy[self.index]
+
+    @energy.setter
+    def energy(self, value: float) -> None:
+        self.ensemble.energy[self.index] = value
+
+    @property
+    def mass(self) -> float:
+        """Mass of walker"""
+        return self.ensemble.mass[self.index]
+
+    @mass.setter
+    def mass(self, value: float) -> None:
+        self.ensemble.mass[self.index] = value
+
+    @property
+    def c2(self) -> float:
+        """Thermostat constant of walker"""
+        return self.ensemble.c2[self.index]
+
+    @c2.setter
+    def c2(self, value: float) -> None:
+        self.ensemble.c2[self.index] = value
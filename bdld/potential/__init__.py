@@ -3,6 +3,7 @@
 from . import mueller_brown
 from . import polynomial
 from . import potential
+from . import tabulated
 
 # when doing `from bdld.potential import *` (not recommended)
-__all__ = ["mueller_brown", "polynomial", "potential"]
+__all__ = ["mueller_brown", "polynomial", "potential", "tabulated"]
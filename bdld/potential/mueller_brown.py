@@ -122,3 +122,41 @@ class MuellerBrownPotential(Potential):
                 -A[i] * (b[i] * (x - x0[i]) + 2.0 * c[i] * (y - y0[i])) * exp_tmp1
             )
         return force
+
+    def evaluate_batch(self, pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get energies and forces at multiple positions
+
+        The four exponential terms are evaluated for all positions at once by
+        broadcasting the coordinates against the coefficient arrays
+
+        :param pos: positions to be evaluated, shape (n_pos, 2)
+        :return: (energies, forces) with shapes (n_pos,) and (n_pos, 2)
+        """
+        exp_terms, dx, dy = self._exp_terms(pos)
+        energies = np.sum(exp_terms, axis=1) + pot_shift
+        forces = np.empty((len(energies), 2))
+        forces[:, 0] = -np.sum((2.0 * a * dx + b * dy) * exp_terms, axis=1)
+        forces[:, 1] = -np.sum((b * dx + 2.0 * c * dy) * exp_terms, axis=1)
+        return (energies, forces)
+
+    def energy_batch(self, pos: np.ndarray) -> np.ndarray:
+        """Get energies at multiple positions
+
+        :param pos: positions to be evaluated, shape (n_pos, 2)
+        :return: energies with shape (n_pos,)
+        """
+        return np.sum(self._exp_terms(pos)[0], axis=1) + pot_shift
+
+    @staticmethod
+    def _exp_terms(pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the four exponential terms (including prefactor) at all positions
+
+        :param pos: positions to be evaluated, shape (n_pos, 2)
+        :return: (terms, dx, dy) with shape (n_pos, 4) each, where dx and dy are the
+                 distances to the centers of the terms
+        """
+        pos = np.asarray(pos, dtype=float)
+        dx = pos[:, 0, np.newaxis] - x0
+        dy = pos[:, 1, np.newaxis] - y0
+        terms = A * np.exp(a * dx**2 + b * dx * dy + c * dy**2)
+        return (terms, dx, dy)
@@ -11,8 +11,12 @@ poly = np.polynomial.polynomial
 class PolynomialPotential(Potential):
     """Simple polynomial potential class defined by coefficients
 
+    Energies and forces are evaluated together by contracting tables with the powers
+    of the coordinates with the coefficient tensors (see evaluate_batch())
+
     :param coeffs: Coefficients of polynomial potential
     :param der: Coefficients of derivative of potential per direction
+                (trailing zeros are removed)
     :param n_dim: Dimensions of potential
     :param polyval: polyval function of np.polynomial.polynomial to use
     :param ranges: (min, max) values of potential (optional)
@@ -37,10 +41,12 @@ class PolynomialPotential(Potential):
                 "Class can't be used for potentials in more than 3 dimensions"
             )
         self.n_dim: int = self.coeffs.ndim
-        # note: the derivative matrices are larger than needed. Implement trim_zeros for multiple dimensions?
+        # the derivatives still contain the zeros of the other directions: trim them
         self.der: List[np.ndarray] = [
-            poly.polyder(self.coeffs, axis=d) for d in range(self.n_dim)
+            trim_zeros_nd(poly.polyder(self.coeffs, axis=d)) for d in range(self.n_dim)
         ]
+        # trimmed coefficients for the evaluation via the power tables
+        self._trimmed_coeffs: np.ndarray = trim_zeros_nd(self.coeffs.astype(float))
         self.polyval = self.set_polyval()
         # the ranges are at the moment not actually checked when evaluating but needed for the birth/death
         if ranges is None:
@@ -83,6 +89,85 @@ class PolynomialPotential(Potential):
         """
         return np.array([-self.polyval(*pos, self.der[d]) for d in range(self.n_dim)])
 
+    def evaluate(self, pos: Union[List[float], np.ndarray]) -> Tuple[float, np.ndarray]:
+        """Get energy and forces at position in one pass, see evaluate_batch()
+
+        :param pos: position to be evaluated (given as list or array even in 1d)
+        :return: (energy, forces)
+        """
+        energies, forces = self.evaluate_batch(np.asarray(pos, dtype=float)[np.newaxis])
+        return (energies[0], forces[0])
+
+    def evaluate_batch(self, pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get energies and forces at multiple positions in one pass
+
+        The powers of the coordinates are calculated only once per dimension and then
+        contracted with the (trimmed) coefficient tensors of the potential and its
+        derivatives
+
+        :param pos: positions to be evaluated, shape (n_pos, n_dim)
+        :return: (energies, forces) with shapes (n_pos,) and (n_pos, n_dim)
+        """
+        tables = self._power_tables(pos)
+        energies = contract_power_tables(tables, self._trimmed_coeffs)
+        forces = np.empty((len(energies), self.n_dim))
+        for d, der in enumerate(self.der):
+            forces[:, d] = -contract_power_tables(tables, der)
+        return (energies, forces)
+
+    def energy_batch(self, pos: np.ndarray) -> np.ndarray:
+        """Get energies at multiple positions
+
+        :param pos: positions to be evaluated, shape (n_pos, n_dim)
+        :return: energies with shape (n_pos,)
+        """
+        return contract_power_tables(self._power_tables(pos), self._trimmed_coeffs)
+
+    def _power_tables(self, pos: np.ndarray) -> List[np.ndarray]:
+        """Return the powers x^k of the coordinates needed for the polynomial
+
+        :param pos: positions, shape (n_pos, n_dim)
+        :return tables: list with one array of shape (n_pos, order) per dimension
+        """
+        coords = np.asarray(pos, dtype=float).reshape(-1, self.n_dim).T
+        return [
+            np.vander(x, n, increasing=True)
+            for x, n in zip(coords, self._trimmed_coeffs.shape)
+        ]
+
+
+def trim_zeros_nd(arr: np.ndarray) -> np.ndarray:
+    """Remove trailing zeros of an n-dimensional array along all axes
+
+    At least one element per axis is kept
+
+    :param arr: array to trim
+    :return trimmed: view of the array without the trailing zeros
+    """
+    nonzero = np.nonzero(arr)
+    if nonzero[0].size == 0:
+        return arr[tuple(slice(0, 1) for _ in range(arr.ndim))]
+    return arr[tuple(slice(0, idx.max() + 1) for idx in nonzero)]
+
+
+def contract_power_tables(tables: List[np.ndarray], coeffs: np.ndarray) -> np.ndarray:
+    """Evaluate polynomial from tables with the powers of the coordinates
+
+    Calculates sum_{i,j,...} coeffs[i,j,...] * x^i * y^j * ... for all positions.
+    The tables may contain higher powers than needed for the coefficients
+
+    :param tables: powers of the coordinates per dimension, shape (n_pos, >= order)
+    :param coeffs: coefficient tensor of the polynomial
+    :return values: polynomial values at all positions, shape (n_pos,)
+    """
+    n_pos = len(tables[0])
+    # contract first dimension via matrix product, then the remaining ones
+    res = tables[0][:, : coeffs.shape[0]] @ coeffs.reshape(coeffs.shape[0], -1)
+    for d in range(1, coeffs.ndim):
+        res = res.reshape(n_pos, coeffs.shape[d], -1)
+        res = np.einsum("nij,ni->nj", res, tables[d][:, : coeffs.shape[d]])
+    return res.reshape(n_pos)
+
 
 def coefficients_from_file(filename: str, n_dim: int) -> np.ndarray:
     """Read coefficients from file
@@ -1,7 +1,8 @@
 """Potential class to be evaluated with md"""
 
 import enum
-from typing import Callable, List, Union, Tuple
+import hashlib
+from typing import Any, Callable, List, Optional, Union, Tuple
 import numpy as np
 
 from bdld import grid
@@ -20,6 +21,10 @@ class Potential:
     Collection of some functionality that all should have
     All derived potentials must implement energy() and force() functions
     and set some description in __str__()
+
+    The batched functions evaluate_batch() and energy_batch() work on many positions at
+    once. They fall back to evaluating the positions one by one, so derived classes
+    should overwrite them with vectorized versions
     """
 
     def __init__(self):
@@ -28,6 +33,7 @@ class Potential:
         self.ranges: List[Tuple[float, float]] = []
         self._boundary_condition = None  # default
         self.apply_boundary_condition: Callable = lambda: None
+        self.apply_boundary_condition_batch: Callable = lambda: None
         self._set_boundary_condition_function()
 
     def evaluate(self, pos: Union[List[float], np.ndarray]) -> Tuple[float, np.ndarray]:
@@ -38,6 +44,32 @@ class Potential:
         """
         return (self.energy(pos), self.force(pos))
 
+    def evaluate_batch(self, pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get potential energies and forces at multiple positions at once
+
+        This generic version simply evaluates all positions one after another,
+        derived classes should overwrite it with a vectorized version
+
+        :param pos: positions to be evaluated, shape (n_pos, n_dim)
+        :return: (energies, forces) with shapes (n_pos,) and (n_pos, n_dim)
+        """
+        energies = np.empty(len(pos))
+        forces = np.empty((len(pos), self.n_dim))
+        for i, p in enumerate(pos):
+            energies[i], forces[i] = self.evaluate(p)
+        return (energies, forces)
+
+    def energy_batch(self, pos: np.ndarray) -> np.ndarray:
+        """Get energies at multiple positions at once
+
+        This generic version simply evaluates all positions one after another,
+        derived classes should overwrite it with a vectorized version
+
+        :param pos: positions to be evaluated, shape (n_pos, n_dim)
+        :return: energies with shape (n_pos,)
+        """
+        return np.fromiter((self.energy(p) for p in pos), np.float64, len(pos))
+
     def energy(self, pos: Union[List[float], np.ndarray]) -> float:
         """Get energy at position, needs to be overriden by derived class
 
@@ -67,7 +99,7 @@ class Potential:
         :param bool mintozero: shift fes minimum to zero
         :return fes: list numpy array with fes values at positions
         """
-        fes = np.fromiter((self.energy(p) for p in pos), np.float64, len(pos))
+        fes = self.energy_batch(np.asarray(pos, dtype=float))
         if mintozero:
             fes -= np.min(fes)
         return fes
@@ -77,12 +109,15 @@ class Potential:
         kt: float,
         ranges: List[Tuple[float, float]],
         grid_points: List[int],
+        filename: Optional[str] = None,
     ) -> grid.Grid:
         """Calculate the probability density associated with the potential on a grid
 
         :param kt: Thermal energy of system
         :param ranges: List of ranges of the grid per dimension (min, max)
         :param grid_points: number of points per dimension
+        :param filename: store the grid in a memory-mapped .npy file instead of memory
+                         (optional), for very large grids
         :raises ValueError: if dimensions of points or ranges and potential do not match
         :return prob: grid with normalized probablities
         """
@@ -91,12 +126,32 @@ class Potential:
         if len(grid_points) != self.n_dim:
             raise ValueError("Dimension of grid_points do not match potential")
         fes = grid.from_npoints(ranges, grid_points)
-        fes.set_from_func(self.energy)
-        prob = np.exp(-fes / kt)
+        if filename:
+            fes.use_memmap(filename)
+        fes.set_from_func(self.energy_batch, batched=True)
+        # in-place operations to avoid temporary copies of the large grid
+        fes /= -kt
+        prob = fes.exp(inplace=True)
         # normalize with volume element from stepsizes
         prob /= np.sum(prob.data) * np.prod(prob.stepsizes)
         return prob
 
+    def fingerprint(self) -> str:
+        """Return hash that identifies the definition of the potential
+
+        All data members that are not functions are hashed together with the class name,
+        so two potentials with the same fingerprint have the same energies.
+        This is used as key to cache quantities calculated from the potential
+
+        :return fingerprint: hexadecimal SHA-256 hash
+        """
+        digest = hashlib.sha256(type(self).__name__.encode())
+        for name, value in sorted(vars(self).items()):
+            if not callable(value):
+                digest.update(name.encode())
+                _update_digest(digest, value)
+        return digest.hexdigest()
+
     def get_fields(self) -> List[str]:
         """Return list of identifiers for the potential dimensions
 
@@ -126,16 +181,25 @@ class Potential:
         self._set_boundary_condition_function()
 
     def _set_boundary_condition_function(self) -> None:
-        """Set correct apply_boundary_condition function"""
+        """Set correct apply_boundary_condition functions for single and many walkers"""
         if self.boundary_condition is None:
             func = lambda pos, force: None  # do nothing
+            batch_func = func
         elif self.boundary_condition == BoundaryCondition.reflective:
             func = self.apply_boundary_condition_reflective
+            batch_func = self.apply_boundary_condition_reflective_batch
         elif self.boundary_condition == BoundaryCondition.periodic:
             func = self.apply_boundary_condition_periodic
+            batch_func = self.apply_boundary_condition_periodic_batch
         else:
             raise ValueError("Unknown boundary condition set")
         self.apply_boundary_condition = func
+        self.apply_boundary_condition_batch = batch_func
+
+    def _range_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return lower and upper bounds of the ranges as arrays"""
+        bounds = np.array(self.ranges, dtype=float).reshape(-1, 2)
+        return (bounds[:, 0], bounds[:, 1])
 
     def apply_boundary_condition_reflective(
         self, pos: np.ndarray, mom: np.ndarray
@@ -151,13 +215,27 @@ class Potential:
         :param pos: position of particle per direction
         :param mom: momentum of particle per direction
         """
-        for i, x in enumerate(pos):
-            if x < self.ranges[i][0]:
-                pos[i] = self.ranges[i][0]
-                mom[i] = -mom[i]
-            elif x > self.ranges[i][1]:
-                pos[i] = self.ranges[i][1]
-                mom[i] = -mom[i]
+        self.apply_boundary_condition_reflective_batch(
+            pos.reshape(1, -1), mom.reshape(1, -1)
+        )
+
+    def apply_boundary_condition_reflective_batch(
+        self, pos: np.ndarray, mom: np.ndarray
+    ) -> None:
+        """Apply reflective boundary condition to many particles at once
+
+        All coordinates outside the potential range are set to the boundary and
+        the corresponding momentum entries are reversed
+
+        :param pos: positions of the particles, shape (n_particles, n_dim), changed in place
+        :param mom: momenta of the particles, shape (n_particles, n_dim), changed in place
+        """
+        lower, upper = self._range_bounds()
+        outside = (pos < lower) | (pos > upper)
+        if not outside.any():
+            return
+        np.clip(pos, lower, upper, out=pos)
+        mom[outside] = -mom[outside]
 
     def apply_boundary_condition_periodic(
         self, pos: np.ndarray, mom: np.ndarray
@@ -172,8 +250,42 @@ class Potential:
         :param pos: position of particle per direction
         :param mom: momentum of particle per direction (not actually changed)
         """
-        for i, x in enumerate(pos):
-            if x < self.ranges[i][0]:
-                pos[i] += self.ranges[i][1] - self.ranges[i][0]
-            elif x > self.ranges[i][1]:
-                pos[i] -= self.ranges[i][1] - self.ranges[i][0]
+        self.apply_boundary_condition_periodic_batch(
+            pos.reshape(1, -1), mom.reshape(1, -1)
+        )
+
+    def apply_boundary_condition_periodic_batch(
+        self, pos: np.ndarray, mom: np.ndarray
+    ) -> None:
+        """Apply periodic boundary condition to many particles at once
+
+        All coordinates outside the potential range are shifted by the number of
+        box lengths needed to move them back inside, so this also works for
+        particles that moved further than one box length
+
+        :param pos: positions of the particles, shape (n_particles, n_dim), changed in place
+        :param mom: momenta of the particles (not actually changed)
+        """
+        lower, upper = self._range_bounds()
+        outside = (pos < lower) | (pos > upper)
+        if not outside.any():
+            return
+        lower = np.broadcast_to(lower, pos.shape)[outside]
+        length = np.broadcast_to(upper, pos.shape)[outside] - lower
+        pos[outside] -= np.floor((pos[outside] - lower) / length) * length
+
+
+def _update_digest(digest: "hashlib._Hash", value: Any) -> None:
+    """Add value to hash, arrays and grids are hashed by their data"""
+    if isinstance(value, np.ndarray):
+        digest.update(f"{value.dtype}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, grid.Grid):
+        _update_digest(digest, [value.ranges, value.n_points])
+        _update_digest(digest, value.data)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_digest(digest, item)
+    else:
+        digest.update(repr(value).encode())
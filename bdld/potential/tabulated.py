@@ -0,0 +1,274 @@
+"""Potential defined by values tabulated on a regular grid"""
+
+from collections import OrderedDict
+import hashlib
+from typing import List, Optional, Union, Tuple
+import numpy as np
+from scipy import ndimage
+
+from bdld import grid
+from bdld.helpers.plumed_header import PlumedHeader
+from bdld.potential.potential import Potential
+
+# spline order used by ndimage for the interpolation methods
+INTERPOLATION_ORDERS = {"linear": 1, "cubic": 3}
+
+
+class TabulatedPotential(Potential):
+    """Potential interpolated from energy and force values on a regular grid
+
+    The values are stored in a single table with shape (n_dim + 1, *n_points),
+    the first entry holds the energies and the others the forces per direction.
+    For cubic interpolation the table holds the spline coefficients instead of the
+    values, so they need to be calculated only once.
+
+    Evaluations outside of the grid return the values at the closest grid point.
+
+    The table can be saved to a .npy file, loading it again memory-maps the file
+    so that several simulations can share the same table.
+
+    :param grid: Grid defining the ranges and points of the table (holds no data)
+    :param table: energies and forces (or spline coefficients) on the grid points
+    :param method: interpolation method, "linear" or "cubic"
+    """
+
+    def __init__(
+        self,
+        energy: grid.Grid,
+        forces: Optional[np.ndarray] = None,
+        method: str = "linear",
+        _table: Optional[np.ndarray] = None,
+    ) -> None:
+        """Set up from grid with the energy values
+
+        :param energy: grid holding the energies
+        :param forces: forces at the grid points with shape (n_dim, *n_points).
+                       Are calculated by finite differences from the energies if not given
+        :param method: interpolation method, "linear" (default) or "cubic"
+        :param _table: precomputed table to use instead of the energy and force values,
+                       only used internally when loading a table from file
+        :raises ValueError: if the interpolation method is unknown
+        """
+        super().__init__()
+        if method not in INTERPOLATION_ORDERS:
+            raise ValueError(f"Unknown interpolation method '{method}'")
+        self.method: str = method
+        self._order: int = INTERPOLATION_ORDERS[method]
+        self.n_dim = energy.n_dim
+        self.ranges = [tuple(r) for r in energy.ranges]
+        self.grid: grid.Grid = energy.copy_empty()
+        if _table is not None:
+            self.table: np.ndarray = _table
+            return
+        if forces is None:
+            gradient = np.gradient(energy.data, *self.grid.axes(), edge_order=2)
+            if self.n_dim == 1:  # numpy returns array instead of list in 1d
+                gradient = [gradient]
+            forces = -np.array(gradient)
+        table = np.concatenate((energy.data[np.newaxis], forces)).astype(float)
+        if self._order > 1:
+            for values in table:
+                values[...] = ndimage.spline_filter(values, order=self._order)
+        self.table = table
+
+    def __str__(self) -> str:
+        """Give out grid and interpolation"""
+        return (
+            f"tabulated potential on grid with ranges {self.ranges} "
+            f"and {self.grid.n_points} points ({self.method} interpolation)"
+        )
+
+    def energy(self, pos: Union[List[float], np.ndarray]) -> float:
+        """Get energy at position
+
+        :param pos: position to be evaluated (given as list or array even in 1d)
+        :return: energy
+        """
+        return self.energy_batch(np.asarray(pos, dtype=float)[np.newaxis])[0]
+
+    def force(self, pos: Union[List[float], np.ndarray]) -> np.ndarray:
+        """Get force at position
+
+        :param pos: position to be evaluated (given as list or array even in 1d)
+        :return force: array with force per direction
+        """
+        return self.evaluate(pos)[1]
+
+    def evaluate(self, pos: Union[List[float], np.ndarray]) -> Tuple[float, np.ndarray]:
+        """Get potential energy and forces at position
+
+        :param pos: position to be evaluated
+        :return: (energy, forces)
+        """
+        energies, forces = self.evaluate_batch(np.asarray(pos, dtype=float)[np.newaxis])
+        return (energies[0], forces[0])
+
+    def evaluate_batch(self, pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Interpolate energies and forces at multiple positions
+
+        :param pos: positions to be evaluated, shape (n_pos, n_dim)
+        :return: (energies, forces) with shapes (n_pos,) and (n_pos, n_dim)
+        """
+        coords = self._grid_coordinates(pos)
+        values = np.array([self._interpolate(t, coords) for t in self.table])
+        return (values[0], values[1:].T)
+
+    def energy_batch(self, pos: np.ndarray) -> np.ndarray:
+        """Interpolate energies at multiple positions
+
+        :param pos: positions to be evaluated, shape (n_pos, n_dim)
+        :return: energies with shape (n_pos,)
+        """
+        return self._interpolate(self.table[0], self._grid_coordinates(pos))
+
+    def _grid_coordinates(self, pos: np.ndarray) -> np.ndarray:
+        """Transform positions to (fractional) indices of the grid points
+
+        Positions outside of the grid are moved to the closest border
+
+        :param pos: positions, shape (n_pos, n_dim)
+        :return coords: array with the indices, shape (n_dim, n_pos)
+        """
+        pos = np.asarray(pos, dtype=float).reshape(-1, self.n_dim)
+        lower = np.array([r[0] for r in self.ranges])
+        coords = ((pos - lower) / self.grid.stepsizes).T
+        return np.clip(coords, 0, np.array(self.grid.n_points)[:, np.newaxis] - 1)
+
+    def _interpolate(self, values: np.ndarray, coords: np.ndarray) -> np.ndarray:
+        """Interpolate the tabulated values (or spline coefficients) at the coordinates"""
+        return ndimage.map_coordinates(
+            values, coords, order=self._order, mode="mirror", prefilter=False
+        )
+
+    def save_table(self, filename: str, source_hash: Optional[str] = None) -> None:
+        """Save table to .npy file that can be loaded with from_table_file()
+
+        The grid and interpolation method are written to an additional header file
+        with '.header' appended to the filename
+
+        :param filename: path of the table file
+        :param source_hash: hash of the grid file the table was created from (optional),
+                            stored in the header to detect outdated tables
+        """
+        with open(filename, "wb") as f:  # avoid numpy appending .npy to filename
+            np.save(f, np.ascontiguousarray(self.table))
+        fields = self.get_fields()
+        constants = OrderedDict([("interpolation", self.method)])
+        if source_hash:
+            constants["source_sha256"] = source_hash
+        for i, field in enumerate(fields):
+            constants[f"{field}_min"] = self.ranges[i][0]
+            constants[f"{field}_max"] = self.ranges[i][1]
+            constants[f"{field}_n_points"] = self.grid.n_points[i]
+        with open(filename + ".header", "w") as f:
+            f.write(str(PlumedHeader(fields, constants)) + "\n")
+
+    @staticmethod
+    def read_table_header(filename: str) -> PlumedHeader:
+        """Read the header of a table file written by save_table()
+
+        The fields are the dimensions of the potential, the constants hold the grid,
+        the interpolation method and if known the hash of the source grid file
+
+        :param filename: path of the table file (without '.header')
+        :return header: PlumedHeader instance
+        """
+        header = PlumedHeader()
+        header.parse_file(filename + ".header")
+        return header
+
+    @classmethod
+    def from_table_file(cls, filename: str) -> "TabulatedPotential":
+        """Load potential from a table file written by save_table()
+
+        The table is memory-mapped read-only, so it is not copied into memory
+        and can be shared between multiple processes
+
+        :param filename: path of the table file
+        :return pot: TabulatedPotential instance
+        """
+        header = cls.read_table_header(filename)
+        ranges = []
+        n_points = []
+        for field in header.fields:
+            ranges.append(
+                (
+                    float(header.constants[f"{field}_min"]),
+                    float(header.constants[f"{field}_max"]),
+                )
+            )
+            n_points.append(int(header.constants[f"{field}_n_points"]))
+        table = np.load(filename, mmap_mode="r")
+        return cls(
+            grid.from_npoints(ranges, n_points),
+            method=header.constants["interpolation"],
+            _table=table,
+        )
+
+
+def from_potential(
+    pot: Potential,
+    ranges: List[Tuple[float, float]],
+    n_points: Union[List[int], int],
+    method: str = "linear",
+) -> TabulatedPotential:
+    """Tabulate another potential on a grid
+
+    :param pot: potential to tabulate
+    :param ranges: ranges of the grid per dimension (min, max)
+    :param n_points: number of grid points per dimension
+    :param method: interpolation method, "linear" (default) or "cubic"
+    :return tabulated: TabulatedPotential instance
+    """
+    energy = grid.from_npoints(ranges, n_points)
+    energies, forces = pot.evaluate_batch(energy.points())
+    energy.data = energies
+    # forces are in row-major order of points: move dimension to front
+    forces = np.moveaxis(forces.reshape(*energy.n_points, energy.n_dim), -1, 0)
+    return TabulatedPotential(energy, forces, method)
+
+
+def from_grid_file(
+    filename: str, n_dim: int, method: str = "linear"
+) -> TabulatedPotential:
+    """Read tabulated potential from a PLUMED-style grid file
+
+    The first n_dim columns must hold the positions and the next one the energy.
+    If the file has 2*n_dim + 1 or more columns, the following n_dim columns are
+    taken as derivatives of the energy, otherwise they are calculated numerically.
+    The points may be in any order (e.g. first or last dimension varying fastest),
+    comments and empty lines are ignored.
+
+    :param filename: path to the grid file
+    :param n_dim: dimensions of the potential
+    :param method: interpolation method, "linear" (default) or "cubic"
+    :raises ValueError: if the points in the file do not form a regular grid
+    :return tabulated: TabulatedPotential instance
+    """
+    file_data = np.loadtxt(filename, comments="#", ndmin=2)
+    # sort in row-major order: first dimension varies slowest
+    file_data = file_data[np.lexsort(file_data[:, n_dim - 1 :: -1].T)]
+    axes = [np.unique(file_data[:, i]) for i in range(n_dim)]
+    n_points = [len(ax) for ax in axes]
+    if np.prod(n_points) != len(file_data):
+        raise ValueError(f"The points in '{filename}' do not form a regular grid")
+    energy = grid.from_npoints([(ax[0], ax[-1]) for ax in axes], n_points)
+    energy.data = file_data[:, n_dim]
+    forces = None
+    if file_data.shape[1] >= 2 * n_dim + 1:
+        der = file_data[:, n_dim + 1 : 2 * n_dim + 1]
+        forces = -np.moveaxis(der.reshape(*n_points, n_dim), -1, 0)
+    return TabulatedPotential(energy, forces, method)
+
+
+def file_hash(filename: str) -> str:
+    """Return SHA-256 hash of the content of a file, e.g. to identify a grid file
+
+    :param filename: path of the file
+    :return hash: hexadecimal hash
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
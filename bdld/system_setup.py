@@ -0,0 +1,240 @@
+"""Set up the simulated system: potential, Langevin dynamics and equilibrium density
+
+These functions are shared by the simulation (see the main module) and the
+diagnostics that need the same system without running it, e.g. the bandwidth scan
+"""
+
+import os
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from bdld import actions, inputparser, potential
+from bdld.cache import GridCache
+from bdld.grid import Grid
+
+# alias shortcuts
+BussiParinelloLD = actions.bussi_parinello_ld.BussiParinelloLD
+OverdampedLD = actions.overdamped_ld.OverdampedLD
+LdType = Union[BussiParinelloLD, OverdampedLD]
+
+Potential = potential.potential.Potential
+
+
+def setup_potential(options: Dict) -> Potential:
+    """Return potential from given options"""
+    if options["type"] == "polynomial":
+        if options["n_dim"] == 1:
+            ranges = [(options["min"], options["max"])]
+            pot: Potential = potential.polynomial.PolynomialPotential(
+                options["coeffs"], ranges
+            )
+        else:
+            ranges = list(zip(options["min"], options["max"]))
+            coeffs = potential.polynomial.coefficients_from_file(
+                options["coeffs-file"], options["n_dim"]
+            )
+            pot = potential.polynomial.PolynomialPotential(coeffs, ranges)
+    elif options["type"] == "mueller-brown":
+        pot = potential.mueller_brown.MuellerBrownPotential(options["scaling-factor"])
+    elif options["type"] == "tabulated":
+        pot = setup_tabulated_potential(options)
+    else:
+        raise inputparser.OptionError(
+            f'Specified potential type "{options["type"]}" is not implemented',
+            "type",
+            "potential",
+        )
+
+    bc = options["boundary-condition"]
+    if bc == "reflective":
+        pot.boundary_condition = potential.potential.BoundaryCondition.reflective
+    elif bc == "periodic":
+        pot.boundary_condition = potential.potential.BoundaryCondition.periodic
+    return pot
+
+
+def setup_tabulated_potential(options: Dict) -> Potential:
+    """Return tabulated potential from grid or table file
+
+    If a table file is specified but does not exist yet, it is created from the
+    grid file so that following runs can directly load it.
+    An existing table file is checked against the input: if it does not match the
+    grid file, number of dimensions or interpolation method, it is created again
+    from the grid file
+
+    :raises OptionError: if the table file does not match and there is no grid file
+    """
+    table_file = options["table-file"]
+    grid_file = options["grid-file"]
+    source_hash = None
+    if grid_file:
+        source_hash = potential.tabulated.file_hash(grid_file)
+    if table_file and os.path.exists(table_file):
+        TabulatedPotential = potential.tabulated.TabulatedPotential
+        header = TabulatedPotential.read_table_header(table_file)
+        mismatches = []
+        if len(header.fields) != options["n_dim"]:
+            mismatches.append(f"has {len(header.fields)} dimensions")
+        if grid_file:
+            if header.constants.get("source_sha256") != source_hash:
+                mismatches.append(f"was not created from '{grid_file}'")
+            if header.constants["interpolation"] != options["interpolation"]:
+                mismatches.append(
+                    f"uses {header.constants['interpolation']} interpolation"
+                )
+        if not mismatches:
+            print(f"Loading potential table from '{table_file}'")
+            pot = TabulatedPotential.from_table_file(table_file)
+            if pot.method != options["interpolation"]:
+                print(
+                    f"Warning: table file was stored with {pot.method} interpolation, "
+                    f"ignoring '{options['interpolation']}' from the input"
+                )
+            return pot
+        if not grid_file:
+            raise inputparser.OptionError(
+                f"Table file '{table_file}' does not match the input: "
+                + ", ".join(mismatches),
+                "table-file",
+                "potential",
+            )
+        print(
+            f"Table file '{table_file}' does not match the input ("
+            + ", ".join(mismatches)
+            + "), creating it again"
+        )
+    if not grid_file:
+        raise inputparser.OptionError(
+            f"Table file '{table_file}' not found and no grid file given",
+            "table-file",
+            "potential",
+        )
+    pot = potential.tabulated.from_grid_file(
+        grid_file, options["n_dim"], options["interpolation"]
+    )
+    if table_file:
+        print(f"Saving potential table to '{table_file}'")
+        pot.save_table(table_file, source_hash)
+    return pot
+
+
+def setup_ld(options: Dict, pot: Potential) -> LdType:
+    """Return Langevin Dynamics with given options on the potential"""
+    if options["type"] == "bussi-parinello":
+        return BussiParinelloLD(
+            pot,
+            options["timestep"],
+            options["friction"],
+            options["kt"],
+            options["seed"],
+            options["batched"],
+            options["noise-block-steps"],
+            options["noise-chunk-size"],
+        )
+    elif options["type"] == "overdamped":
+        return OverdampedLD(
+            pot,
+            options["timestep"],
+            options["seed"],
+            options["batched"],
+            options["noise-block-steps"],
+            options["noise-chunk-size"],
+        )
+    else:
+        raise inputparser.OptionError(
+            f'Specified LD type "{options["type"]}" is not implemented',
+            "type",
+            "ld",
+        )
+
+
+def get_approx_variant(options: Dict) -> "actions.birth_death.ApproxVariant":
+    """Get the approximation variant from the birth-death options
+
+    :param options: options of the birth-death section
+    :raises OptionError: if the variant could not be understood
+    :return approx_variant: chosen variant, defaults to the original one
+    """
+
+    # helper function to avoid duplication. Can be removed when correction-variant is removed
+    def get_variant(key):
+        if options[key]:
+            try:
+                approx_variant = ApproxVariant.from_str(options[key])
+            except KeyError as err:
+                e = "The specified {} could not be understood".format(key)
+                raise inputparser.OptionError(e, "birth-death", key) from err
+            return approx_variant
+        return None
+
+    ApproxVariant = actions.birth_death.ApproxVariant
+    approx_variant = ApproxVariant.orig  # default
+    # currently both are accepted but approximation-variant has precedence
+    for key in ["correction-variant", "approximation-variant"]:
+        # keep previous if not existing
+        approx_variant = get_variant(key) or approx_variant
+    return approx_variant
+
+
+def bd_prob_density(
+    pot: Potential, bd_bw: np.ndarray, kt: float, cache: Optional[GridCache] = None
+) -> Grid:
+    """Return probability density grid needed for BirthDeath
+
+    This is usually a unknown quantity, so this has to be replaced by an estimate
+    in the future. E.g. enforce usage of the histogram and use that as estimate at
+    current time with iterative updates
+
+    :param pot: potential of the simulation
+    :param bd_bw: bandwidth of the birth-death kernel per dimension
+    :param kt: thermal energy of the system
+    :param cache: cache to load the grid from or store it in (optional)
+    :return prob_grid: Grid of the probability density
+    """
+    n_grid_points = bd_prob_grid_points(pot, bd_bw)
+    if cache is None:
+        return pot.calculate_probability_density(kt, pot.ranges, n_grid_points)
+    return cache.get(
+        "eq-density",
+        bd_prob_density_params(pot, kt, n_grid_points),
+        lambda: pot.calculate_probability_density(kt, pot.ranges, n_grid_points),
+    )
+
+
+def bd_prob_grid_points(pot: Potential, bd_bw: np.ndarray) -> List[int]:
+    """Return number of points per dimension of the probability density grid
+
+    Because of the current free choice of points, we use rather a lot and make
+    sure the Kernel grid will have at least 20 points per dimension within 5 sigma
+
+    :param pot: potential of the simulation
+    :param bd_bw: bandwidth of the birth-death kernel per dimension
+    :return n_grid_points: number of grid points per dimension
+    """
+    n_grid_points = []
+    for dim, r in enumerate(pot.ranges):
+        # check minimal number of points for 20 points within 5 sigma
+        min_points_gaussian = int(np.ceil((r[1] - r[0]) / (0.5 * bd_bw[dim])))
+        # the large number of points is only used to calculate the correction once
+        tmp_grid_points = max(501, min_points_gaussian)
+        if tmp_grid_points % 2 == 0:
+            tmp_grid_points += 1  # odd number is better for convolution
+        n_grid_points.append(tmp_grid_points)
+    return n_grid_points
+
+
+def bd_prob_density_params(pot: Potential, kt: float, n_grid_points: List[int]) -> Dict:
+    """Return all parameters the probability density grid depends on for the cache
+
+    :param pot: potential of the simulation
+    :param kt: thermal energy of the system
+    :param n_grid_points: number of grid points per dimension
+    :return params: dictionary of the parameters
+    """
+    return {
+        "potential": pot.fingerprint(),
+        "kt": kt,
+        "ranges": pot.ranges,
+        "n_points": n_grid_points,
+    }
@@ -33,6 +33,50 @@ class ActionTest(unittest.TestCase):
         expected = np.array([48, 54, 60])  # all multiplicatives of 6 since last_write
         np.testing.assert_array_equal(expected, valid)
 
+    def test_scheduler(self):
+        """Test that the scheduler runs actions exactly at their due steps"""
+
+        class CountingAction(action.Action):
+            """Store the steps at which the action was run"""
+
+            def __init__(self, strides, event_steps=None):
+                self._strides = strides
+                self._event_steps = event_steps or []
+                self.steps = []
+
+            def run(self, step):
+                self.steps.append(step)
+
+            def strides(self):
+                return self._strides
+
+            def event_steps(self):
+                return self._event_steps
+
+        class CountingLD:
+            """Store the number of steps the LD was run without interruption"""
+
+            def __init__(self):
+                self.blocks = []
+
+            def run_steps(self, n_steps, capture=None, capture_mom=None):
+                self.blocks.append(n_steps)
+
+        ld = CountingLD()
+        acts = [
+            CountingAction([4, None, 6]),
+            CountingAction([0], [3, 17, 30]),
+            CountingAction([5]),
+        ]
+        scheduler = action.Scheduler(ld, acts)
+        scheduler.run(20)
+        self.assertEqual(ld.blocks, [3, 1, 1, 1, 2, 2, 2, 3, 1, 1, 1, 2])
+        self.assertEqual(acts[0].steps, [4, 6, 8, 12, 16, 18, 20])
+        self.assertEqual(acts[1].steps, [3, 17])
+        self.assertEqual(acts[2].steps, [5, 10, 15, 20])
+        self.assertEqual(scheduler.next_step(12, 20), 15)
+        self.assertEqual(scheduler.next_step(18, 20), 20)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,90 @@
+"""Test the scan of the birth-death rates over kernel bandwidths"""
+import unittest
+
+import numpy as np
+
+from bdld import bandwidth_scan
+from bdld.actions import birth_death as bd
+
+
+class BandwidthScanTests(unittest.TestCase):
+    """Test bandwidth_scan functions"""
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.pos = rng.normal(size=(300, 2))
+        self.energy = np.sum(self.pos**2, axis=1)
+        self.bandwidths = np.array([[0.1, 0.1], [0.2, 0.3], [0.5, 0.4]])
+
+    def test_walker_densities(self):
+        """Densities agree with the single bandwidth calculation"""
+        for kernel in bd.KERNELS:
+            # small memory to test the tiling
+            densities = bandwidth_scan.walker_densities(
+                self.pos, self.bandwidths, kernel, memory=0.1
+            )
+            for bw, density in zip(self.bandwidths, densities):
+                expected = bd.walker_density(self.pos, bw, "pdist", kernel=kernel)
+                np.testing.assert_allclose(density, expected, rtol=1e-10)
+
+    def test_scan_bandwidths(self):
+        """Summary matches the rates of the single bandwidth calculation"""
+        kt = 0.5
+        dt = 0.01
+        summary = bandwidth_scan.scan_bandwidths(
+            self.pos, self.bandwidths, self.energy, kt, dt
+        )
+        n_dim = self.pos.shape[1]
+        self.assertEqual(
+            summary.shape,
+            (len(self.bandwidths), n_dim + len(bandwidth_scan.SUMMARY_FIELDS)),
+        )
+        np.testing.assert_array_equal(summary[:, :n_dim], self.bandwidths)
+        for bw, row in zip(self.bandwidths, summary):
+            density = bd.walker_density(self.pos, bw, "pdist")
+            beta = bd.betas_from_density(
+                density, self.energy, 1 / kt, bd.ApproxVariant.orig
+            )
+            prob = 1 - np.exp(-np.abs(beta) * dt)
+            stats = dict(zip(bandwidth_scan.SUMMARY_FIELDS, row[n_dim:]))
+            self.assertAlmostEqual(stats["beta_std"], np.std(beta))
+            self.assertAlmostEqual(stats["beta_max"], np.max(beta))
+            self.assertAlmostEqual(
+                stats["kill_fraction"], np.count_nonzero(beta > 0) / len(beta)
+            )
+            self.assertAlmostEqual(
+                stats["kill_rate"] + stats["dup_rate"], np.mean(prob)
+            )
+        # the approximations need the equilibrium density
+        with self.assertRaises(ValueError):
+            bandwidth_scan.scan_bandwidths(
+                self.pos,
+                self.bandwidths,
+                self.energy,
+                kt,
+                dt,
+                None,
+                bd.ApproxVariant.mult,
+            )
+
+    def test_scan_non_finite(self):
+        """Summary without finite betas has NaN statistics instead of failing"""
+        energy = np.full(len(self.pos), np.nan)
+        summary = bandwidth_scan.scan_bandwidths(
+            self.pos, self.bandwidths, energy, 0.5, 0.01
+        )
+        n_dim = self.pos.shape[1]
+        stats = summary[:, n_dim : n_dim + 3]
+        self.assertTrue(np.all(np.isnan(stats)))
+        np.testing.assert_array_equal(summary[:, n_dim + 3 :], 0.0)
+
+    def test_parse_bandwidths(self):
+        """Bandwidths are expanded to all dimensions or given per dimension"""
+        bandwidths = bandwidth_scan.parse_bandwidths(["0.1", "0.2,0.3"], 2)
+        np.testing.assert_array_equal(bandwidths, [[0.1, 0.1], [0.2, 0.3]])
+        with self.assertRaises(ValueError):
+            bandwidth_scan.parse_bandwidths(["0.1,0.2,0.3"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
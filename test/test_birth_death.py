@@ -1,6 +1,8 @@
 """Test the birth-deat action"""
 import os
+import tempfile
 import unittest
+import warnings
 
 from typing import List, Tuple
 
@@ -8,6 +10,7 @@ import numpy as np
 
 from bdld.actions import birth_death as bd
 from bdld import grid  # needed for some inputs
+from bdld import inputparser
 from bdld.actions.overdamped_ld import LDParticle
 
 
@@ -141,6 +144,9 @@ class BirthDeathTests(unittest.TestCase):
         positions = np.array([[0], [0.5], [1]])
         dens_pdist = bd.walker_density(positions, bw)  # chooses pdist variant
         dens_manual = bd._walker_density_manual(positions, bw)
+        dens_kdtree = bd.walker_density(positions, bw, "kdtree")
+        # tiny memory budget to test tiles of a single element
+        dens_tiled = bd.walker_density(positions, bw, "tiled", memory=1e-6)
 
         # expected: (kernel values from Wolfram alpha "N(0,0.25) at x=0 / 0.5 / x=1")
         kernel_values = [0.797885, 0.483941, 0.107982]  # 0, 0.5, 1 distance
@@ -151,6 +157,16 @@ class BirthDeathTests(unittest.TestCase):
 
         np.testing.assert_allclose(dens_pdist, expected, rtol=1e-6)
         np.testing.assert_allclose(dens_manual, expected, rtol=1e-6)
+        np.testing.assert_allclose(dens_kdtree, expected, rtol=1e-6)
+        np.testing.assert_allclose(dens_tiled, expected, rtol=1e-6)
+        # with a small cutoff only the walker itself contributes
+        np.testing.assert_allclose(
+            bd.walker_density(positions, bw, "kdtree", 0.5),
+            [kernel_values[0] / 3] * 3,
+            rtol=1e-6,
+        )
+        with self.assertRaises(ValueError):
+            bd.walker_density(positions, bw, "unknown")
 
     def test_walker_density_2d(self):
         """Test evaluation of walker density in 2d"""
@@ -176,6 +192,54 @@ class BirthDeathTests(unittest.TestCase):
 
         np.testing.assert_allclose(dens_pdist, expected, rtol=1e-6)
         np.testing.assert_allclose(dens_manual, expected, rtol=1e-6)
+        dens_kdtree = bd.walker_density(positions, bw, "kdtree")
+        np.testing.assert_allclose(dens_kdtree, expected, rtol=1e-6)
+
+        # many walkers: truncation error is below the documented bound
+        rng = np.random.default_rng(1)
+        positions = np.concatenate(
+            (rng.normal(-2, 0.5, (300, 2)), rng.normal(3, 1.0, (300, 2)))
+        )
+        dens_pdist = bd.walker_density(positions, bw, "pdist")
+        # tiles of 250 walkers: do not fit evenly
+        dens_tiled = bd.walker_density(positions, bw, "tiled", memory=1.0)
+        np.testing.assert_allclose(dens_tiled, dens_pdist, rtol=1e-10)
+        # binned approximation with default and finer grid spacing
+        dens_binned = bd.walker_density(positions, bw, "binned")
+        np.testing.assert_allclose(dens_binned, dens_pdist, rtol=0.05)
+        dens_binned = bd.walker_density(positions, bw, "binned", grid_spacing=0.1)
+        np.testing.assert_allclose(dens_binned, dens_pdist, rtol=0.01)
+        # walkers on a line and a single walker: grid is padded without warnings
+        for line_positions in [positions * [1, 0], positions[:1]]:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                dens_binned = bd.walker_density(
+                    line_positions, bw, "binned", grid_spacing=0.1
+                )
+            np.testing.assert_allclose(
+                dens_binned, bd.walker_density(line_positions, bw, "pdist"), rtol=0.01
+            )
+        height = 1 / (2 * np.pi * np.prod(bw))
+        tolerance = 1e-5
+        dens_ifgt = bd.walker_density(positions, bw, "ifgt", tolerance=tolerance)
+        np.testing.assert_allclose(
+            dens_ifgt, dens_pdist, rtol=0, atol=tolerance * height
+        )
+        cutoff = 3.0
+        dens_kdtree = bd.walker_density(positions, bw, "kdtree", cutoff)
+        self.assertTrue(np.all(dens_kdtree <= dens_pdist + 1e-15))
+        self.assertTrue(
+            np.all(dens_pdist - dens_kdtree <= height * np.exp(-(cutoff**2) / 2))
+        )
+
+    def test_cic_weights(self):
+        """Test the linear weights of positions on a grid"""
+        g = grid.from_npoints([(0, 2), (0, 1)], [3, 2])
+        indices, weights = bd.cic_weights(np.array([[0.5, 0.25], [2.0, 1.0]]), g)
+        np.testing.assert_array_equal(indices, [[0, 1, 2, 3], [2, 3, 4, 5]])
+        np.testing.assert_allclose(
+            weights, [[0.375, 0.125, 0.375, 0.125], [0, 0, 0, 1]]
+        )
 
     def test_kernel_convolution(self):
         """Test the convolution with the kernel needed for the correction"""
@@ -199,6 +263,55 @@ class BirthDeathTests(unittest.TestCase):
         )
         np.testing.assert_array_almost_equal(conv.data, conv_manual)
 
+    def test_compact_kernels(self):
+        """Compact kernels are normalized, have the same variance and cutoff"""
+        for n_dim in [1, 2]:
+            bw = np.array([0.5, 2.0][:n_dim])
+            g = grid.from_npoints([(-5 * b, 5 * b) for b in bw], [401] * n_dim)
+            points = g.points()
+            for kernel in ["epanechnikov", "triweight"]:
+                values = bd.calc_kernel(points, bw, kernel)
+                integral = bd.nd_trapz(values.reshape(g.n_points), g.stepsizes)
+                self.assertAlmostEqual(integral, 1, places=3)
+                for i in range(n_dim):
+                    moment = (values * points[:, i] ** 2).reshape(g.n_points)
+                    variance = bd.nd_trapz(moment, g.stepsizes)
+                    self.assertAlmostEqual(variance / bw[i] ** 2, 1, places=3)
+                radius = bd.kernel_radius(kernel, n_dim)
+                outside = np.sum((points / bw) ** 2, axis=1) >= radius**2
+                self.assertTrue(np.all(values[outside] == 0))
+                self.assertTrue(np.all(values[~outside] > 0))
+        with self.assertRaises(ValueError):
+            bd.walker_density(np.zeros((2, 1)), np.ones(1), kernel="unknown")
+        with self.assertRaises(ValueError):
+            bd.walker_density(np.zeros((2, 1)), np.ones(1), "ifgt", kernel="triweight")
+
+    def test_walker_density_compact(self):
+        """All density methods agree for compact kernels"""
+        bw = np.array([0.5, 2])
+        rng = np.random.default_rng(3)
+        positions = rng.normal(0, [1, 4], (200, 2))
+        for kernel in ["epanechnikov", "triweight"]:
+            dens_manual = bd._walker_density_manual(positions, bw, kernel)
+            for method in ["pdist", "tiled", "kdtree"]:
+                dens = bd.walker_density(positions, bw, method, kernel=kernel)
+                np.testing.assert_allclose(dens, dens_manual, rtol=1e-10)
+            # the kernel radius is used as cutoff regardless of the given one
+            dens = bd.walker_density(positions, bw, "kdtree", 1.0, kernel=kernel)
+            np.testing.assert_allclose(dens, dens_manual, rtol=1e-10)
+            dens = bd.walker_density(
+                positions, bw, "binned", grid_spacing=0.1, kernel=kernel
+            )
+            np.testing.assert_allclose(dens, dens_manual, rtol=0.02)
+            # convolution of a normalized density stays normalized
+            dens = grid.from_npoints([(-5, 5)], [201])
+            dens.data = np.exp(-0.5 * dens.points() ** 2) / np.sqrt(2 * np.pi)
+            conv = bd.dens_kernel_convolution(dens, bw[:1], "same", kernel)
+            self.assertAlmostEqual(bd.nd_trapz(conv.data, conv.stepsizes), 1, places=3)
+            # variance of the convolution is the sum of both variances
+            variance = bd.nd_trapz(conv.data * conv.points()[:, 0] ** 2, conv.stepsizes)
+            self.assertAlmostEqual(variance, 1 + bw[0] ** 2, places=3)
+
     # test if the algorithm does what we expect
 
     def test_calc_beta(self):
@@ -268,6 +381,151 @@ class BirthDeathTests(unittest.TestCase):
         bd_events_ref = [(2, 0), (3, 1)]
         self.assertEqual(bd_events, bd_events_ref)
 
+    def test_incremental_updates(self):
+        """Incremental updates of the kernel sums give the same events"""
+        rng = np.random.default_rng(42)
+        positions = rng.normal(0, 1, (50, 1))
+        for variant in ["orig", "add", "mult"]:
+            events = []
+            final_pos = []
+            for incremental in [False, True]:
+                particles = []
+                for pos in positions:
+                    part = LDParticle(pos)
+                    part.energy = pos[0] ** 2
+                    particles.append(part)
+                eq_density = grid.from_npoints([(-5, 5)], [101])
+                eq_density.data = np.exp(-eq_density.points() ** 2)
+                bd_action = bd.BirthDeath(
+                    particles,
+                    1.0,
+                    1,
+                    [0.3],
+                    1.0,
+                    2.0,
+                    True,
+                    bd.ApproxVariant.from_str(variant),
+                    eq_density,
+                    1234,
+                    incremental_updates=incremental,
+                )
+                events.append(bd_action.do_birth_death())
+                final_pos.append(bd_action.particles.pos.copy())
+                # replay the events: kernel sums are the same as from scratch
+                bd_action.particles.pos = positions
+                kernel_sums = bd_action.walker_density(positions) * len(positions)
+                for event in events[-1]:
+                    bd_action.update_kernel_sums(kernel_sums, *event)
+                    bd_action.perform_moves([event])
+                np.testing.assert_allclose(
+                    kernel_sums / len(positions),
+                    bd_action.walker_density(bd_action.particles.pos),
+                    rtol=1e-10,
+                )
+            self.assertTrue(len(events[0]) > 1)
+            self.assertEqual(events[0], events[1])
+            np.testing.assert_array_equal(final_pos[0], final_pos[1])
+        # the updates use the same cutoff as the kdtree density
+        bd_action = bd.BirthDeath(
+            particles,
+            1.0,
+            1,
+            [0.3],
+            1.0,
+            density_method="kdtree",
+            density_cutoff=1.5,
+            incremental_updates=True,
+        )
+        bd_action.particles.pos = positions
+        kernel_sums = bd_action.walker_density(positions) * len(positions)
+        for event in [(0, 1), (2, 3), (0, 4)]:
+            bd_action.update_kernel_sums(kernel_sums, *event)
+            bd_action.perform_moves([event])
+        np.testing.assert_allclose(
+            kernel_sums / len(positions),
+            bd_action.walker_density(bd_action.particles.pos),
+            rtol=1e-12,
+        )
+        with self.assertRaises(ValueError):
+            bd.BirthDeath(
+                particles,
+                1.0,
+                1,
+                [0.3],
+                1.0,
+                density_method="binned",
+                incremental_updates=True,
+            )
+
+    def test_neighbor_list(self):
+        """Reusing a neighbor list gives the same results as the kdtree method"""
+        rng = np.random.default_rng(5)
+        positions = rng.normal(0, 1, (100, 2))
+        bd_actions = []
+        for skin in [None, 0.5]:
+            particles = []
+            for pos in positions:
+                part = LDParticle(pos)
+                part.energy = np.sum(pos**2)
+                particles.append(part)
+            bd_actions.append(
+                bd.BirthDeath(
+                    particles,
+                    0.1,
+                    1,
+                    [0.2, 0.2],
+                    1.0,
+                    seed=1234,
+                    density_method="kdtree",
+                    density_cutoff=3.0,
+                    neighbor_list_skin=skin,
+                )
+            )
+        for _ in range(5):
+            moves = rng.normal(0, 0.003, positions.shape)
+            events = []
+            for bd_action in bd_actions:
+                bd_action.particles.pos += moves
+                events.append(bd_action.do_birth_death())
+            self.assertTrue(len(events[0]) > 0)
+            self.assertEqual(events[0], events[1])
+            np.testing.assert_allclose(
+                bd_actions[1].density_of_walkers(),
+                bd_actions[0].density_of_walkers(),
+                rtol=1e-12,
+            )
+        self.assertEqual(bd_actions[1].neighbor_list.n_builds, 1)
+        with self.assertRaises(ValueError):
+            bd.BirthDeath(particles, 0.1, 1, [0.2, 0.2], 1.0, neighbor_list_skin=0.5)
+
+    def test_input_checks(self):
+        """Incompatible birth-death options are rejected when parsing the input"""
+        base_input = (
+            "[ld]\ntype: bussi-parinello\ntimestep: 0.005\nfriction: 10.0\n"
+            "n_steps: 10\nkt: 1\n"
+            "[potential]\ntype: polynomial\nn_dim: 1\ncoeffs: 0, 0, 1\n"
+            "min: -2.5\nmax: 2.5\n"
+            "[particles]\nnumber: 10\ninitial-distribution: random-global\n"
+            "[birth-death]\nstride: 100\nkernel-bandwidth: 0.3\n"
+        )
+        invalid_options = [
+            "density-method: pdist\nneighbor-list-skin: 0.1\n",
+            "density-method: ifgt\nkernel: epanechnikov\n",
+            "density-method: binned\nincremental-updates: true\n",
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "input")
+            with open(filename, "w") as f:
+                f.write(
+                    base_input + "density-method: kdtree\nneighbor-list-skin: 0.1\n"
+                )
+            inputparser.Input(filename)
+            for options in invalid_options:
+                with open(filename, "w") as f:
+                    f.write(base_input + options)
+                with self.assertRaises(inputparser.OptionError):
+                    inputparser.Input(filename)
+
     def test_run(self):
         """Test if everything can be run
 
@@ -0,0 +1,75 @@
+"""Test the cache of grids on disk"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from bdld import grid
+from bdld import main as bdld_main
+from bdld import system_setup
+from bdld.actions.birth_death import ApproxVariant, approximation_grid
+from bdld.cache import GridCache
+from bdld.potential import polynomial
+
+
+class GridCacheTests(unittest.TestCase):
+    """Test GridCache class"""
+
+    def setUp(self):
+        self.n_calls = 0
+
+    def make_grid(self):
+        """Create grid and count the calls"""
+        self.n_calls += 1
+        g = grid.from_npoints([(0, 1)], 11)
+        g.data = np.linspace(0, 1, 11) ** 2
+        return g
+
+    def test_get(self):
+        """Grids are only calculated if the parameters are new"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = GridCache(os.path.join(tmpdir, "cache"))
+            params = {"kt": 1.0, "bw": [0.1, 0.2]}
+            first = cache.get("test", params, self.make_grid)
+            second = cache.get("test", params, self.make_grid)
+            self.assertEqual(self.n_calls, 1)
+            self.assertTrue(first == second)
+            cache.get("test", {"kt": 1.0, "bw": [0.1, 0.3]}, self.make_grid)
+            cache.get("other", params, self.make_grid)
+            self.assertEqual(self.n_calls, 3)
+            self.assertEqual(len(os.listdir(cache.directory)), 3)
+            # broken files are replaced
+            with open(cache.filename("test", params), "w") as f:
+                f.write("broken")
+            self.assertTrue(cache.get("test", params, self.make_grid) == first)
+            self.assertEqual(self.n_calls, 4)
+            self.assertTrue(cache.get("test", params, self.make_grid) == first)
+            self.assertEqual(self.n_calls, 4)
+
+    def test_approximation_grid(self):
+        """Approximation grid is stored together with the probability density"""
+        pot = polynomial.PolynomialPotential([0, 0, 1], [(-2.0, 2.0)])
+        bw = np.array([0.2])
+        approx_variant = ApproxVariant.mult
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = GridCache(tmpdir)
+            approx_grid = bdld_main.bd_approximation_grid(
+                pot, bw, 1.0, approx_variant, "gaussian", cache
+            )
+            self.assertEqual(len(os.listdir(tmpdir)), 2)
+            eq_density = system_setup.bd_prob_density(pot, bw, 1.0, cache)
+            self.assertEqual(len(os.listdir(tmpdir)), 2)
+            np.testing.assert_allclose(
+                approx_grid.data,
+                approximation_grid(approx_variant, eq_density, bw, "gaussian").data,
+            )
+            # a larger bandwidth leads to another approximation on the same density
+            bdld_main.bd_approximation_grid(
+                pot, 2 * bw, 1.0, approx_variant, "gaussian", cache
+            )
+            self.assertEqual(len(os.listdir(tmpdir)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Test the improved fast Gauss transform"""
+import itertools
+import unittest
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from bdld import gauss_transform as gt
+
+
+def direct_transform(sources, targets, weights):
+    """Direct summation of the Gauss transform"""
+    return np.exp(-cdist(targets, sources, "sqeuclidean")) @ weights
+
+
+class GaussTransformTests(unittest.TestCase):
+    """Test the gauss_transform module"""
+
+    def test_multi_indices(self):
+        """Multi-indices are sorted by degree and parents differ by one"""
+        alphas, parents = gt.multi_indices(2, 3)
+        np.testing.assert_array_equal(
+            alphas, [[0, 0], [0, 1], [1, 0], [0, 2], [1, 1], [2, 0]]
+        )
+        np.testing.assert_array_equal(np.sum(alphas - alphas[parents], axis=1)[1:], 1)
+        values = gt.monomials(np.array([[2.0, 3.0]]), alphas, parents)
+        np.testing.assert_allclose(values[:, 0], [1, 3, 2, 9, 6, 4])
+
+    def test_cluster_sources(self):
+        """All sources are within the radius of their cluster center"""
+        rng = np.random.default_rng(1)
+        sources = rng.uniform(-3, 3, (500, 3))
+        centers, cluster = gt.cluster_sources(sources, 0.5)
+        dist = np.linalg.norm(sources - centers[cluster], axis=1)
+        self.assertTrue(np.all(dist <= 0.5))
+
+    def test_error_bound(self):
+        """The error is below the tolerance for different dimensions"""
+        rng = np.random.default_rng(2)
+        for n_dim in [1, 2, 3]:
+            sources = rng.normal(0, 2, (400, n_dim))
+            targets = rng.normal(0, 2, (100, n_dim))
+            weights = rng.uniform(0.5, 1, 400)
+            expected = direct_transform(sources, targets, weights)
+            for tolerance in [1e-3, 1e-6]:
+                values = gt.gauss_transform(sources, targets, weights, tolerance)
+                np.testing.assert_allclose(
+                    values, expected, rtol=0, atol=tolerance * np.sum(weights)
+                )
+        # sources as targets with fixed cluster radius
+        values = gt.gauss_transform(sources, tolerance=1e-4, cluster_radius=1.2)
+        expected = direct_transform(sources, sources, np.ones(len(sources)))
+        np.testing.assert_allclose(values, expected, rtol=0, atol=1e-4 * len(sources))
+        with self.assertRaises(ValueError):
+            gt.gauss_transform(sources, tolerance=1)
+
+    def test_error_bound_worst_case(self):
+        """The error is below the tolerance for sources at the cluster boundaries"""
+        radius = 0.8
+        for n_dim in [1, 2]:
+            # sources in the corners of a single cell, at the radius from its center
+            side = 2 * radius / np.sqrt(n_dim)
+            corners = np.array(list(itertools.product([0, 1], repeat=n_dim)))
+            sources = corners * side * (1 - 1e-12)
+            center = np.full(n_dim, side / 2)
+            # targets along the directions of the sources up to beyond the cutoff
+            directions = (sources - center) / radius
+            distances = np.linspace(-6, 6, 241)
+            targets = center + directions[:, np.newaxis] * distances[:, np.newaxis]
+            targets = targets.reshape(-1, n_dim)
+            for tolerance in [1e-3, 1e-6, 1e-9]:
+                for weights in [
+                    np.ones(len(sources)),
+                    (-1.0) ** np.arange(len(sources)),
+                ]:
+                    values = gt.gauss_transform(
+                        sources, targets, weights, tolerance, cluster_radius=radius
+                    )
+                    expected = direct_transform(sources, targets, weights)
+                    error = np.max(np.abs(values - expected))
+                    self.assertLess(error, tolerance * np.sum(np.abs(weights)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,8 @@
+import os
+import tempfile
 import unittest
 import numpy as np
+from scipy import signal
 
 from bdld import grid
 
@@ -54,6 +57,9 @@ class GridTests(unittest.TestCase):
         g1 = grid.from_npoints([(0, 10)], 11)
         g1.set_from_func(lambda x: x**2)
         np.testing.assert_array_equal(g1.data, np.square(np.arange(0, 11)))
+        g2 = grid.from_npoints([(0, 10)], 11)
+        g2.set_from_func(lambda x: x[:, 0] ** 2, batched=True)
+        self.assertTrue(g1 == g2)
 
     def test_arithmetics(self):
         """Test some of the aritmetics"""
@@ -63,6 +69,41 @@ class GridTests(unittest.TestCase):
         g2 -= 1  # __rsub__
         self.assertTrue(g1 == g2)
 
+    def test_inplace_arithmetics(self):
+        """In-place operators and functions keep the grid and data array"""
+        g1 = grid.from_npoints([(0, 10)], 11)
+        g1.data = np.arange(11, dtype=float)
+        data = g1.data
+        g2 = g1
+        g2 += 1
+        g2 *= g1
+        g2 /= 2
+        g2 -= 0.25
+        g2.log(inplace=True)
+        g2.exp(inplace=True)
+        self.assertIs(g2, g1)
+        self.assertIs(g2.data, data)
+        np.testing.assert_allclose(g2.data, (np.arange(11) + 1) ** 2 / 2 - 0.25)
+        # integer data is converted if necessary
+        g3 = grid.from_npoints([(0, 10)], 11)
+        g3.data = np.arange(11)
+        g3 /= 2
+        np.testing.assert_array_equal(g3.data, np.arange(11) / 2)
+        with self.assertRaises(ValueError):
+            g3 += grid.from_npoints([(0, 1)], 11)
+
+    def test_cached_points(self):
+        """Axes and points are cached until the grid changes"""
+        g = grid.from_npoints([(0, 1), (0, 2)], [3, 5])
+        points = g.points()
+        self.assertIs(g.points(), points)
+        self.assertFalse(points.flags.writeable)
+        g.ranges = [(0, 2), (0, 2)]
+        np.testing.assert_array_equal(g.points()[:, 0], np.repeat([0, 1, 2], 5))
+        g.n_points = [2, 5]
+        self.assertEqual(g.points().shape, (10, 2))
+        self.assertEqual(len(g.axes()[0]), 2)
+
     def test_exp_log(self):
         """Test if passing exp and log to numpy works"""
         g1 = grid.from_npoints([(0, 10)], 11)
@@ -80,6 +121,173 @@ class GridTests(unittest.TestCase):
         expected = np.array([0, 2.5, 5, 7.5, 10])
         np.testing.assert_array_equal(g2.data, expected)
 
+    def test_interpolation_methods(self):
+        """Test the interpolation methods, fill values and shapes"""
+        g = grid.from_npoints([(-1, 1), (0, 3)], [21, 31])
+        g.set_from_func(lambda p: p[:, 0] * p[:, 1] + 2 * p[:, 0], batched=True)
+        rng = np.random.default_rng(1)
+        points = rng.uniform((-1, 0), (1, 3), (100, 2))
+        expected = points[:, 0] * points[:, 1] + 2 * points[:, 0]
+        # bilinear function is reproduced exactly
+        np.testing.assert_allclose(g.interpolate(points), expected, atol=1e-12)
+        np.testing.assert_allclose(g.interpolate(points, "cubic"), expected, atol=1e-3)
+        # nearest point and coordinates as tuple of arrays
+        values = g.interpolate((np.array([0.04, 1.0]), np.array([[0.06], [3.0]])))
+        self.assertEqual(values.shape, (2, 2))
+        self.assertAlmostEqual(g.interpolate(np.array([0.04, 0.06]), "nearest"), 0.0)
+        # points outside
+        outside = np.array([[0.0, -0.1], [1.1, 1], [1, 3]])
+        np.testing.assert_array_equal(
+            np.isnan(g.interpolate(outside, "cubic")), [True, True, False]
+        )
+        np.testing.assert_array_equal(g.interpolate(outside, fill_value=0.0)[:2], 0)
+        self.assertAlmostEqual(g.interpolate(outside, "nearest")[1], 3)
+        with self.assertRaises(ValueError):
+            g.interpolate(points, "quintic")
+
+        # cubic splines are recalculated for new data
+        g.data = np.sin(g.points()[:, 0]) * np.cos(g.points()[:, 1])
+        expected = np.sin(points[:, 0]) * np.cos(points[:, 1])
+        np.testing.assert_allclose(g.interpolate(points, "cubic"), expected, atol=1e-3)
+        g[0, 0] = 5.0
+        self.assertAlmostEqual(g.interpolate(np.array([[-1.0, 0.0]]), "cubic")[0], 5)
+
+        # 1d grids keep the shape of the points
+        g = grid.from_npoints([(0, 10)], 11)
+        g.data = np.arange(11) ** 2
+        self.assertEqual(g.interpolate(np.array([[0.5], [1]])).shape, (2, 1))
+        np.testing.assert_allclose(g.interpolate(np.array([0.5, 1])), [0.5, 1])
+        np.testing.assert_allclose(
+            g.interpolate(np.array([4.5]), "cubic"), [20.25], rtol=1e-4
+        )
+
+    def test_convolve_fft(self):
+        """FFT convolution with floor and verification against direct convolution"""
+        g1 = grid.from_npoints([(-3, 3), (-2, 2)], [61, 41])
+        g1.set_from_func(lambda p: np.exp(-np.sum(p**2, axis=1) * 10), batched=True)
+        g2 = grid.from_stepsizes([(-0.5, 0.5), (-0.3, 0.3)], g1.stepsizes)
+        g2.set_from_func(lambda p: np.exp(-np.sum(p**2, axis=1) * 5), batched=True)
+        for mode in ["same", "valid"]:
+            direct = grid.convolve(g1, g2, mode, "direct")
+            fft = grid.convolve(g1, g2, mode, "fft", floor=1e-12, verify=True)
+            self.assertEqual(fft.ranges, direct.ranges)
+            limit = 1e-12 * np.max(direct.data)
+            self.assertTrue(np.all(fft.data >= limit))
+            large = direct.data > limit
+            np.testing.assert_allclose(fft.data[large], direct.data[large], rtol=1e-3)
+        # deviations are detected
+        conv = signal.convolve(g1.data, g2.data, "same")
+        conv[30, 20] *= 1.01
+        with self.assertRaises(RuntimeError):
+            grid._verify_convolution(g1.data, g2.data, conv, "same")
+        # also in the low-density region, relative to the values above the floor
+        conv = signal.convolve(g1.data, g2.data, "same")
+        small = (conv >= 1e-12 * np.max(conv)) & (conv < 1e-10 * np.max(conv))
+        conv[small] *= 0.5
+        with self.assertRaises(RuntimeError):
+            grid._verify_convolution(g1.data, g2.data, conv, "same", floor=1e-12)
+
+    def test_convolve_separable(self):
+        """Separable convolution gives the same result as with the full kernel grid"""
+        g = grid.from_npoints([(-3, 3), (-2, 2), (0, 1)], [31, 21, 11])
+        g.set_from_func(lambda p: np.exp(-np.sum(p**2, axis=1)), batched=True)
+        kernel_ranges = [(-0.4, 0.4), (-0.6, 0.6), (-0.2, 0.2)]
+        kernel_grid = grid.from_stepsizes(kernel_ranges, g.stepsizes)
+        kernels = [np.exp(-np.abs(axis)) for axis in kernel_grid.axes()]
+        kernel_grid.data = np.einsum("i,j,k->ijk", *kernels)
+        for mode in ["same", "valid"]:
+            for method in ["direct", "fft"]:
+                full = grid.convolve(g, kernel_grid, mode, method)
+                separable = grid.convolve_separable(
+                    g, kernels, mode, method, verify=True
+                )
+                self.assertEqual(separable.ranges, full.ranges)
+                self.assertEqual(separable.n_points, full.n_points)
+                np.testing.assert_allclose(separable.data, full.data, rtol=1e-10)
+        with self.assertRaises(ValueError):
+            grid.convolve_separable(g, kernels[:2])
+
+    def test_points_order(self):
+        """Points are in the same order as the data in 3d"""
+        g = grid.from_npoints([(0, 1), (0, 2), (0, 3)], [2, 3, 4])
+        g.set_from_func(lambda p: p @ [100, 10, 1], batched=True)
+        self.assertEqual(g.data[1, 2, 3], 123)
+        np.testing.assert_allclose(g.interpolate(g.points()), g.data.ravel())
+
+    def test_memmap_chunks(self):
+        """Memory-mapped grids are processed in chunks"""
+        chunk_points = grid.CHUNK_POINTS
+        grid.CHUNK_POINTS = 100
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                g = grid.from_npoints([(-3, 3), (-2, 2), (0, 1)], [31, 21, 11])
+                g.use_memmap(os.path.join(tmpdir, "grid.npy"))
+
+                def func(p):
+                    return np.exp(-np.sum(p**2, axis=1))
+
+                g.set_from_func(func, batched=True)
+                self.assertIsInstance(g.data, np.memmap)
+                np.testing.assert_array_equal(g.data.ravel(), func(g.points()))
+                g *= 2
+                self.assertIsInstance(g.data, np.memmap)
+                loaded = np.load(os.path.join(tmpdir, "grid.npy"), mmap_mode="r")
+                np.testing.assert_array_equal(loaded.ravel(), 2 * func(g.points()))
+
+                kernel_grid = grid.from_npoints([(-0.4, 0.4), (-0.4, 0.4), (0, 0)], 5)
+                kernel_grid.stepsizes = g.stepsizes
+                kernel_grid.data = np.ones(kernel_grid.n_points)
+                for mode in ["same", "valid"]:
+                    expected = grid.convolve(g, kernel_grid, mode, floor=1e-3)
+                    conv = grid.convolve(
+                        g,
+                        kernel_grid,
+                        mode,
+                        floor=1e-3,
+                        verify=True,
+                        filename=os.path.join(tmpdir, "conv.npy"),
+                    )
+                    self.assertIsInstance(conv.data, np.memmap)
+                    self.assertEqual(conv.ranges, expected.ranges)
+                    np.testing.assert_allclose(conv.data, expected.data, rtol=1e-12)
+                    kernels = [np.ones(n) for n in kernel_grid.n_points]
+                    conv = grid.convolve_separable(
+                        g,
+                        kernels,
+                        mode,
+                        floor=1e-3,
+                        filename=os.path.join(tmpdir, "sep.npy"),
+                    )
+                    self.assertEqual(conv.n_points, expected.n_points)
+                    np.testing.assert_allclose(conv.data, expected.data, rtol=1e-12)
+                # only the result files remain
+                self.assertEqual(
+                    sorted(os.listdir(tmpdir)), ["conv.npy", "grid.npy", "sep.npy"]
+                )
+
+                self.assertAlmostEqual(
+                    grid.nd_trapz(g.data, g.stepsizes, g.data),
+                    grid.nd_trapz(np.array(g.data) ** 2, g.stepsizes),
+                )
+                sparse = grid.sparsify(g, [11, 11, 11])
+                np.testing.assert_allclose(
+                    sparse.data.ravel(), 2 * func(sparse.points()), rtol=0.1
+                )
+        finally:
+            grid.CHUNK_POINTS = chunk_points
+
+    def test_save_load(self):
+        """Grid is the same after writing and reading from binary file"""
+        g = grid.from_stepsizes([(-1, 1), (0, 3)], [0.1, 0.3])
+        g.set_from_func(lambda p: p[:, 0] * p[:, 1], batched=True)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "grid.npz")
+            g.save(filename)
+            loaded = grid.load(filename)
+        self.assertTrue(loaded == g)
+        self.assertEqual(loaded.stepsizes, g.stepsizes)
+        self.assertEqual(loaded.n_dim, 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,93 @@
+"""Test the Langevin dynamics integrators"""
+import unittest
+
+import numpy as np
+
+from bdld.actions.bussi_parinello_ld import BussiParinelloLD
+from bdld.actions.overdamped_ld import OverdampedLD
+from bdld.potential import polynomial, potential
+
+
+def setup_potential() -> polynomial.PolynomialPotential:
+    """Double well potential in 2d with reflective boundaries"""
+    coeffs = np.zeros((5, 3))
+    coeffs[2, 0] = -4
+    coeffs[4, 0] = 1
+    coeffs[0, 2] = 1
+    pot = polynomial.PolynomialPotential(coeffs, [(-2.0, 2.0), (-1.0, 1.0)])
+    pot.boundary_condition = potential.BoundaryCondition.reflective
+    return pot
+
+
+def add_particles(ld, n_particles: int = 20) -> None:
+    """Distribute particles randomly on the potential with different masses"""
+    rng = np.random.default_rng(42)
+    for i in range(n_particles):
+        pos = [rng.uniform(start, end) for start, end in ld.pot.ranges]
+        ld.add_particle(pos, 1.0 + i % 3)
+
+
+class BussiParinelloTests(unittest.TestCase):
+    """Test BussiParinelloLD class"""
+
+    def test_batched(self):
+        """Batched and per-walker integration must give the same trajectories"""
+        lds = []
+        for batched in [True, False]:
+            ld = BussiParinelloLD(setup_potential(), 0.05, 1.0, 1.0, 1234, batched)
+            add_particles(ld)
+            for step in range(1, 101):
+                ld.run(step)
+            lds.append(ld)
+        np.testing.assert_allclose(lds[0].particles.pos, lds[1].particles.pos)
+        np.testing.assert_allclose(lds[0].particles.mom, lds[1].particles.mom)
+        np.testing.assert_allclose(lds[0].particles.forces, lds[1].particles.forces)
+
+    def test_noise_buffer(self):
+        """Pre-generated noise must also give the same trajectories for both variants"""
+        lds = []
+        for batched in [True, False]:
+            ld = BussiParinelloLD(
+                setup_potential(), 0.05, 1.0, 1.0, 1234, batched, 7, 8
+            )
+            add_particles(ld)
+            for step in range(1, 31):
+                ld.run(step)
+            lds.append(ld)
+        np.testing.assert_allclose(lds[0].particles.pos, lds[1].particles.pos)
+        np.testing.assert_allclose(lds[0].particles.mom, lds[1].particles.mom)
+
+    def test_run_steps(self):
+        """Running several steps at once must store the same positions as single steps"""
+        lds = []
+        for _ in range(2):
+            ld = BussiParinelloLD(setup_potential(), 0.05, 1.0, 1.0, 1234)
+            add_particles(ld, 5)
+            lds.append(ld)
+        positions = np.empty((10, 5, 2))
+        momenta = np.empty((10, 5, 2))
+        lds[0].run_steps(10, positions, momenta)
+        for step in range(10):
+            lds[1].run(step + 1)
+            np.testing.assert_array_equal(positions[step], lds[1].particles.pos)
+            np.testing.assert_array_equal(momenta[step], lds[1].particles.mom)
+
+
+class OverdampedTests(unittest.TestCase):
+    """Test OverdampedLD class"""
+
+    def test_batched(self):
+        """Batched and per-walker integration must give the same trajectories"""
+        lds = []
+        for batched in [True, False]:
+            ld = OverdampedLD(setup_potential(), 0.01, 1234, batched)
+            add_particles(ld)
+            for step in range(1, 101):
+                ld.run(step)
+            lds.append(ld)
+        np.testing.assert_allclose(lds[0].particles.pos, lds[1].particles.pos)
+        np.testing.assert_allclose(lds[0].particles.energy, lds[1].particles.energy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Test running the simulation and the bandwidth scan from the command line"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from bdld import bandwidth_scan
+from bdld import main as bdld_main
+
+INPUT = """[ld]
+type: bussi-parinello
+timestep: 0.005
+friction: 10.0
+n_steps: 200
+kt: 1
+seed: 1234
+
+[potential]
+type: polynomial
+n_dim: 1
+coeffs: 0, 0.2, -4, 0, 1
+min: -2.5
+max: 2.5
+
+[particles]
+number: 20
+initial-distribution: random-global
+
+[birth-death]
+stride: 50
+kernel-bandwidth: 0.3
+
+[trajectories]
+stride: 10
+filename: traj
+
+[histogram]
+bins: 50
+min: -2.5
+max: 2.5
+filename: histo
+"""
+
+
+class MainTests(unittest.TestCase):
+    """Test the main function of the command line interface"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        with open("input", "w") as f:
+            f.write(INPUT)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_simulation(self):
+        """Simulation runs and writes the output files of the input"""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            bdld_main.main(["input"])
+        self.assertIn("Starting bdld code", output.getvalue())
+        self.assertIn("Finished without errors", output.getvalue())
+        self.assertTrue(os.path.isfile("histo"))
+        traj = np.loadtxt("traj.0")
+        self.assertEqual(traj.shape, (20, 2))
+
+    def test_bandwidth_scan(self):
+        """Bandwidth scan subcommand writes one summary row per bandwidth"""
+        np.savetxt("pos", np.linspace(-2, 2, 30))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            bdld_main.main(
+                ["bandwidth-scan", "input", "pos", "-b", "0.1", "0.3", "-o", "summary"]
+            )
+        # no simulation is started
+        self.assertNotIn("Starting bdld code", output.getvalue())
+        summary = np.loadtxt("summary")
+        self.assertEqual(summary.shape, (2, 1 + len(bandwidth_scan.SUMMARY_FIELDS)))
+        np.testing.assert_array_equal(summary[:, 0], [0.1, 0.3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Test the Verlet neighbor lists"""
+import unittest
+
+import numpy as np
+from scipy.spatial.distance import pdist
+
+from bdld.neighbor_list import NeighborList
+
+
+def pair_set(nlist: NeighborList) -> set:
+    """Set of the pairs in the list"""
+    return set(zip(nlist.first.tolist(), nlist.second.tolist()))
+
+
+def close_pairs(pos: np.ndarray, cutoff: float) -> set:
+    """Set of all pairs closer than cutoff by brute force"""
+    i, j = np.triu_indices(len(pos), 1)
+    mask = pdist(pos) <= cutoff
+    return set(zip(i[mask].tolist(), j[mask].tolist()))
+
+
+class NeighborListTests(unittest.TestCase):
+    """Test NeighborList class"""
+
+    def test_build(self):
+        """All pairs within cutoff plus skin are found exactly once"""
+        rng = np.random.default_rng(1)
+        pos = rng.uniform(0, 5, (200, 2))
+        nlist = NeighborList(1.0, 0.5)
+        # small chunks to test the chunking
+        nlist.max_chunk_pairs = 100
+        self.assertTrue(nlist.update(pos))
+        self.assertEqual(len(nlist), len(pair_set(nlist)))
+        self.assertEqual(pair_set(nlist), close_pairs(pos, 1.5))
+        with self.assertRaises(ValueError):
+            NeighborList(1.0, -0.1)
+
+    def test_update(self):
+        """The list is only rebuilt if a walker moved more than half the skin"""
+        rng = np.random.default_rng(2)
+        pos = rng.uniform(0, 5, (100, 3))
+        nlist = NeighborList(1.0, 0.4)
+        nlist.update(pos)
+        pos[3] += [0.1, 0.1, 0.1]  # moved about 0.17
+        self.assertFalse(nlist.update(pos))
+        # all pairs within the cutoff are still in the list
+        self.assertTrue(close_pairs(pos, 1.0) <= pair_set(nlist))
+        pos[5] += [0.21, 0, 0]
+        self.assertTrue(nlist.update(pos))
+        self.assertEqual(nlist.n_builds, 2)
+        # different number of walkers
+        self.assertTrue(nlist.update(pos[:50]))
+
+    def test_copy_walkers(self):
+        """Patched lists are the same as newly built ones"""
+        rng = np.random.default_rng(3)
+        pos = rng.uniform(0, 5, (100, 2))
+        nlist = NeighborList(1.0, 0.3)
+        nlist.update(pos)
+        # includes a copy of a copy and a copied walker that is killed later
+        events = [(1, 2), (2, 3), (4, 1), (7, 5), (8, 5), (10, 7)]
+        for dup, kill in events:
+            pos[kill] = pos[dup]
+        nlist.copy_walkers(events)
+        np.testing.assert_array_equal(nlist.ref_pos, pos)
+        self.assertTrue(np.all(nlist.first < nlist.second))
+        self.assertEqual(pair_set(nlist), close_pairs(pos, 1.3))
+        self.assertEqual(len(nlist), len(pair_set(nlist)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+"""Test the pre-generation of noise"""
+import unittest
+
+import numpy as np
+
+from bdld.noise import NoiseBuffer
+
+
+class NoiseBufferTests(unittest.TestCase):
+    """Test NoiseBuffer class"""
+
+    def test_shape(self):
+        """Noise has the right shape and is refilled after a block"""
+        noise = NoiseBuffer(3, 2, seed=1, block_steps=4, chunk_size=5)
+        steps = np.array([noise.next(12) for _ in range(6)])
+        self.assertEqual(steps.shape, (6, 12, 2, 3))
+        self.assertEqual(len(noise.rngs), 3)
+        # all steps must be different
+        self.assertEqual(len(np.unique(steps[:, 0, 0, 0])), 6)
+        with self.assertRaises(ValueError):
+            NoiseBuffer(1, block_steps=0)
+
+    def test_reproducible(self):
+        """Noise of a walker only depends on the seed and its chunk"""
+        seeded = [NoiseBuffer(2, 2, seed=1234, block_steps=3, chunk_size=4)]
+        seeded.append(NoiseBuffer(2, 2, seed=1234, block_steps=3, chunk_size=4))
+        first = np.array([seeded[0].next(10) for _ in range(5)])
+        second = np.array([seeded[1].next(6) for _ in range(5)])
+        # the first complete chunk is unaffected by the number of walkers
+        np.testing.assert_array_equal(first[:, :4], second[:, :4])
+        other = NoiseBuffer(2, 2, seed=4321, block_steps=3, chunk_size=4)
+        self.assertFalse(np.allclose(first[0], other.next(10)))
+
+
+if __name__ == "__main__":
+    unittest.main()
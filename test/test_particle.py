@@ -1,5 +1,7 @@
 import unittest
 
+import numpy as np
+
 from bdld import particle
 
 
@@ -21,5 +23,65 @@ class ParticleTests(unittest.TestCase):
             p = particle.Particle([0, 1], [1])  # dimension mismatch
 
 
+class WalkerEnsembleTests(unittest.TestCase):
+    """Test WalkerEnsemble class and the Walker views"""
+
+    def test_add_remove(self):
+        """Adding, inserting and removing walkers"""
+        ens = particle.WalkerEnsemble(2, capacity=1)
+        ens.add([0, 1])
+        ens.add([2, 3], mass=2.0)  # buffers need to grow
+        ens.add([4, 5], index=0)
+        self.assertEqual(len(ens), 3)
+        np.testing.assert_array_equal(ens.pos, [[4, 5], [0, 1], [2, 3]])
+        np.testing.assert_array_equal(ens.mass, [1, 1, 2])
+        np.testing.assert_array_equal(ens.mom, np.zeros((3, 2)))
+        ens.remove(1)
+        np.testing.assert_array_equal(ens.pos, [[4, 5], [2, 3]])
+        with self.assertRaises(ValueError):
+            ens.add([1])  # dimension mismatch
+        with self.assertRaises(IndexError):
+            ens.remove(2)
+
+    def test_walker_view(self):
+        """Walker views must change the arrays of the ensemble"""
+        ens = particle.WalkerEnsemble(1)
+        ens.add(0.0)
+        ens.add(1.0, mom=2.0)
+        w = ens[-1]
+        w.pos += 1
+        w.energy = 3.0
+        w.init_momentum()  # method of base class must work on view
+        np.testing.assert_array_equal(ens.pos, [[0], [2]])
+        np.testing.assert_array_equal(ens.mom, [[0], [0]])
+        np.testing.assert_array_equal(ens.energy, [0, 3])
+        self.assertEqual([p.pos[0] for p in ens], [0, 2])
+
+    def test_copy(self):
+        """Copying walkers within the ensemble and from particles"""
+        ens = particle.WalkerEnsemble.from_particles(
+            [particle.Particle(0.0, 1.0), particle.Particle(1.0, 2.0, 3.0)]
+        )
+        ens.energy = [4.0, 5.0]
+        ens[0] = ens[1]
+        np.testing.assert_array_equal(ens.pos, [[1], [1]])
+        np.testing.assert_array_equal(ens.mom, [[2], [2]])
+        np.testing.assert_array_equal(ens.mass, [3, 3])
+        np.testing.assert_array_equal(ens.energy, [5, 5])
+        self.assertEqual(len(particle.WalkerEnsemble.from_particles([], 2).pos), 0)
+
+    def test_copy_walkers(self):
+        """Copying many walkers at once is the same as copying them in order"""
+        ens = particle.WalkerEnsemble(1)
+        for i in range(6):
+            ens.add(float(i), mom=10.0 * i)
+        ens.energy = np.arange(6) * 100.0
+        # walker 3 is a copy of a copy, walker 1 is overwritten twice
+        ens.copy_walkers([0, 2, 4, 5], [2, 3, 1, 1])
+        np.testing.assert_array_equal(ens.pos[:, 0], [0, 5, 0, 0, 4, 5])
+        np.testing.assert_array_equal(ens.mom[:, 0], [0, 50, 0, 0, 40, 50])
+        np.testing.assert_array_equal(ens.energy, [0, 500, 0, 0, 400, 500])
+
+
 if __name__ == "__main__":
     unittest.main()
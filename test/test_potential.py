@@ -1,8 +1,12 @@
 """Test some potential functionality"""
+import os
+import tempfile
 import unittest
 import numpy as np
 
-from bdld.potential import polynomial, potential
+from bdld import inputparser
+from bdld import system_setup
+from bdld.potential import mueller_brown, polynomial, potential, tabulated
 
 
 class PotentialTests(unittest.TestCase):
@@ -30,6 +34,134 @@ class PotentialTests(unittest.TestCase):
         self.assertEqual(energy, 8.5)  # x+2*y**2
         np.testing.assert_array_equal(forces, [-1, -8])  # -1,-4y
 
+    def test_evaluate_batch(self):
+        """Batched evaluation must match evaluation of single positions"""
+        testpos = np.array([[0.5, 2.0], [-1.0, 0.3], [0.2, 0.4]])
+        pots = [
+            polynomial.PolynomialPotential(self.c2),
+            mueller_brown.MuellerBrownPotential(),
+        ]
+        for pot in pots:
+            energies, forces = pot.evaluate_batch(testpos)
+            for i, pos in enumerate(testpos):
+                energy, force = pot.evaluate(pos)
+                self.assertAlmostEqual(energies[i], energy)
+                np.testing.assert_array_almost_equal(forces[i], force)
+            np.testing.assert_array_almost_equal(pot.energy_batch(testpos), energies)
+        # 1d: positions are given as arrays of shape (n_pos, 1)
+        pot = polynomial.PolynomialPotential(self.c1)
+        energies, forces = pot.evaluate_batch(np.array([[1.0], [2.0]]))
+        np.testing.assert_array_equal(energies, [1, 4])
+        np.testing.assert_array_equal(forces, [[-2], [-4]])
+
+    def test_polynomial_fused(self):
+        """Evaluation via power tables must match numpy's polyval functions"""
+        rng = np.random.default_rng(1)
+        coeffs = np.zeros((5, 4, 3))
+        coeffs[:3, :3, :2] = rng.uniform(-1, 1, (3, 3, 2))  # trailing zeros
+        pot = polynomial.PolynomialPotential(coeffs)
+        self.assertEqual(pot.der[0].shape, (2, 3, 2))  # trimmed
+        testpos = rng.uniform(-2, 2, (10, 3))
+        energies, forces = pot.evaluate_batch(testpos)
+        x, y, z = testpos.T
+        np.testing.assert_allclose(
+            energies, np.polynomial.polynomial.polyval3d(x, y, z, coeffs)
+        )
+        for d in range(3):
+            der = np.polynomial.polynomial.polyder(coeffs, axis=d)
+            np.testing.assert_allclose(
+                forces[:, d], -np.polynomial.polynomial.polyval3d(x, y, z, der)
+            )
+
+    def test_tabulated(self):
+        """Interpolation of tabulated potential and reading / writing of files"""
+        pot = polynomial.PolynomialPotential(self.c2)
+        ranges = [(-1.0, 1.0), (-2.0, 2.0)]
+        testpos = np.array([[0.33, -1.27], [-0.81, 0.45], [0.0, 2.0]])
+        ref_energy, ref_forces = pot.evaluate_batch(testpos)
+        for method, tol in [("linear", 5e-2), ("cubic", 1e-3)]:
+            tab = tabulated.from_potential(pot, ranges, [41, 81], method)
+            energies, forces = tab.evaluate_batch(testpos)
+            np.testing.assert_allclose(energies, ref_energy, atol=tol)
+            np.testing.assert_allclose(forces, ref_forces, atol=tol)
+            energy, force = tab.evaluate(testpos[0])
+            self.assertAlmostEqual(energy, energies[0])
+            np.testing.assert_allclose(force, forces[0])
+        # outside of the grid the closest values are used
+        np.testing.assert_allclose(tab.energy([3.0, 2.0]), tab.energy([1.0, 2.0]))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # energy only grid file in plumed style, forces from finite differences
+            grid_file = os.path.join(tmpdir, "pot.grid")
+            tab = tabulated.from_potential(pot, ranges, [41, 81], "cubic")
+            energy_grid = tab.grid.copy_empty()
+            energy_grid.set_from_func(pot.energy_batch, batched=True)
+            energy_grid.write_to_file(grid_file)
+            from_file = tabulated.from_grid_file(grid_file, 2, "cubic")
+            self.assertEqual(from_file.ranges, ranges)
+            np.testing.assert_allclose(
+                from_file.evaluate_batch(testpos)[1], ref_forces, atol=1e-3
+            )
+            # table is memory-mapped when loaded again
+            table_file = os.path.join(tmpdir, "pot.npy")
+            from_file.save_table(table_file)
+            loaded = tabulated.TabulatedPotential.from_table_file(table_file)
+            self.assertIsInstance(loaded.table, np.memmap)
+            self.assertEqual(loaded.method, "cubic")
+            self.assertEqual(loaded.ranges, ranges)
+            np.testing.assert_array_equal(
+                loaded.energy_batch(testpos), from_file.energy_batch(testpos)
+            )
+
+            # table is only used if it matches the input
+            options = {
+                "table-file": os.path.join(tmpdir, "setup.npy"),
+                "grid-file": grid_file,
+                "n_dim": 2,
+                "interpolation": "cubic",
+            }
+            system_setup.setup_tabulated_potential(options)
+            header = tabulated.TabulatedPotential.read_table_header(
+                options["table-file"]
+            )
+            self.assertEqual(
+                header.constants["source_sha256"], tabulated.file_hash(grid_file)
+            )
+            options["interpolation"] = "linear"
+            self.assertEqual(
+                system_setup.setup_tabulated_potential(options).method, "linear"
+            )
+            energy_grid.data += 1.0
+            energy_grid.write_to_file(grid_file)
+            pot_shifted = system_setup.setup_tabulated_potential(options)
+            np.testing.assert_allclose(
+                pot_shifted.energy_batch(testpos),
+                from_file.energy_batch(testpos) + 1.0,
+                atol=1e-2,
+            )
+            options["grid-file"] = None
+            options["n_dim"] = 1
+            with self.assertRaises(inputparser.OptionError):
+                system_setup.setup_tabulated_potential(options)
+
+    def test_fingerprint(self):
+        """Fingerprint only depends on the definition of the potential"""
+        pot = polynomial.PolynomialPotential(self.c2)
+        fingerprint = pot.fingerprint()
+        # evaluating does not change it
+        pot.evaluate_batch(np.zeros((3, 2)))
+        self.assertEqual(fingerprint, pot.fingerprint())
+        same = polynomial.PolynomialPotential(self.c2)
+        self.assertEqual(fingerprint, same.fingerprint())
+        other = polynomial.PolynomialPotential([[0, 0, 2], [1, 0, 1]])
+        self.assertNotEqual(fingerprint, other.fingerprint())
+        other = polynomial.PolynomialPotential(self.c2, [(-2, 2), (-2, 2)])
+        self.assertNotEqual(fingerprint, other.fingerprint())
+        self.assertNotEqual(
+            mueller_brown.MuellerBrownPotential().fingerprint(),
+            mueller_brown.MuellerBrownPotential(0.5).fingerprint(),
+        )
+
     def test_reference(self):
         """Test reference function"""
         pot = polynomial.PolynomialPotential(self.c1)
@@ -80,6 +212,30 @@ class PotentialTests(unittest.TestCase):
         np.testing.assert_array_equal(mom1, np.array([1, -2]))
         np.testing.assert_array_equal(mom2, np.array([1, -2]))
 
+    def test_boundary_conditions_batch(self):
+        """Boundary conditions on arrays of many positions"""
+        pot = potential.Potential()
+        pot.ranges = [[0.5, 1], [-1, 0]]
+        init_pos = np.array([[1.1, -0.5], [0.7, -1.1], [2.3, -3.4], [0.6, -0.2]])
+        init_mom = np.array([[1.0, -2.0]] * 4)
+
+        pos, mom = init_pos.copy(), init_mom.copy()
+        pot.boundary_condition = potential.BoundaryCondition.reflective
+        pot.apply_boundary_condition_batch(pos, mom)
+        np.testing.assert_array_almost_equal(
+            pos, [[1, -0.5], [0.7, -1], [1, -1], [0.6, -0.2]]
+        )
+        np.testing.assert_array_equal(mom, [[-1, -2], [1, 2], [-1, 2], [1, -2]])
+
+        pos, mom = init_pos.copy(), init_mom.copy()
+        pot.boundary_condition = potential.BoundaryCondition.periodic
+        pot.apply_boundary_condition_batch(pos, mom)
+        # third walker is more than one box length outside in both directions
+        np.testing.assert_array_almost_equal(
+            pos, [[0.6, -0.5], [0.7, -0.1], [0.8, -0.4], [0.6, -0.2]]
+        )
+        np.testing.assert_array_equal(mom, init_mom)
+
 
 if __name__ == "__main__":
     unittest.main()